@@ -1,16 +1,22 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context
 import os
+import uuid
 from werkzeug.utils import secure_filename
 import io
 import base64
 from dotenv import load_dotenv
-from nlp import ask_ai_question, analyze_image
+from nlp import ask_ai_question, stream_ai_answer, analyze_image
+from models import init_db, add_chat_message
+from sse import stream_answer
+from deadline import request_deadline, degraded_fields
+from metrics import registry, instrument_app, CONTENT_TYPE
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = 'aditya-ai-secret-key-2024'
+instrument_app(app)
 
 # Configure upload settings
 UPLOAD_FOLDER = 'uploads'
@@ -18,8 +24,14 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB
 
+# How /chat asks the AI providers ('sequential', 'hedged' or 'race'); unset uses AI_PROVIDER_MODE
+CHAT_PROVIDER_MODE = os.getenv('CHAT_PROVIDER_MODE')
+
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Streamed chats are stored in the database, since the session cookie is already sent
+init_db()
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -89,8 +101,10 @@ def chat():
         if 'chat_history' not in session:
             session['chat_history'] = []
         
-        # Generate AI response using enhanced nlp module (supports OpenAI + Gemini)
-        ai_response = ask_ai_question(user_message)
+        # Generate AI response using enhanced nlp module (supports OpenAI + Gemini),
+        # within the request's latency budget
+        deadline = request_deadline(data.get('deadline_ms'))
+        ai_response = ask_ai_question(user_message, CHAT_PROVIDER_MODE, deadline)
         
         # Store in chat history
         session['chat_history'].append({
@@ -104,12 +118,37 @@ def chat():
         
         return jsonify({
             'response': ai_response,
-            'status': 'success'
+            'status': 'success',
+            **degraded_fields(deadline)
         })
         
     except Exception as e:
         return jsonify({'error': f'AI Error: {str(e)}'}), 500
 
+@app.route('/chat/stream', methods=['GET', 'POST'])
+def chat_stream():
+    """Stream an AI answer as Server-Sent Events"""
+    data = request.get_json(silent=True) or {}
+    user_message = (request.args.get('message') or data.get('message') or '').strip()
+    
+    if not user_message:
+        return jsonify({'error': 'Message cannot be empty'}), 400
+    
+    if 'session_id' not in session:
+        session['session_id'] = str(uuid.uuid4())
+    session_id = session['session_id']
+    
+    def save(answer):
+        add_chat_message(user_message, answer, 'ai_question', session_id)
+    
+    deadline = request_deadline(request.args.get('deadline_ms') or data.get('deadline_ms'))
+    events = stream_ai_answer(user_message, deadline)
+    return Response(
+        stream_with_context(stream_answer(events, save, lambda: degraded_fields(deadline))),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/chat_with_image', methods=['POST'])
 def chat_with_image():
     """Handle AI conversations with image analysis using enhanced nlp module"""
@@ -169,6 +208,11 @@ def clear_history():
     session['chat_history'] = []
     return jsonify({'status': 'success', 'message': 'Chat history cleared'})
 
+@app.route('/metrics')
+def metrics():
+    """Request, provider and database metrics in the Prometheus text format"""
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
 if __name__ == '__main__':
     print("🤖 Aditya AI - Galaxy ChatGPT Interface")
     print("🌐 Open http://localhost:3001")
@@ -1,15 +1,25 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, Response, stream_with_context
 import sqlite3
 from datetime import datetime
 import json
+import csv
+import io
 import os
 import uuid
+import click
 from werkzeug.utils import secure_filename
-from nlp import process_query, ask_ai_question, detect_intent, analyze_image
-from models import init_db, add_task, get_tasks, delete_task, update_task, add_chat_message, get_chat_history, clear_chat_history, get_chat_stats
+from nlp import process_query, ask_ai_question, stream_ai_answer, detect_intent, analyze_image, get_provider_routing
+from sse import stream_answer
+from deadline import request_deadline, degraded_fields
+from router import parse_route
+from metrics import registry, instrument_app, CONTENT_TYPE
+from reminders import start_reminder_scheduler, REMINDER_SCHEDULER
+from retention import run_retention, rehydrate_session, start_retention_worker, CHAT_RETENTION_INTERVAL_S
+from models import init_db, add_task, add_tasks_bulk, iter_tasks, get_tasks, get_task_changes, delete_task, update_task, add_chat_message, get_chat_history, clear_chat_history, get_chat_stats, encode_history_cursor, rebuild_chat_stats, search_chat_history
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-change-this'
+instrument_app(app)
 
 # Configure upload settings
 UPLOAD_FOLDER = 'uploads'
@@ -17,6 +27,11 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
+# How each route asks the AI providers ('sequential', 'hedged' or 'race');
+# unset falls back to AI_PROVIDER_MODE
+PROCESS_PROVIDER_MODE = os.getenv('PROCESS_PROVIDER_MODE')
+ASK_PROVIDER_MODE = os.getenv('ASK_PROVIDER_MODE')
+
 # Create uploads directory if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
@@ -26,6 +41,30 @@ def allowed_file(filename):
 # Initialize database on startup
 init_db()
 
+# Fire due reminders in the background
+if REMINDER_SCHEDULER:
+    start_reminder_scheduler()
+
+# Periodically archive expired chat history if a retention interval is set
+if CHAT_RETENTION_INTERVAL_S > 0:
+    start_retention_worker(CHAT_RETENTION_INTERVAL_S)
+
+def tasks_payload(since):
+    """Task list fields for a response
+    
+    Clients that send the last `tasks_revision` they saw get only what changed
+    since then under 'tasks_changes'; others get the full list as before.
+    """
+    try:
+        since = int(since) if since is not None else None
+    except (TypeError, ValueError):
+        since = None
+    
+    if since is None:
+        changes = get_task_changes()
+        return {'tasks': changes['tasks'], 'tasks_revision': changes['revision']}
+    return {'tasks_changes': get_task_changes(since)}
+
 @app.route('/')
 def index():
     """Main page showing the professional Aditya AI interface"""
@@ -70,15 +109,16 @@ def process():
         if not user_input:
             return jsonify({'error': 'No query provided'}), 400
         
-        # Process the query using NLP
-        response = process_query(user_input)
+        # Process the query using NLP, within the request's latency budget
+        deadline = request_deadline(request.json.get('deadline_ms'))
+        # An optional route pins the provider order, for debugging
+        response = process_query(user_input, PROCESS_PROVIDER_MODE, deadline, parse_route(request.json.get('route')))
         
         # Refresh tasks list for the frontend
-        tasks = get_tasks()
-        
         return jsonify({
             'response': response,
-            'tasks': tasks
+            **tasks_payload(request.json.get('tasks_since')),
+            **degraded_fields(deadline)
         })
     
     except Exception as e:
@@ -100,7 +140,6 @@ def ask():
         if intent in ['reminder', 'schedule']:
             # Handle as task/reminder using existing logic
             response = process_query(user_input)
-            tasks = get_tasks()
             
             # Save to chat history
             session_id = session.get('session_id')
@@ -108,12 +147,13 @@ def ask():
             
             return jsonify({
                 'response': response,
-                'tasks': tasks,
+                **tasks_payload(request.json.get('tasks_since')),
                 'type': 'task_action'
             })
         else:
-            # Handle as AI question
-            ai_response = ask_ai_question(user_input)
+            # Handle as AI question, within the request's latency budget
+            deadline = request_deadline(request.json.get('deadline_ms'))
+            ai_response = ask_ai_question(user_input, ASK_PROVIDER_MODE, deadline, parse_route(request.json.get('route')))
             
             # Save to chat history
             session_id = session.get('session_id')
@@ -121,13 +161,42 @@ def ask():
             
             return jsonify({
                 'response': ai_response,
-                'type': 'ai_response'
+                'type': 'ai_response',
+                **degraded_fields(deadline)
             })
     
     except Exception as e:
         print(f"❌ Error in ask route: {e}")
         return jsonify({'error': 'Sorry, I encountered an error processing your request. Please try again.'}), 500
 
+@app.route('/ask/stream', methods=['GET', 'POST'])
+def ask_stream():
+    """Stream the answer to a question as Server-Sent Events"""
+    data = request.get_json(silent=True) or {}
+    user_input = (request.args.get('question') or data.get('question') or '').strip()
+    
+    if not user_input:
+        return jsonify({'error': 'No question provided'}), 400
+    
+    session_id = session.get('session_id')
+    deadline = request_deadline(request.args.get('deadline_ms') or data.get('deadline_ms'))
+    if detect_intent(user_input) in ['reminder', 'schedule']:
+        # Task actions answer at once; send them as a single event
+        events = iter([('token', process_query(user_input))])
+        message_type = 'task'
+    else:
+        events = stream_ai_answer(user_input, deadline)
+        message_type = 'ai_question'
+    
+    def save(answer):
+        add_chat_message(user_input, answer, message_type, session_id)
+    
+    return Response(
+        stream_with_context(stream_answer(events, save, lambda: degraded_fields(deadline))),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/analyze_image', methods=['POST'])
 def analyze_image_route():
     """Handle image upload and analysis"""
@@ -176,6 +245,16 @@ def analyze_image_route():
         print(f"❌ Error in analyze_image route: {e}")
         return jsonify({'error': 'Sorry, I encountered an error analyzing the image. Please try again.'}), 500
 
+@app.route('/tasks/sync')
+def sync_tasks_route():
+    """Task changes since ?since=<revision>, or the full list without it"""
+    try:
+        since = request.args.get('since', type=int)
+        return jsonify(get_task_changes(since))
+    except Exception as e:
+        print(f"❌ Error syncing tasks: {e}")
+        return jsonify({'error': 'Failed to sync tasks'}), 500
+
 @app.route('/delete_task/<int:task_id>', methods=['DELETE'])
 def delete_task_route(task_id):
     """Delete a specific task/reminder"""
@@ -209,22 +288,153 @@ def update_task_route(task_id):
         print(f"❌ Error updating task: {e}")
         return jsonify({'error': 'Failed to update task'}), 500
 
+TASK_EXPORT_FIELDS = ['id', 'content', 'task_type', 'datetime', 'created_at', 'completed']
+
+def parse_task_rows(stream, fmt, errors):
+    """Yield (content, task_type, datetime, completed) tuples from an NDJSON or CSV upload
+    
+    Invalid rows are skipped and reported in `errors` as (line, message).
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    records = csv.DictReader(text) if fmt == 'csv' else text
+    
+    for line_no, record in enumerate(records, start=2 if fmt == 'csv' else 1):
+        try:
+            if fmt != 'csv':
+                if not record.strip():
+                    continue
+                record = json.loads(record)
+                if not isinstance(record, dict):
+                    raise ValueError('expected a JSON object')
+            
+            content = (record.get('content') or '').strip()
+            if not content:
+                raise ValueError('missing content')
+            
+            task_datetime = record.get('datetime') or None
+            if task_datetime:
+                parsed = datetime.fromisoformat(task_datetime)
+                if parsed.tzinfo is not None:
+                    # Stored datetimes are naive local time, like every other one the app writes
+                    parsed = parsed.astimezone().replace(tzinfo=None)
+                task_datetime = parsed.isoformat()
+            
+            completed = record.get('completed', False)
+            if isinstance(completed, str):
+                completed = completed.strip().lower() in ('1', 'true', 'yes')
+            
+            yield content, record.get('task_type') or 'reminder', task_datetime, completed
+        except (ValueError, TypeError, AttributeError) as e:
+            errors.append({'line': line_no, 'error': str(e)})
+
+@app.route('/tasks/import', methods=['POST'])
+def import_tasks_route():
+    """Bulk import tasks from an NDJSON (default) or CSV request body"""
+    try:
+        fmt = request.args.get('format') or ('csv' if 'csv' in (request.content_type or '') else 'ndjson')
+        if fmt not in ('csv', 'ndjson'):
+            return jsonify({'error': 'Unsupported format. Use ndjson or csv'}), 400
+        
+        errors = []
+        imported = add_tasks_bulk(parse_task_rows(request.stream, fmt, errors))
+        
+        return jsonify({
+            'imported': imported,
+            'skipped': len(errors),
+            'errors': errors[:100]
+        })
+    except Exception as e:
+        print(f"❌ Error importing tasks: {e}")
+        return jsonify({'error': 'Failed to import tasks'}), 500
+
+@app.route('/tasks/export')
+def export_tasks_route():
+    """Stream tasks as NDJSON (default) or CSV; add completed=1 to include finished tasks"""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': 'Unsupported format. Use ndjson or csv'}), 400
+    include_completed = request.args.get('completed', '').lower() in ('1', 'true', 'yes')
+    
+    def generate_ndjson():
+        for task in iter_tasks(include_completed=include_completed):
+            yield json.dumps(task) + '\n'
+    
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=TASK_EXPORT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for i, task in enumerate(iter_tasks(include_completed=include_completed), start=1):
+            writer.writerow(task)
+            # Flush in batches to keep the number of chunks reasonable
+            if i % 500 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    generate = generate_csv if fmt == 'csv' else generate_ndjson
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename=tasks.{fmt}'}
+    )
+
 @app.route('/chat_history')
 def get_chat_history_route():
-    """Get chat history for current session"""
+    """Get chat history for current session
+    
+    Pass `before` (or `after`) from a previous response's cursors to page
+    through older (or newer) messages.
+    """
     try:
         session_id = session.get('session_id')
         limit = request.args.get('limit', 50, type=int)
+        before = request.args.get('before')
+        after = request.args.get('after')
+        
+        # Fetch one extra row to learn whether another page exists
+        try:
+            history = get_chat_history(limit=limit + 1, session_id=session_id, before=before, after=after)
+        except ValueError:
+            return jsonify({'error': 'Invalid history cursor'}), 400
+        
+        has_more = len(history) > limit
+        if has_more:
+            history = history[:limit] if after and not before else history[1:]
         
-        history = get_chat_history(limit=limit, session_id=session_id)
         return jsonify({
             'history': history,
-            'session_id': session_id
+            'session_id': session_id,
+            'has_more': has_more,
+            'cursors': {
+                'before': encode_history_cursor(history[0]) if history else before,
+                'after': encode_history_cursor(history[-1]) if history else after
+            }
         })
     except Exception as e:
         print(f"❌ Error getting chat history: {e}")
         return jsonify({'error': 'Failed to get chat history'}), 500
 
+@app.route('/search_history')
+def search_history_route():
+    """Search chat history for the current session (scope=all searches every session)"""
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'No search query provided'}), 400
+        
+        limit = min(request.args.get('limit', 20, type=int), 100)
+        session_id = None if request.args.get('scope') == 'all' else session.get('session_id')
+        
+        results = search_chat_history(query, session_id=session_id, limit=limit)
+        return jsonify({
+            'query': query,
+            'results': results
+        })
+    except Exception as e:
+        print(f"❌ Error searching chat history: {e}")
+        return jsonify({'error': 'Failed to search chat history'}), 500
+
 @app.route('/clear_history', methods=['POST'])
 def clear_history_route():
     """Clear chat history for current session"""
@@ -240,16 +450,40 @@ def clear_history_route():
         print(f"❌ Error clearing chat history: {e}")
         return jsonify({'error': 'Failed to clear chat history'}), 500
 
+@app.route('/restore_history', methods=['POST'])
+def restore_history_route():
+    """Bring archived chat history for the current session back into the live table"""
+    try:
+        session_id = session.get('session_id')
+        if not session_id:
+            return jsonify({'error': 'No active session'}), 400
+        
+        restored = rehydrate_session(session_id)
+        return jsonify({'success': True, 'restored': restored})
+    except Exception as e:
+        print(f"❌ Error restoring chat history: {e}")
+        return jsonify({'error': 'Failed to restore chat history'}), 500
+
 @app.route('/history_stats')
 def history_stats_route():
     """Get chat history statistics"""
     try:
-        stats = get_chat_stats()
+        stats = get_chat_stats(session_id=session.get('session_id'))
         return jsonify(stats)
     except Exception as e:
         print(f"❌ Error getting history stats: {e}")
         return jsonify({'error': 'Failed to get history stats'}), 500
 
+@app.route('/providers/routing')
+def provider_routing_route():
+    """Live provider scores and recent routing decisions"""
+    return jsonify(get_provider_routing())
+
+@app.route('/metrics')
+def metrics_route():
+    """Request, provider and database metrics in the Prometheus text format"""
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
 @app.route('/test')
 def test():
     """Test route to check if templates are working"""
@@ -261,6 +495,24 @@ def test_template():
     tasks = get_tasks()
     return render_template('test.html', tasks=tasks)
 
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recompute chat history statistics from scratch"""
+    if not rebuild_chat_stats():
+        raise SystemExit(1)
+
+@app.cli.command('archive-history')
+def archive_history_command():
+    """Archive chat history past its retention limits and compact the database"""
+    result = run_retention()
+    print(f"📦 Archived {result['archived']} messages, freed {result['freed_pages']} pages")
+
+@app.cli.command('restore-history')
+@click.argument('session_id')
+def restore_history_command(session_id):
+    """Restore a session's archived chat history"""
+    rehydrate_session(session_id)
+
 if __name__ == '__main__':
     print("🤖 Aditya AI starting...")
     print("📱 Open http://localhost:8003 in your browser")
@@ -0,0 +1,262 @@
+import asyncio
+import io
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+from werkzeug.utils import secure_filename
+from werkzeug.wrappers import Request
+
+from app import app as flask_app, tasks_payload, allowed_file, ASK_PROVIDER_MODE
+from deadline import request_deadline, degraded_fields
+from router import parse_route
+from metrics import record_request
+from async_providers import ask_ai_question_async, analyze_image_async, close_async_clients
+from models import add_chat_message
+from nlp import detect_intent, process_query
+
+def wsgi_environ(scope, body):
+    """WSGI environ for an ASGI HTTP scope and its (already read) body"""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        if name != 'CONTENT_TYPE':
+            name = 'HTTP_' + name
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+async def read_body(receive, limit):
+    """The request body, or None once it grows past limit bytes"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        size += len(chunks[-1])
+        if limit and size > limit:
+            return None
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+async def send_response(send, status, headers, body=b''):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def send_json(send, payload, status=200):
+    body = json.dumps(payload).encode('utf-8')
+    await send_response(send, status, [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))], body)
+
+# Chunks a streamed WSGI body may run ahead of a slow client
+WSGI_STREAM_BUFFER = int(os.getenv('WSGI_STREAM_BUFFER', '16'))
+
+async def call_wsgi(send, environ):
+    """Run a request through the Flask app on a worker thread, streaming its body back
+    
+    The app is called, its body iterated and closed on one thread in one copied
+    context: stream_with_context generators (SSE, exports) keep the request
+    context in ContextVars that no other thread or context copy can see.
+    """
+    loop = asyncio.get_running_loop()
+    messages = asyncio.Queue()
+    slots = threading.Semaphore(WSGI_STREAM_BUFFER)
+    stopped = threading.Event()
+    started = {}
+    
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = headers
+    
+    def post(kind, value=None):
+        loop.call_soon_threadsafe(messages.put_nowait, (kind, value))
+    
+    def produce():
+        result = None
+        try:
+            result = flask_app(environ, start_response)
+            for chunk in result:
+                slots.acquire()
+                if stopped.is_set():
+                    break
+                post('chunk', chunk)
+            post('end')
+        except Exception as e:
+            post('error', e)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+    
+    producer = asyncio.ensure_future(asyncio.to_thread(produce))
+    try:
+        kind, value = await messages.get()
+        if kind == 'error':
+            raise value
+        await send({
+            'type': 'http.response.start',
+            'status': started['status'],
+            'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in started['headers']],
+        })
+        while kind == 'chunk':
+            slots.release()
+            if value:
+                await send({'type': 'http.response.body', 'body': value, 'more_body': True})
+            kind, value = await messages.get()
+        if kind == 'error':
+            raise value
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        # Stop a producer whose client went away; it closes the body on its own thread
+        stopped.set()
+        slots.release()
+        await producer
+
+def session_id_for(request):
+    """The session_id from the Flask session cookie, if any"""
+    session = flask_app.session_interface.open_session(flask_app, request)
+    return session.get('session_id') if session is not None else None
+
+async def ask(request, send):
+    """Async /ask: same contract as the Flask route, without a thread per waiting request"""
+    try:
+        data = request.get_json(silent=True) or {}
+        user_input = (data.get('question') or '').strip()
+        
+        if not user_input:
+            return await send_json(send, {'error': 'No question provided'}, 400)
+        
+        session_id = session_id_for(request)
+        if detect_intent(user_input) in ['reminder', 'schedule']:
+            # Task actions only touch SQLite; run them on a thread
+            response = await asyncio.to_thread(process_query, user_input)
+            await asyncio.to_thread(add_chat_message, user_input, response, 'task', session_id)
+            payload = await asyncio.to_thread(tasks_payload, data.get('tasks_since'))
+            return await send_json(send, {'response': response, **payload, 'type': 'task_action'})
+        
+        deadline = request_deadline(data.get('deadline_ms'))
+        ai_response = await ask_ai_question_async(user_input, ASK_PROVIDER_MODE, deadline, parse_route(data.get('route')))
+        await asyncio.to_thread(add_chat_message, user_input, ai_response, 'ai_question', session_id)
+        await send_json(send, {'response': ai_response, 'type': 'ai_response', **degraded_fields(deadline)})
+    
+    except Exception as e:
+        print(f"❌ Error in async ask route: {e}")
+        await send_json(send, {'error': 'Sorry, I encountered an error processing your request. Please try again.'}, 500)
+
+async def analyze_image_route(request, send):
+    """Async /analyze_image: same contract as the Flask route"""
+    try:
+        # Parsing a multipart upload is CPU work; keep it off the event loop
+        files = await asyncio.to_thread(lambda: request.files)
+        if 'image' not in files:
+            return await send_json(send, {'error': 'No image file provided'}, 400)
+        
+        file = files['image']
+        if file.filename == '':
+            return await send_json(send, {'error': 'No image file selected'}, 400)
+        
+        if not allowed_file(file.filename):
+            return await send_json(send, {'error': 'Invalid file type. Allowed: PNG, JPG, JPEG, GIF, BMP, WEBP'}, 400)
+        
+        prompt = request.form.get('prompt', 'Describe this image in detail.')
+        
+        filename = datetime.now().strftime('%Y%m%d_%H%M%S_') + secure_filename(file.filename)
+        filepath = os.path.join(flask_app.config['UPLOAD_FOLDER'], filename)
+        await asyncio.to_thread(file.save, filepath)
+        
+        try:
+            analysis_result = await analyze_image_async(filepath, prompt)
+        finally:
+            try:
+                os.remove(filepath)
+            except OSError:
+                pass
+        
+        session_id = session_id_for(request)
+        user_message = f"📷 {prompt}" if prompt != 'Describe this image in detail.' else "📷 Image analysis request"
+        await asyncio.to_thread(add_chat_message, user_message, analysis_result, 'image', session_id)
+        
+        await send_json(send, {'response': analysis_result, 'type': 'image_analysis'})
+    
+    except Exception as e:
+        print(f"❌ Error in async analyze_image route: {e}")
+        await send_json(send, {'error': 'Sorry, I encountered an error analyzing the image. Please try again.'}, 500)
+
+# Routes served natively on the event loop; everything else goes through Flask
+ASYNC_ROUTES = {
+    ('POST', '/ask'): ask,
+    ('POST', '/analyze_image'): analyze_image_route,
+}
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_async_clients()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    """ASGI entry point: `uvicorn asgi:app`
+    
+    AI questions and image analysis await the providers on the event loop, so
+    one process can hold hundreds of them in flight; the other routes run the
+    Flask app on worker threads.
+    """
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+    
+    body = await read_body(receive, flask_app.config.get('MAX_CONTENT_LENGTH'))
+    if body is None:
+        return await send_json(send, {'error': 'Request too large'}, 413)
+    
+    environ = wsgi_environ(scope, body)
+    handler = ASYNC_ROUTES.get((scope['method'], scope['path']))
+    if handler is None:
+        return await call_wsgi(send, environ)
+    
+    # Flask times its own routes; time the ones served here the same way
+    start = time.perf_counter()
+    status = {}
+    
+    async def send_and_note_status(message):
+        if message['type'] == 'http.response.start':
+            status['code'] = message['status']
+        await send(message)
+    
+    try:
+        await handler(Request(environ), send_and_note_status)
+    finally:
+        record_request(scope['path'], scope['method'], status.get('code', 500), time.perf_counter() - start)
@@ -0,0 +1,301 @@
+import asyncio
+import os
+import time
+
+import nlp
+from deadline import Deadline
+from singleflight import AsyncSingleFlight
+from nlp import (
+    PROVIDER_ERRORS, PROVIDER_NAMES, SYSTEM_PROMPT, classify_provider_error, clean_user_input,
+    get_predefined_answer, get_similar_answer, remember_answer, response_cache_key, flight_key,
+    build_vision_messages, image_analysis_unavailable, image_analysis_error,
+)
+
+# Per-call limits, and the shared connection pool behind every async provider client
+AI_REQUEST_TIMEOUT_S = float(os.getenv('AI_REQUEST_TIMEOUT_S', '30'))
+AI_CONNECT_TIMEOUT_S = float(os.getenv('AI_CONNECT_TIMEOUT_S', '5'))
+AI_HTTP_MAX_CONNECTIONS = int(os.getenv('AI_HTTP_MAX_CONNECTIONS', '200'))
+AI_HTTP_MAX_KEEPALIVE = int(os.getenv('AI_HTTP_MAX_KEEPALIVE', '50'))
+AI_HTTP_KEEPALIVE_S = float(os.getenv('AI_HTTP_KEEPALIVE_S', '30'))
+
+# Coalesces identical questions on the event loop, like nlp.provider_flights for threads
+provider_flights = AsyncSingleFlight()
+
+class AsyncProviderClients:
+    """Long-lived async provider clients for one event loop
+    
+    DeepSeek and OpenAI share one pooled httpx.AsyncClient, so connections
+    (and their TLS sessions) are kept alive and reused across requests.
+    Gemini's GenerativeModel from nlp.py already has generate_content_async.
+    """
+    
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.http = None
+        self.deepseek = None
+        self.openai = None
+        self.gemini = nlp.get_provider_client('gemini')
+        
+        if nlp.USE_DEEPSEEK or nlp.USE_OPENAI:
+            # The OpenAI SDK's async client runs on httpx; both come with `pip install openai`
+            try:
+                import httpx
+                from openai import AsyncOpenAI
+            except ImportError:
+                print("⚠️  OpenAI library not installed. Async DeepSeek/OpenAI calls will not be available.")
+                return
+            
+            self.http = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=AI_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=AI_HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=AI_HTTP_KEEPALIVE_S,
+                ),
+                timeout=httpx.Timeout(AI_REQUEST_TIMEOUT_S, connect=AI_CONNECT_TIMEOUT_S),
+            )
+            if nlp.USE_DEEPSEEK:
+                self.deepseek = AsyncOpenAI(api_key=nlp.DEEPSEEK_API_KEY, base_url=nlp.DEEPSEEK_BASE_URL,
+                                            http_client=self.http, max_retries=nlp.AI_MAX_RETRIES)
+            if nlp.USE_OPENAI:
+                self.openai = AsyncOpenAI(api_key=nlp.OPENAI_API_KEY, base_url=nlp.OPENAI_BASE_URL,
+                                          http_client=self.http, max_retries=nlp.AI_MAX_RETRIES)
+    
+    async def aclose(self):
+        if self.http is not None:
+            await self.http.aclose()
+
+_clients = None
+
+def get_async_clients():
+    """The provider clients for the running event loop, created on first use"""
+    global _clients
+    if _clients is None or _clients.loop is not asyncio.get_running_loop():
+        _clients = AsyncProviderClients()
+    return _clients
+
+async def close_async_clients():
+    """Close the pooled connections (call on server shutdown)"""
+    global _clients
+    if _clients is not None:
+        await _clients.aclose()
+        _clients = None
+
+async def _cached(provider, model, question, request, timeout=None):
+    """Run `request()` and cache its answer; the same contract as nlp.query_*"""
+    label = PROVIDER_NAMES[provider]
+    timeout = AI_REQUEST_TIMEOUT_S if timeout is None else min(timeout, AI_REQUEST_TIMEOUT_S)
+    try:
+        answer = await asyncio.wait_for(request(), timeout)
+    except asyncio.TimeoutError:
+        print(f"❌ {label} API timed out after {timeout:.1f}s")
+        return None
+    except Exception as e:
+        print(f"❌ {label} API error: {e}")
+        kind = classify_provider_error(e)
+        return kind if kind in PROVIDER_ERRORS else None
+    
+    if answer:
+        answer = answer.strip()
+        nlp.response_cache.put(response_cache_key(provider, model, question), answer)
+    return answer or None
+
+async def _chat_completion(client, model, question):
+    response = await client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": question}
+        ],
+        max_tokens=nlp.AI_MAX_TOKENS,
+        temperature=nlp.AI_TEMPERATURE
+    )
+    if response.choices and response.choices[0].message.content:
+        return response.choices[0].message.content
+    return None
+
+async def query_deepseek_async(question, timeout=None):
+    client = get_async_clients().deepseek
+    return await _cached('deepseek', nlp.DEEPSEEK_MODEL, question,
+                         lambda: _chat_completion(client, nlp.DEEPSEEK_MODEL, question), timeout)
+
+async def query_openai_async(question, timeout=None):
+    client = get_async_clients().openai
+    return await _cached('openai', nlp.OPENAI_MODEL, question,
+                         lambda: _chat_completion(client, nlp.OPENAI_MODEL, question), timeout)
+
+async def query_gemini_async(question, timeout=None):
+    client = get_async_clients().gemini
+    
+    async def request():
+        response = await client.generate_content_async(f"""{SYSTEM_PROMPT}
+
+User question: {question}""")
+        return response.text
+    
+    return await _cached('gemini', nlp.GEMINI_MODEL, question, request, timeout)
+
+def configured_async_providers():
+    """(name, async query function) for each usable provider, in fallback order"""
+    clients = get_async_clients()
+    providers = []
+    if nlp.USE_DEEPSEEK and clients.deepseek:
+        providers.append(('deepseek', query_deepseek_async))
+    if nlp.USE_OPENAI and clients.openai:
+        providers.append(('openai', query_openai_async))
+    if nlp.USE_GEMINI and clients.gemini:
+        providers.append(('gemini', query_gemini_async))
+    return providers
+
+async def call_provider_async(name, query, question, deadline=None):
+    """Ask one provider and record the outcome on its breaker, the router and the metrics; the answer or None"""
+    breaker = nlp.provider_breakers[name]
+    start = time.monotonic()
+    try:
+        admitted = await nlp.provider_limiters[name].acquire_async(nlp.estimate_request_tokens(question),
+                                                                   nlp.admission_wait(name, deadline))
+        nlp.record_admission(name, admitted, time.monotonic() - start)
+        if not admitted:
+            # The provider was never asked, so a half-open probe is still free
+            breaker.release_probe()
+            return None
+        start = time.monotonic()
+        # A cancelled (losing) request raises here and is not counted
+        answer = await (query(question, deadline.remaining()) if deadline else query(question))
+    except asyncio.CancelledError:
+        # An abandoned request says nothing about the provider's health; free its probe
+        breaker.release_probe()
+        raise
+    outcome = nlp.attempt_outcome(answer)
+    nlp.record_attempt(name, outcome, time.monotonic() - start)
+    if outcome == 'success':
+        breaker.record_success()
+        return answer
+    breaker.record_failure(outcome)
+    return None
+
+async def query_providers_hedged_async(question, providers, delay, deadline=None):
+    """Asyncio version of nlp.query_providers_hedged; losing requests are cancelled"""
+    remaining = iter(providers)
+    pending = {}
+    
+    def launch_next():
+        for name, query in remaining:
+            if nlp.provider_breakers[name].allow():
+                pending[asyncio.ensure_future(call_provider_async(name, query, question, deadline))] = name
+                return True
+        return False
+    
+    more = launch_next()
+    while more and delay <= 0:
+        more = launch_next()
+    
+    try:
+        while pending:
+            timeout = delay if more else None
+            if deadline:
+                if deadline.expired():
+                    break
+                timeout = deadline.remaining() if timeout is None else min(timeout, deadline.remaining())
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                del pending[task]
+                if task.result():
+                    return task.result()
+            # Either the hedge delay passed or a provider failed: bring in the next one
+            if more:
+                more = launch_next()
+        return None
+    finally:
+        for task, name in pending.items():
+            # A task cancelled before it started never gets to release its own probe
+            if task.cancel():
+                nlp.provider_breakers[name].release_probe()
+
+async def query_ai_providers_async(question, mode=None, deadline=None, route=None):
+    """Asyncio version of nlp.query_ai_providers, sharing its circuit breakers and router"""
+    mode = mode or nlp.AI_PROVIDER_MODE
+    providers = nlp.route_providers(configured_async_providers(), route)
+    if mode in ('hedged', 'race') and len(providers) > 1:
+        delay = 0 if mode == 'race' else nlp.AI_HEDGE_DELAY_MS / 1000
+        return await query_providers_hedged_async(question, providers, delay, deadline)
+    
+    for name, query in providers:
+        if deadline and deadline.expired():
+            break
+        if not nlp.provider_breakers[name].allow():
+            continue
+        answer = await call_provider_async(name, query, question, deadline)
+        if answer:
+            return answer
+    return None
+
+async def fetch_ai_answer_async(question, provider_mode=None, deadline=None, route=None):
+    """Like nlp.fetch_ai_answer: (answer or None, whether the deadline ran out)"""
+    answer = await query_ai_providers_async(question, provider_mode, deadline, route)
+    if answer:
+        remember_answer(question, answer)
+    return answer, not answer and deadline is not None and deadline.expired()
+
+async def answer_with_ai_async(question, provider_mode=None, deadline=None, route=None):
+    """Async variant of nlp.answer_with_ai"""
+    deadline = deadline or Deadline()
+    configured = [name for name, _ in configured_async_providers()]
+    answer = nlp.cached_provider_answer(question, configured, route) or get_similar_answer(question)
+    if answer:
+        nlp.answers_served.inc('cache')
+        return answer
+    while True:
+        try:
+            answer, timed_out = await provider_flights.do(flight_key(question, provider_mode, route),
+                                                          fetch_ai_answer_async, question, provider_mode, deadline,
+                                                          route, timeout=deadline.remaining())
+        except asyncio.TimeoutError:
+            answer, timed_out = None, True
+        # As in nlp.answer_with_ai, a leader that ran out of its own budget is no answer for this one
+        if answer or not timed_out or deadline.expired():
+            break
+    if not answer and deadline.expired():
+        deadline.exceeded = True
+    nlp.answers_served.inc('provider' if answer else 'builtin')
+    return answer
+
+async def ask_ai_question_async(user_input, provider_mode=None, deadline=None, route=None):
+    """Async variant of nlp.ask_ai_question: the event loop is free while providers answer"""
+    try:
+        cleaned_input = clean_user_input(user_input)
+        if not cleaned_input:
+            return "Please provide a valid question."
+        
+        answer = await answer_with_ai_async(cleaned_input, provider_mode, deadline, route)
+        return answer or get_predefined_answer(cleaned_input)
+    
+    except Exception as e:
+        print(f"❌ Error in ask_ai_question_async: {e}")
+        return get_predefined_answer(user_input)
+
+async def analyze_image_async(image_path, prompt="Describe this image in detail."):
+    """Async variant of nlp.analyze_image"""
+    try:
+        try:
+            import PIL
+        except ImportError:
+            return "⚠️ Image processing requires Pillow library. Please install it with: pip install Pillow"
+        
+        client = get_async_clients().openai
+        if nlp.USE_OPENAI and client:
+            try:
+                # Decoding and re-encoding the image is CPU work; keep it off the event loop
+                messages = await asyncio.to_thread(build_vision_messages, image_path, prompt)
+                response = await asyncio.wait_for(
+                    client.chat.completions.create(model=nlp.VISION_MODEL, messages=messages, max_tokens=300),
+                    AI_REQUEST_TIMEOUT_S
+                )
+                if response.choices and response.choices[0].message.content:
+                    return f"🖼️ **Image Analysis**: {response.choices[0].message.content.strip()}"
+            except Exception as openai_error:
+                print(f"❌ OpenAI vision error: {openai_error}")
+        
+        return image_analysis_unavailable()
+    
+    except Exception as e:
+        return image_analysis_error(e)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark requests/sec on /ask and /process with the pooled connection manager
+versus the old open-and-close-per-call connection.
+
+Usage: python benchmarks/bench_db.py [--requests 2000] [--threads 4]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the benchmark offline: built-in answers only
+for key in ('DEEPSEEK_API_KEY', 'OPENAI_API_KEY', 'GEMINI_API_KEY'):
+    os.environ.pop(key, None)
+
+import models
+
+def legacy_connection():
+    """The pre-pooling behaviour: a fresh default-journal connection per call"""
+    conn = sqlite3.connect(models.DATABASE)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+ASK_QUESTIONS = ['what is ai', 'how do I sleep better?', 'tell me about python', 'hello']
+PROCESS_QUERIES = ['remind me to call mom tomorrow', 'what time is it?', 'schedule meeting at 3pm']
+
+def run(client, route, payloads, key, total, threads):
+    """Fire `total` POSTs at `route` spread over `threads` threads, return req/s"""
+    per_thread = total // threads
+    errors = []
+    
+    def worker():
+        # The Flask test client is not thread-safe, so each thread gets its own
+        local_client = client.application.test_client()
+        with local_client.session_transaction() as sess:
+            sess['session_id'] = 'bench'
+        for i in range(per_thread):
+            resp = local_client.post(route, json={key: payloads[i % len(payloads)]})
+            if resp.status_code != 200:
+                errors.append(resp.status_code)
+        models.close_db_connection()
+    
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    
+    if errors:
+        print(f"⚠️  {len(errors)} failed requests on {route}")
+    return (per_thread * threads) / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        models.DATABASE = os.path.join(tmp, 'bench.db')
+        
+        from app import app
+        client = app.test_client()
+        pooled_connection = models.get_db_connection
+        
+        results = {}
+        for label, factory in (('before (per-call)', legacy_connection), ('after (pooled)', pooled_connection)):
+            # Fresh database per run so both start from the same task backlog
+            models.DATABASE = os.path.join(tmp, f'bench_{len(results)}.db')
+            models.get_db_connection = factory
+            models.init_db()
+            for route, payloads, key in (('/ask', ASK_QUESTIONS, 'question'), ('/process', PROCESS_QUERIES, 'query')):
+                results[(label, route)] = run(client, route, payloads, key, args.requests, args.threads)
+        models.get_db_connection = pooled_connection
+    
+    print(f"\n📊 {args.requests} requests, {args.threads} threads")
+    for route in ('/ask', '/process'):
+        before = results[('before (per-call)', route)]
+        after = results[('after (pooled)', route)]
+        print(f"{route:10} before {before:8.1f} req/s   after {after:8.1f} req/s   ({after / before:.2f}x)")
+
+if __name__ == '__main__':
+    main()
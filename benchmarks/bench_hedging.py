@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Compare question latency for the sequential, hedged and race provider modes.
+
+Uses in-process fake providers with a long-tailed latency profile: DeepSeek is
+usually fast but sometimes stalls, and some of its stalls end in an error.
+
+Usage: python benchmarks/bench_hedging.py [--questions 200] [--hedge-delay-ms 150]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nlp
+from circuit_breaker import CircuitBreaker
+from provider_registry import ProviderRegistry
+from response_cache import ResponseCache, SemanticCache
+
+# (probability, seconds, fails) buckets per provider
+PROFILES = {
+    'deepseek': [(0.85, 0.08, False), (0.10, 0.8, False), (0.05, 0.8, True)],
+    'openai': [(0.95, 0.12, False), (0.05, 0.4, False)],
+    'gemini': [(1.0, 0.2, False)],
+}
+
+class FakeProvider:
+    """Answers like an OpenAI-compatible or Gemini client, with latency drawn from a profile"""
+    
+    def __init__(self, name, rng):
+        self.name = name
+        self.rng = rng
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+    
+    def _respond(self):
+        self.calls += 1
+        roll = self.rng.random()
+        for probability, seconds, fails in PROFILES[self.name]:
+            if roll < probability:
+                break
+            roll -= probability
+        time.sleep(seconds * self.rng.uniform(0.8, 1.2))
+        if fails:
+            raise Exception('upstream timeout')
+        return f"{self.name} answer"
+    
+    def create(self, model, messages, **kwargs):
+        message = SimpleNamespace(content=self._respond())
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+    
+    def generate_content(self, prompt, **kwargs):
+        return SimpleNamespace(text=self._respond())
+
+def run(mode, questions, seed):
+    rng = random.Random(seed)
+    fakes = {name: FakeProvider(name, rng) for name in PROFILES}
+    for name in fakes:
+        setattr(nlp, f'USE_{name.upper()}', True)
+    nlp.provider_clients = ProviderRegistry(fakes)
+    # Fresh health state, and failures must not take DeepSeek out of the comparison
+    nlp.provider_breakers = {name: CircuitBreaker(name, failure_threshold=10 ** 9) for name in nlp.PROVIDER_NAMES}
+    
+    timings = []
+    for i in range(questions):
+        start = time.perf_counter()
+        # Pinned to the fallback order, so only the mode differs between runs
+        nlp.query_ai_providers(f"benchmark question {i}", mode, route=list(PROFILES))
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    calls = sum(fake.calls for fake in fakes.values()) / questions
+    return statistics.median(timings), timings[int(len(timings) * 0.99)], calls
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--questions', type=int, default=200)
+    parser.add_argument('--hedge-delay-ms', type=int, default=150)
+    args = parser.parse_args()
+    
+    nlp.AI_HEDGE_DELAY_MS = args.hedge_delay_ms
+    nlp.response_cache = ResponseCache(max_entries=0)
+    nlp.semantic_cache = SemanticCache(capacity=0)
+    
+    print(f"{'mode':<12}{'p50 ms':>10}{'p99 ms':>10}{'calls/question':>16}")
+    for mode in nlp.PROVIDER_MODES:
+        # Keep the providers' error log lines out of the table
+        with contextlib.redirect_stdout(io.StringIO()):
+            p50, p99, calls = run(mode, args.questions, seed=7)
+        print(f"{mode:<12}{p50:>10.0f}{p99:>10.0f}{calls:>16.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark knowledge base startup and lookup latency with a large synthetic knowledge base.
+
+Usage: python benchmarks/bench_knowledge.py [--entries 5000] [--queries 5000]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge import load_knowledge_base
+
+WORDS = ('alpha beta gamma delta omega python garden river cloud stone music paper light '
+         'engine market ocean forest winter summer signal vector planet story health').split()
+FILLER = 'what is the best way to learn about how do i get started with tell me more'.split()
+
+def synthetic_entries(count, rng):
+    """Entries with one to five keywords of one to three words each"""
+    entries = []
+    for i in range(count):
+        keywords = {' '.join(rng.choices(WORDS, k=rng.randint(1, 3))) + f' {i}' * (rng.random() < 0.5)
+                    for _ in range(rng.randint(1, 5))}
+        entries.append({'id': f'entry-{i}', 'keywords': sorted(keywords), 'answer': f'Answer {i}'})
+    return entries
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entries', type=int, default=5000)
+    parser.add_argument('--queries', type=int, default=5000)
+    args = parser.parse_args()
+    rng = random.Random(42)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'kb.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'entries': synthetic_entries(args.entries, rng)}, f)
+        
+        start = time.perf_counter()
+        load_knowledge_base(path)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        knowledge_base = load_knowledge_base(path)
+        cached = time.perf_counter() - start
+        print(f"{args.entries} entries, {len(knowledge_base.postings)} terms")
+        print(f"load: {cold * 1000:.1f} ms building the index, {cached * 1000:.1f} ms from the cache")
+    
+    queries = [' '.join(rng.choices(FILLER, k=rng.randint(2, 6)) + rng.choices(WORDS, k=rng.randint(1, 3)))
+               for _ in range(args.queries)]
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        knowledge_base.search(query)
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    print(f"search: p50 {statistics.median(timings):.1f} µs, "
+          f"p99 {timings[int(len(timings) * 0.99)]:.1f} µs, max {timings[-1]:.1f} µs")
+
+if __name__ == '__main__':
+    main()
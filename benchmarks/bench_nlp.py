@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark keyword matching in detect_intent.
+
+Compares the compiled KeywordMatcher against a plain substring scan over the
+same keyword table (what nlp.py did before the matcher).
+
+Usage: python benchmarks/bench_nlp.py [--queries 5000] [--runs 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nlp
+
+TEMPLATES = [
+    'what is {}?', 'can you tell me about {}', 'remind me to {} tomorrow at 5pm',
+    'schedule a {} meeting next week', 'how do I get better at {}', '{}',
+    'I was reading an article about {} yesterday and wondered whether it is worth it',
+]
+TOPICS = ['machine learning', 'python', 'sleep', 'meditation', 'climate change', 'career',
+          'pottery', 'sourdough bread', 'chess openings', 'the weather', 'call mom', 'hi']
+
+def scan_intent(text):
+    text_lower = text.lower()
+    for intent, keywords in nlp.INTENT_KEYWORDS:
+        if any(keyword in text_lower for keyword in keywords):
+            return intent
+    return 'question'
+
+def timed(func, queries, runs):
+    """Best per-query time in microseconds over `runs` passes"""
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        for query in queries:
+            func(query)
+        best = min(best, time.perf_counter() - start)
+    return best / len(queries) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--queries', type=int, default=5000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    rng = random.Random(42)
+    queries = [rng.choice(TEMPLATES).format(rng.choice(TOPICS)) for _ in range(args.queries)]
+    
+    before = timed(scan_intent, queries, args.runs)
+    after = timed(nlp.detect_intent, queries, args.runs)
+    print(f"detect_intent: scan {before:.2f} µs, matcher {after:.2f} µs ({before / after:.1f}x)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Compare the fixed fallback order with adaptive provider routing.
+
+Uses in-process fake providers. DeepSeek starts fast, degrades (slow and
+flaky) for the middle third of the questions, then recovers; OpenAI and
+Gemini stay steady. Questions are asked sequentially, so the run lasts
+seconds rather than hours: pass a --half-life-s to match.
+
+Usage: python benchmarks/bench_routing.py [--questions 300] [--explore-rate 0.05] [--half-life-s 0.5]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nlp
+from circuit_breaker import CircuitBreaker
+from provider_registry import ProviderRegistry
+from response_cache import ResponseCache, SemanticCache
+from router import ProviderRouter
+
+# (seconds, failure probability) per provider; DeepSeek's second entry is its degraded phase
+PROFILES = {
+    'deepseek': [(0.03, 0.0), (0.25, 0.3)],
+    'openai': [(0.06, 0.0)],
+    'gemini': [(0.09, 0.0)],
+}
+
+class FakeProvider:
+    """Answers like an OpenAI-compatible or Gemini client, with latency from its current phase"""
+    
+    def __init__(self, name, rng):
+        self.name = name
+        self.rng = rng
+        self.degraded = False
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+    
+    def _respond(self):
+        self.calls += 1
+        profile = PROFILES[self.name]
+        seconds, failure_rate = profile[1] if self.degraded and len(profile) > 1 else profile[0]
+        time.sleep(seconds * self.rng.uniform(0.8, 1.2))
+        if self.rng.random() < failure_rate:
+            raise Exception('upstream error')
+        return f"{self.name} answer"
+    
+    def create(self, model, messages, **kwargs):
+        message = SimpleNamespace(content=self._respond())
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+    
+    def generate_content(self, prompt, **kwargs):
+        return SimpleNamespace(text=self._respond())
+
+PHASES = ('healthy', 'degraded', 'recovered')
+
+def run(adaptive, questions, args, seed):
+    rng = random.Random(seed)
+    fakes = {name: FakeProvider(name, rng) for name in PROFILES}
+    for name in fakes:
+        setattr(nlp, f'USE_{name.upper()}', True)
+    nlp.provider_clients = ProviderRegistry(fakes)
+    # Failures must not open DeepSeek's breaker: the router alone decides
+    nlp.provider_breakers = {name: CircuitBreaker(name, failure_threshold=10 ** 9) for name in nlp.PROVIDER_NAMES}
+    nlp.provider_router = ProviderRouter(explore_rate=args.explore_rate, half_life=args.half_life_s,
+                                         rng=random.Random(seed))
+    route = None if adaptive else list(PROFILES)
+    
+    timings = {phase: [] for phase in PHASES}
+    first_choices = Counter()
+    for i in range(questions):
+        phase = PHASES[min(i * len(PHASES) // questions, len(PHASES) - 1)]
+        fakes['deepseek'].degraded = phase == 'degraded'
+        start = time.perf_counter()
+        nlp.query_ai_providers(f"benchmark question {i}", 'sequential', route=route)
+        timings[phase].append((time.perf_counter() - start) * 1000)
+        if phase == 'recovered':
+            first_choices[nlp.provider_router.recent[-1]['order'][0]] += 1
+    everything = sorted(t for phase_timings in timings.values() for t in phase_timings)
+    calls = sum(fake.calls for fake in fakes.values()) / questions
+    means = [statistics.mean(timings[phase]) for phase in PHASES]
+    return means, everything[int(len(everything) * 0.99)], calls, first_choices
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--questions', type=int, default=300)
+    parser.add_argument('--explore-rate', type=float, default=0.05)
+    parser.add_argument('--half-life-s', type=float, default=0.5)
+    args = parser.parse_args()
+    
+    nlp.response_cache = ResponseCache(max_entries=0)
+    nlp.semantic_cache = SemanticCache(capacity=0)
+    
+    print("mean ms per phase, then p99 and calls over the whole run; first choices once DeepSeek has recovered")
+    print(f"{'routing':<10}" + ''.join(f"{phase:>11}" for phase in PHASES)
+          + f"{'p99 ms':>9}{'calls/q':>9}  first choice")
+    for label, adaptive in (('fixed', False), ('adaptive', True)):
+        # Keep the providers' error log lines out of the table
+        with contextlib.redirect_stdout(io.StringIO()):
+            means, p99, calls, first_choices = run(adaptive, args.questions, args, seed=7)
+        shares = ', '.join(f"{name} {count}" for name, count in first_choices.most_common())
+        print(f"{label:<10}" + ''.join(f"{mean:>11.0f}" for mean in means) + f"{p99:>9.0f}{calls:>9.2f}  {shares}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark search_chat_history latency over a synthetic chat history.
+
+Usage: python benchmarks/bench_search.py [--messages 1000000] [--sessions 5000]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models
+
+TOPICS = ['machine learning', 'python programming', 'sleep schedule', 'meditation', 'climate change',
+          'career advice', 'javascript frameworks', 'blockchain', 'workout plan', 'public speaking']
+FILLER = ('the a of to and in is for on with how what why can you explain tell me more about '
+          'today tomorrow week help idea thing example quick detail simple').split()
+QUERIES = ['machine learning', 'meditation', 'blockchain wallet', 'career', 'python', 'zebra']
+
+def synthetic_rows(count, sessions, rng):
+    """Yield chat_history rows with a mix of topic words and filler"""
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        topic = rng.choice(TOPICS)
+        question = f"{' '.join(rng.choices(FILLER, k=4))} {topic}?"
+        answer = f"{topic.capitalize()} {' '.join(rng.choices(FILLER, k=20))}"
+        if i % 1000 == 0:
+            answer += ' zebra'
+        created_at = (start + timedelta(seconds=i * 30)).isoformat()
+        yield (question, answer, 'ai_question', created_at, f"session-{rng.randrange(sessions)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=1_000_000)
+    parser.add_argument('--sessions', type=int, default=5000)
+    parser.add_argument('--runs', type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(42)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        models.DATABASE = os.path.join(tmp, 'search.db')
+        models.init_db()
+        conn = models.get_db_connection()
+        
+        print(f"⏳ Loading {args.messages:,} messages...")
+        start = time.perf_counter()
+        rows = synthetic_rows(args.messages, args.sessions, rng)
+        with conn:
+            conn.executemany(models.INSERT_CHAT_MESSAGE_SQL, rows)
+        print(f"✅ Loaded in {time.perf_counter() - start:.1f}s")
+        
+        print(f"\n📊 {args.runs} searches per query, limit 20")
+        for scope in ('all sessions', 'one session'):
+            for query in QUERIES:
+                timings = []
+                for _ in range(args.runs):
+                    session_id = f"session-{rng.randrange(args.sessions)}" if scope == 'one session' else None
+                    t0 = time.perf_counter()
+                    models.search_chat_history(query, session_id=session_id, limit=20)
+                    timings.append((time.perf_counter() - t0) * 1000)
+                timings.sort()
+                p99 = timings[int(len(timings) * 0.99) - 1]
+                print(f"{scope:13} {query!r:20} p50 {statistics.median(timings):7.2f} ms   p99 {p99:7.2f} ms")
+
+if __name__ == '__main__':
+    main()
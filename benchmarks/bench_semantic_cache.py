@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark SemanticCache lookup and insert latency with a full cache.
+
+Usage: python benchmarks/bench_semantic_cache.py [--entries 100000] [--lookups 2000]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_cache import SemanticCache, NUMPY_AVAILABLE
+
+PREFIXES = ['what is', 'explain', 'how do I use', 'tell me about', 'why does', 'best way to learn']
+WORDS = ('python rust java kubernetes docker garden sourdough marathon budget guitar chess '
+         'photography spanish calculus quantum blockchain sleep meditation resume interview '
+         'investing climate volcano telescope origami bicycle coffee painting poetry').split()
+
+def question(rng):
+    return f"{rng.choice(PREFIXES)} {' '.join(rng.sample(WORDS, rng.randint(1, 3)))} {rng.randrange(100000)}"
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return (f"p50 {statistics.median(timings):.2f} ms, p99 {timings[int(len(timings) * 0.99)]:.2f} ms, "
+            f"max {timings[-1]:.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entries', type=int, default=100_000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+    if not NUMPY_AVAILABLE:
+        sys.exit('NumPy is required: pip install numpy')
+    rng = random.Random(42)
+    
+    cache = SemanticCache(capacity=args.entries, ttl=3600)
+    stored = [question(rng) for _ in range(args.entries)]
+    start = time.perf_counter()
+    for text in stored:
+        cache.put(text, text)
+    print(f"filled {args.entries} entries in {time.perf_counter() - start:.1f} s "
+          f"({cache._matrix.nbytes / 2 ** 20:.0f} MiB matrix)")
+    
+    # Half repeats of stored questions with different filler, half new questions
+    queries = [rng.choice(stored).replace('what is', 'explain', 1) if i % 2 else question(rng)
+               for i in range(args.lookups)]
+    timings = []
+    for text in queries:
+        start = time.perf_counter()
+        cache.lookup(text)
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"lookup: {percentiles(timings)}, hit rate {cache.stats()['hit_rate']:.0%}")
+    
+    timings = []
+    for _ in range(args.lookups // 10):
+        text = question(rng)
+        start = time.perf_counter()
+        cache.put(text, text)
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"insert into a full cache (LRU eviction): {percentiles(timings)}")
+
+if __name__ == '__main__':
+    main()
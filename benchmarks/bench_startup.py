@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark how long it takes to import the app's entry modules.
+
+Each module is imported in a fresh interpreter under `python -X importtime`;
+the report shows the median cumulative import time, the slowest imports, and
+any heavy optional libraries (provider SDKs, NumPy) that were loaded eagerly.
+It exits non-zero when one was, or when a module takes longer than
+--budget-ms, so it can be used as a regression check.
+
+Usage: python benchmarks/bench_startup.py [--modules nlp app] [--runs 5] [--top 8] [--budget-ms 0]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries only needed once a question reaches a provider or the semantic cache
+LAZY_MODULES = ('openai', 'httpx', 'google.generativeai', 'numpy', 'PIL')
+
+CHECK_LAZY = "import sys; print('loaded:' + ','.join(m for m in {!r} if m in sys.modules))"
+
+def import_times(module):
+    """(cumulative microseconds per imported module, lazy modules that got loaded) for one cold import"""
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE='1')
+    # Run from a scratch directory: importing app creates its database and upload folder
+    with tempfile.TemporaryDirectory() as scratch:
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f"import {module}; " + CHECK_LAZY.format(LAZY_MODULES)],
+            cwd=scratch, env=env, capture_output=True, text=True, check=True
+        )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    loaded = result.stdout.rsplit('loaded:', 1)[-1].strip()
+    return times, [name for name in loaded.split(',') if name]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--modules', nargs='+', default=['nlp', 'app'])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8)
+    parser.add_argument('--budget-ms', type=float, default=0, help='fail if a module takes longer (0: no limit)')
+    args = parser.parse_args()
+    
+    failures = []
+    for module in args.modules:
+        runs = [import_times(module) for _ in range(args.runs)]
+        total_ms = statistics.median(times[module] for times, _ in runs) / 1000
+        print(f"import {module}: {total_ms:.1f} ms (median of {args.runs} cold imports)")
+        
+        times, loaded = runs[-1]
+        slowest = sorted(((us, name) for name, us in times.items() if name != module), reverse=True)
+        for us, name in slowest[:args.top]:
+            print(f"  {us / 1000:8.1f} ms  {name}")
+        if loaded:
+            print(f"  ⚠️ loaded eagerly: {', '.join(loaded)}")
+            failures.append(f"{module} imports {', '.join(loaded)}")
+        if args.budget_ms and total_ms > args.budget_ms:
+            failures.append(f"{module} is over the {args.budget_ms:.0f} ms budget")
+    
+    if failures:
+        sys.exit('; '.join(failures))
+
+if __name__ == '__main__':
+    main()
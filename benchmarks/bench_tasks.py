@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark bulk task import/export throughput against one-at-a-time /process calls.
+
+Usage: python benchmarks/bench_tasks.py [--tasks 100000]
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for key in ('DEEPSEEK_API_KEY', 'OPENAI_API_KEY', 'GEMINI_API_KEY'):
+    os.environ.pop(key, None)
+
+import models
+
+def ndjson_body(count):
+    return '\n'.join(json.dumps({'content': f'task {i}', 'task_type': 'schedule',
+                                 'datetime': f'2025-{i % 12 + 1:02d}-01T09:00:00'}) for i in range(count))
+
+def csv_body(count):
+    rows = [f'task {i},schedule,2025-{i % 12 + 1:02d}-01T09:00:00' for i in range(count)]
+    return 'content,task_type,datetime\n' + '\n'.join(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=100_000)
+    parser.add_argument('--process-sample', type=int, default=500,
+                        help='tasks created one at a time through /process for comparison')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        models.DATABASE = os.path.join(tmp, 'bench.db')
+        from app import app
+        client = app.test_client()
+        results = []
+        
+        # Baseline: one /process round trip per task (each also re-reads get_tasks())
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            for i in range(args.process_sample):
+                client.post('/process', json={'query': f'remind me to do task {i}'})
+        results.append(('/process one at a time', args.process_sample, time.perf_counter() - start))
+        
+        for fmt, body, content_type in (('ndjson', ndjson_body(args.tasks), 'application/x-ndjson'),
+                                        ('csv', csv_body(args.tasks), 'text/csv')):
+            start = time.perf_counter()
+            resp = client.post('/tasks/import', data=body, content_type=content_type)
+            assert resp.json['imported'] == args.tasks, resp.json
+            results.append((f'/tasks/import {fmt}', args.tasks, time.perf_counter() - start))
+        
+        total = models.get_db_connection().execute('SELECT COUNT(*) FROM tasks').fetchone()[0]
+        for fmt in ('ndjson', 'csv'):
+            start = time.perf_counter()
+            resp = client.get(f'/tasks/export?format={fmt}')
+            size = sum(len(chunk) for chunk in resp.response)
+            results.append((f'/tasks/export {fmt} ({size / 1e6:.1f} MB)', total, time.perf_counter() - start))
+    
+    print()
+    for label, rows, elapsed in results:
+        print(f"{label:36} {rows:>8,} rows  {elapsed:7.2f}s  {rows / elapsed:>10,.0f} rows/s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Drive /ask, /process, /chat and /analyze_image at a target request rate.
+
+Requests are sent on a fixed schedule (open loop), so a slow server is not
+given a break: latency is counted from when each request was due, including
+any time it waited for a free sender. Reports throughput and p50/p95/p99 per
+endpoint, and which tier answered (from the app's /metrics).
+
+Run the app against the fake provider so no real API quota is used:
+
+    python fake_provider.py --latency lognormal:300,0.4 --errors 429=0.02 &
+    AI_FAKE_PROVIDER_URL=http://127.0.0.1:8900 gunicorn -w 4 --threads 8 -b :8003 app:app &
+    python benchmarks/loadgen.py --rps 50 --duration 30 --mix ask=3,process=1,analyze_image=1
+
+Usage: python benchmarks/loadgen.py [--app-url http://127.0.0.1:8003] [--chat-url URL] [--rps 20]
+       [--duration 30] [--mix ask=1,process=1,chat=1,analyze_image=1] [--concurrency 128]
+"""
+
+import argparse
+import json
+import random
+import struct
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+TOPICS = ('photosynthesis', 'compilers', 'jazz', 'volcanoes', 'encryption', 'sourdough', 'glaciers', 'chess',
+          'vaccines', 'blockchains', 'tides', 'origami', 'neurons', 'satellites', 'gravity', 'opera',
+          'bees', 'inflation', 'rainbows', 'databases', 'coral', 'magnets', 'typography', 'marathons')
+ASPECTS = ('history', 'basic idea', 'biggest risk', 'main benefit', 'future', 'best analogy',
+           'common myth', 'hardest part', 'first step', 'key number')
+
+def make_question(rng):
+    return f"What is the {rng.choice(ASPECTS)} of {rng.choice(TOPICS)} for {rng.choice(TOPICS)}?"
+
+def tiny_png(width=32, height=32):
+    """A small solid-colour PNG, built without Pillow"""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    rows = b''.join(b'\x00' + b'\x40\x80\xc0' * width for _ in range(height))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b''))
+
+def multipart(fields, files):
+    """(body, content type) for a multipart/form-data upload"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, data, content_type) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: {content_type}\r\n\r\n'.encode() + data + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+def json_request(url, payload):
+    return urllib.request.Request(url, data=json.dumps(payload).encode(), method='POST',
+                                  headers={'Content-Type': 'application/json'})
+
+def build_request(endpoint, args, rng):
+    question = make_question(rng)
+    if endpoint == 'ask':
+        return json_request(f"{args.app_url}/ask", {'question': question})
+    if endpoint == 'process':
+        return json_request(f"{args.app_url}/process", {'query': question})
+    if endpoint == 'chat':
+        return json_request(f"{args.chat_url}/chat", {'message': question})
+    body, content_type = multipart({'prompt': 'What is in this picture?'},
+                                   {'image': ('load.png', tiny_png(), 'image/png')})
+    return urllib.request.Request(f"{args.app_url}/analyze_image", data=body, method='POST',
+                                  headers={'Content-Type': content_type})
+
+class Results:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.degraded = {}
+        self._lock = threading.Lock()
+    
+    def record(self, endpoint, seconds, ok, degraded):
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + (not ok)
+            self.degraded[endpoint] = self.degraded.get(endpoint, 0) + bool(degraded)
+
+def send(endpoint, request, due, timeout, results):
+    ok, degraded = False, False
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            data = json.loads(response.read() or b'{}')
+            ok = True
+            degraded = data.get('degraded', False)
+    except (urllib.error.URLError, OSError, ValueError):
+        pass
+    results.record(endpoint, time.perf_counter() - due, ok, degraded)
+
+def parse_mix(spec, chat_url):
+    weights = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ('ask', 'process', 'chat', 'analyze_image'):
+            raise SystemExit(f"❌ Unknown endpoint '{name}' in --mix")
+        if name == 'chat' and not chat_url:
+            print("⚠️ No --chat-url given (aditya_ai_app.py serves /chat), skipping chat")
+            continue
+        weights[name] = float(weight or 1)
+    if not weights:
+        raise SystemExit("❌ Nothing to send")
+    return weights
+
+def answers_by_tier(app_url):
+    """assistant_answers_total per tier from the app's /metrics, or None if it can't be read"""
+    try:
+        with urllib.request.urlopen(f"{app_url}/metrics", timeout=5) as response:
+            text = response.read().decode()
+    except (urllib.error.URLError, OSError):
+        return None
+    tiers = {}
+    for line in text.splitlines():
+        if line.startswith('assistant_answers_total{tier="'):
+            series, value = line.rsplit(' ', 1)
+            tiers[series.split('"')[1]] = float(value)
+    return tiers
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--app-url', default='http://127.0.0.1:8003', help="app.py (/ask, /process, /analyze_image)")
+    parser.add_argument('--chat-url', help="aditya_ai_app.py (/chat), e.g. http://127.0.0.1:3001")
+    parser.add_argument('--rps', type=float, default=20, help="target requests per second")
+    parser.add_argument('--duration', type=float, default=30, help="seconds to send for")
+    parser.add_argument('--mix', default='ask=1,process=1,chat=1,analyze_image=1', help="endpoint weights")
+    parser.add_argument('--concurrency', type=int, default=128, help="most requests in flight at once")
+    parser.add_argument('--timeout', type=float, default=60, help="per-request timeout in seconds")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    args.app_url = args.app_url.rstrip('/')
+    args.chat_url = args.chat_url.rstrip('/') if args.chat_url else None
+    
+    weights = parse_mix(args.mix, args.chat_url)
+    rng = random.Random(args.seed)
+    total = int(args.rps * args.duration)
+    plan = rng.choices(list(weights), weights=list(weights.values()), k=total)
+    results = Results()
+    tiers_before = answers_by_tier(args.app_url)
+    
+    print(f"🚀 {total} requests at {args.rps:g}/s for {args.duration:g}s: {args.mix}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for i, endpoint in enumerate(plan):
+            due = start + i / args.rps
+            request = build_request(endpoint, args, rng)
+            pause = due - time.perf_counter()
+            if pause > 0:
+                time.sleep(pause)
+            pool.submit(send, endpoint, request, due, args.timeout, results)
+        sent_in = time.perf_counter() - start
+    elapsed = time.perf_counter() - start
+    
+    print(f"\n{'endpoint':<15}{'requests':>9}{'errors':>8}{'degraded':>10}{'req/s':>8}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    everything = []
+    for endpoint in weights:
+        latencies = sorted(results.latencies.get(endpoint, []))
+        if not latencies:
+            continue
+        everything.extend(latencies)
+        print(f"{endpoint:<15}{len(latencies):>9}{results.errors[endpoint]:>8}{results.degraded[endpoint]:>10}"
+              f"{len(latencies) / elapsed:>8.1f}" + ''.join(f"{percentile(latencies, q) * 1000:>9.0f}"
+                                                              for q in (0.5, 0.95, 0.99)))
+    everything.sort()
+    if everything:
+        print(f"{'all':<15}{len(everything):>9}{sum(results.errors.values()):>8}{sum(results.degraded.values()):>10}"
+              f"{len(everything) / elapsed:>8.1f}" + ''.join(f"{percentile(everything, q) * 1000:>9.0f}"
+                                                             for q in (0.5, 0.95, 0.99)))
+    print(f"\nSent at {total / sent_in:.1f}/s (target {args.rps:g}/s); finished in {elapsed:.1f}s")
+    
+    tiers_after = answers_by_tier(args.app_url)
+    if tiers_before is not None and tiers_after is not None:
+        served = {tier: int(count - tiers_before.get(tier, 0)) for tier, count in tiers_after.items()}
+        print("Answered by: " + ', '.join(f"{tier} {count}" for tier, count in sorted(served.items())))
+
+if __name__ == '__main__':
+    main()
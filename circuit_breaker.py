@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+
+# Consecutive transient failures before a provider is taken out of rotation
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', '3'))
+BREAKER_MAX_COOLDOWN_S = int(os.getenv('BREAKER_MAX_COOLDOWN_S', str(6 * 3600)))
+# How long a half-open probe may run before another request may probe instead
+BREAKER_PROBE_TIMEOUT_S = int(os.getenv('BREAKER_PROBE_TIMEOUT_S', '30'))
+
+# First cooldown per failure kind; it doubles each time a probe fails again.
+# Billing and auth problems need a human, so there is no point retrying soon.
+# Any other kind counts as 'error'.
+BREAKER_COOLDOWNS = {
+    'billing_error': int(os.getenv('BREAKER_BILLING_COOLDOWN_S', '3600')),
+    'auth_error': int(os.getenv('BREAKER_AUTH_COOLDOWN_S', '3600')),
+    'quota_exceeded': int(os.getenv('BREAKER_QUOTA_COOLDOWN_S', '60')),
+    'error': int(os.getenv('BREAKER_ERROR_COOLDOWN_S', '5')),
+}
+# Failure kinds that open the breaker straight away instead of after the threshold
+HARD_FAILURES = ('billing_error', 'auth_error', 'quota_exceeded')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    """Health state of one AI provider
+    
+    closed: requests go through; consecutive failures are counted.
+    open: requests skip the provider until the cooldown ends.
+    half_open: one request probes the provider; success closes the breaker,
+    failure reopens it with twice the previous cooldown.
+    """
+    
+    def __init__(self, name, failure_threshold=None, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold or BREAKER_FAILURE_THRESHOLD
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.last_failure = None
+        self.cooldown = 0
+        self.open_until = 0.0
+        self._probe_started = None
+        self._lock = threading.Lock()
+    
+    def allow(self):
+        """Whether a request may use the provider now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = self.clock()
+            if self.state == OPEN:
+                if now < self.open_until:
+                    return False
+                self.state = HALF_OPEN
+                self._probe_started = None
+            # Half-open: a single probe at a time
+            if self._probe_started is not None and now - self._probe_started < BREAKER_PROBE_TIMEOUT_S:
+                return False
+            self._probe_started = now
+            return True
+    
+    def release_probe(self):
+        """Hand back a probe allow() granted for a request that never reached the provider"""
+        with self._lock:
+            self._probe_started = None
+    
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                print(f"✅ {self.name} is healthy again")
+            self.state = CLOSED
+            self.failures = 0
+            self.cooldown = 0
+            self._probe_started = None
+    
+    def record_failure(self, kind='error'):
+        kind = kind if kind in BREAKER_COOLDOWNS else 'error'
+        with self._lock:
+            self.failures += 1
+            self.last_failure = kind
+            if self.state == HALF_OPEN:
+                # The probe failed: back off exponentially
+                base = max(BREAKER_COOLDOWNS[kind], self.cooldown * 2)
+            elif kind in HARD_FAILURES or self.failures >= self.failure_threshold:
+                base = BREAKER_COOLDOWNS[kind]
+            else:
+                return
+            self.cooldown = min(base, max(BREAKER_MAX_COOLDOWN_S, BREAKER_COOLDOWNS[kind]))
+            self.state = OPEN
+            self.open_until = self.clock() + self.cooldown
+            self._probe_started = None
+        print(f"⚠️ {self.name} circuit open for {self.cooldown}s ({kind})")
+    
+    def snapshot(self):
+        """Current state for health reporting"""
+        with self._lock:
+            retry_in = max(0.0, self.open_until - self.clock()) if self.state == OPEN else 0.0
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'last_failure': self.last_failure,
+                'cooldown_s': self.cooldown,
+                'retry_in_s': round(retry_in, 1),
+            }
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Fixtures and fakes shared by the test modules
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import models
+import nlp
+import reminders
+from circuit_breaker import CircuitBreaker
+from provider_registry import ProviderRegistry
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache, SemanticCache
+from router import ProviderRouter
+from singleflight import SingleFlight
+
+class FakeClock:
+    """A clock that only moves when the test moves it (seconds, or a datetime)"""
+    
+    def __init__(self, now=1000.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+    
+    def advance(self, **kwargs):
+        step = timedelta(**kwargs)
+        self.now += step if isinstance(self.now, datetime) else step.total_seconds()
+        return self.now
+
+class FakeChatClient:
+    """OpenAI-compatible client for one provider
+    
+    It answers `answer` (formatted with the provider's name and the call's
+    number) after `delay` seconds, or raises `error`. Like the SDK it gives up
+    with an error once the per-call timeout passes, unless `ignores_timeout`
+    is set (a hung connection). Streamed answers arrive as `chunks`, each
+    after `delay`, with `error` raised after `fail_after` of them.
+    """
+    
+    def __init__(self, name, answer='{name} answer', delay=0.0, error=None, chunks=None, fail_after=0):
+        self.name = name
+        self.answer = answer
+        self.delay = delay
+        self.error = error
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.ignores_timeout = False
+        self.calls = 0
+        self.questions = []
+        self.started = []
+        self.timeouts = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+    
+    def create(self, model, messages, timeout=None, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+            number = self.calls
+            self.questions.append(messages[-1]['content'])
+            self.started.append(time.monotonic())
+            self.timeouts.append(timeout)
+        if stream:
+            return self._stream(timeout)
+        self._wait(timeout)
+        if self.error:
+            raise Exception(self.error)
+        message = SimpleNamespace(content=self.answer.format(name=self.name, n=number))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+    
+    def _wait(self, timeout):
+        if timeout is not None and self.delay > timeout and not self.ignores_timeout:
+            time.sleep(timeout)
+            raise Exception('Request timed out.')
+        time.sleep(self.delay)
+    
+    def _stream(self, timeout):
+        chunks = self.chunks or [self.answer.format(name=self.name, n=self.calls)]
+        for i, text in enumerate(chunks):
+            self._wait(timeout)
+            if self.error and i == self.fail_after:
+                raise Exception(self.error)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+        if self.error and self.fail_after >= len(chunks):
+            raise Exception(self.error)
+
+def timed(func, *args):
+    """(result, seconds) of func(*args)"""
+    start = time.monotonic()
+    result = func(*args)
+    return result, time.monotonic() - start
+
+@pytest.fixture
+def providers(monkeypatch):
+    """Fake DeepSeek and OpenAI clients, with fresh breakers, router, limiters and caches (both off)"""
+    clients = {name: FakeChatClient(name) for name in ('deepseek', 'openai')}
+    monkeypatch.setattr(nlp, 'USE_DEEPSEEK', True)
+    monkeypatch.setattr(nlp, 'USE_OPENAI', True)
+    monkeypatch.setattr(nlp, 'USE_GEMINI', False)
+    monkeypatch.setattr(nlp, 'provider_clients', ProviderRegistry(clients))
+    monkeypatch.setattr(nlp, 'response_cache', ResponseCache(max_entries=0))
+    monkeypatch.setattr(nlp, 'semantic_cache', SemanticCache(capacity=0))
+    monkeypatch.setattr(nlp, 'provider_breakers', {name: CircuitBreaker(name) for name in nlp.PROVIDER_NAMES})
+    monkeypatch.setattr(nlp, 'provider_router', ProviderRouter(explore_rate=0))
+    monkeypatch.setattr(nlp, 'provider_limiters', {name: RateLimiter(name) for name in nlp.PROVIDER_NAMES})
+    monkeypatch.setattr(nlp, 'provider_flights', SingleFlight())
+    monkeypatch.setattr(nlp, 'AI_HEDGE_DELAY_MS', 50)
+    return clients
+
+@pytest.fixture
+def openai(providers, monkeypatch):
+    """Only OpenAI configured; its answers are numbered by call ('answer 1', 'answer 2', ...)"""
+    monkeypatch.setattr(nlp, 'USE_DEEPSEEK', False)
+    providers['openai'].answer = 'answer {n}'
+    return providers['openai']
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Point models at a fresh temporary database"""
+    monkeypatch.setattr(models, 'DATABASE', str(tmp_path / 'test.db'))
+    models.init_db()
+    yield models.get_db_connection()
+    models.close_db_connection()
+
+@pytest.fixture
+def client(db, monkeypatch, providers):
+    """Flask test client on a fresh database, with fake providers and no reminder scheduler"""
+    monkeypatch.setattr(reminders, 'REMINDER_SCHEDULER', False)
+    import app as app_module
+    return app_module.app.test_client()
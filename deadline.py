@@ -0,0 +1,40 @@
+import os
+import time
+
+# Latency budget for answering one question; requests may ask for a different one
+# (deadline_ms) up to AI_DEADLINE_MAX_MS
+AI_DEADLINE_MS = int(os.getenv('AI_DEADLINE_MS', '15000'))
+AI_DEADLINE_MAX_MS = int(os.getenv('AI_DEADLINE_MAX_MS', '60000'))
+
+class Deadline:
+    """Time left to answer one request
+    
+    Each provider attempt gets what is left as its timeout. When the budget
+    runs out before any provider answers, the built-in answer is used and
+    `exceeded` is set so the response can be marked as degraded.
+    """
+    
+    def __init__(self, budget_ms=None, clock=time.monotonic):
+        self.budget_ms = AI_DEADLINE_MS if budget_ms is None else min(budget_ms, AI_DEADLINE_MAX_MS)
+        self.clock = clock
+        self.expires_at = clock() + self.budget_ms / 1000
+        self.exceeded = False
+    
+    def remaining(self):
+        """Seconds left, never negative"""
+        return max(0.0, self.expires_at - self.clock())
+    
+    def expired(self):
+        return self.remaining() <= 0
+
+def request_deadline(budget_ms=None):
+    """Deadline for a request's optional deadline_ms value (the default budget if it is missing or invalid)"""
+    try:
+        budget_ms = int(budget_ms)
+    except (TypeError, ValueError):
+        budget_ms = None
+    return Deadline(budget_ms if budget_ms and budget_ms > 0 else None)
+
+def degraded_fields(deadline):
+    """Extra response fields marking a built-in answer given because the deadline passed"""
+    return {'degraded': True} if deadline.exceeded else {}
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Fake AI Provider
+An OpenAI-compatible stand-in for DeepSeek and OpenAI with configurable latency,
+stalls, injected errors and cut streams, for load tests without real API calls.
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Error responses in the shape the OpenAI and DeepSeek APIs use; the messages are
+# ones nlp.py classifies as billing, quota and auth failures
+INJECTED_ERRORS = {
+    401: ('Incorrect API key provided', 'invalid_request_error', 'invalid_api_key'),
+    402: ('Insufficient Balance', 'invalid_request_error', 'insufficient_balance'),
+    429: ('Rate limit reached for requests', 'requests', 'rate_limit_exceeded'),
+    500: ('The server had an error while processing your request', 'server_error', None),
+}
+
+WORDS = ('the', 'answer', 'depends', 'on', 'context', 'but', 'in', 'short', 'it', 'is', 'a', 'useful',
+         'idea', 'that', 'helps', 'you', 'get', 'things', 'done', 'faster')
+
+def parse_latency(spec):
+    """Seconds sampler for a latency spec in milliseconds
+    
+    fixed:MS, uniform:MIN-MAX, exponential:MEAN or lognormal:MEDIAN,SIGMA
+    """
+    kind, _, args = spec.partition(':')
+    try:
+        if kind == 'fixed':
+            ms = float(args)
+            return lambda: ms / 1000
+        if kind == 'uniform':
+            low, high = (float(x) for x in args.split('-'))
+            return lambda: random.uniform(low, high) / 1000
+        if kind == 'exponential':
+            mean = float(args)
+            return lambda: random.expovariate(1 / mean) / 1000 if mean > 0 else 0.0
+        if kind == 'lognormal':
+            median, sigma = (float(x) for x in args.split(','))
+            return lambda: random.lognormvariate(math.log(median), sigma) / 1000
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid latency spec '{spec}'")
+
+def parse_errors(spec):
+    """{status: probability} from '402=0.01,429=0.05' or a {status: probability} dict"""
+    if isinstance(spec, str):
+        spec = dict(part.strip().partition('=')[::2] for part in spec.split(',') if part.strip())
+    errors = {}
+    for status, rate in spec.items():
+        if int(status) not in INJECTED_ERRORS:
+            raise ValueError(f"Can't inject status {status}; choose from {sorted(INJECTED_ERRORS)}")
+        errors[int(status)] = float(rate)
+    return errors
+
+class Profile:
+    """How one fake provider behaves
+    
+    latency: time to the whole answer, or to the first token when streaming
+    stall_rate / stall_ms: share of requests that take stall_ms instead
+    errors: {401|402|429|500: probability} of answering with that error
+    cut_rate: share of streams that are dropped halfway through
+    token_ms: delay between streamed tokens
+    answer_words: length of each answer
+    """
+    
+    def __init__(self, latency='lognormal:300,0.4', stall_rate=0.0, stall_ms=5000, errors='', cut_rate=0.0,
+                 token_ms=20, answer_words=40):
+        self.latency = latency
+        self.sample_latency = parse_latency(latency)
+        self.stall_rate = float(stall_rate)
+        self.stall_ms = float(stall_ms)
+        self.errors = parse_errors(errors)
+        self.cut_rate = float(cut_rate)
+        self.token_ms = float(token_ms)
+        self.answer_words = int(answer_words)
+    
+    def updated(self, changes):
+        """A copy of this profile with some settings changed"""
+        settings = dict(self.describe(), **changes)
+        return Profile(**settings)
+    
+    def describe(self):
+        return {
+            'latency': self.latency,
+            'stall_rate': self.stall_rate,
+            'stall_ms': self.stall_ms,
+            'errors': self.errors,
+            'cut_rate': self.cut_rate,
+            'token_ms': self.token_ms,
+            'answer_words': self.answer_words,
+        }
+    
+    def delay(self):
+        if random.random() < self.stall_rate:
+            return self.stall_ms / 1000
+        return self.sample_latency()
+    
+    def injected_error(self):
+        """Status to fail with, or None"""
+        roll = random.random()
+        for status, rate in self.errors.items():
+            if roll < rate:
+                return status
+            roll -= rate
+        return None
+
+class FakeProviderState:
+    """Profiles by provider name (the first path segment, e.g. /deepseek/...) and request counters"""
+    
+    def __init__(self, default):
+        self.profiles = {'default': default}
+        self.counts = {}
+        self._lock = threading.Lock()
+    
+    def profile(self, name):
+        with self._lock:
+            return self.profiles.get(name) or self.profiles['default']
+    
+    def set_profile(self, name, changes):
+        with self._lock:
+            base = self.profiles.get(name) or self.profiles['default']
+            self.profiles[name] = base.updated(changes)
+            return self.profiles[name]
+    
+    def count(self, name, outcome):
+        with self._lock:
+            key = f"{name} {outcome}"
+            self.counts[key] = self.counts.get(key, 0) + 1
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'profiles': {name: profile.describe() for name, profile in self.profiles.items()},
+                'requests': dict(self.counts),
+            }
+
+def prompt_text(messages):
+    """The last user message's text (vision requests send a list of parts)"""
+    for message in reversed(messages or []):
+        if message.get('role') != 'user':
+            continue
+        content = message.get('content')
+        if isinstance(content, list):
+            return ' '.join(part.get('text', '') for part in content if part.get('type') == 'text')
+        return str(content or '')
+    return ''
+
+def fake_answer(prompt, words):
+    return f"Fake answer to '{prompt[:60]}': " + ' '.join(random.choice(WORDS) for _ in range(words))
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakeProvider/1.0'
+    
+    @property
+    def state(self):
+        return self.server.state
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def provider_name(self):
+        first = self.path.strip('/').split('/', 1)[0]
+        return first if first not in ('v1', 'chat', '') else 'default'
+    
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return None
+    
+    def do_GET(self):
+        if self.path == '/_stats':
+            return self.send_json(self.state.stats())
+        if self.path.rstrip('/').endswith('/models'):
+            return self.send_json({'object': 'list', 'data': [{'id': 'fake-model', 'object': 'model'}]})
+        self.send_json({'error': {'message': 'Not found'}}, 404)
+    
+    def do_POST(self):
+        if self.path.startswith('/_profile/'):
+            # Change a provider's behaviour while a load test runs
+            changes = self.read_json()
+            if not isinstance(changes, dict):
+                return self.send_json({'error': {'message': 'Expected a JSON object'}}, 400)
+            try:
+                profile = self.state.set_profile(self.path[len('/_profile/'):], changes)
+            except (TypeError, ValueError) as e:
+                return self.send_json({'error': {'message': str(e)}}, 400)
+            return self.send_json(profile.describe())
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            return self.send_json({'error': {'message': 'Not found'}}, 404)
+        
+        request = self.read_json()
+        if not isinstance(request, dict):
+            return self.send_json({'error': {'message': 'Invalid JSON body'}}, 400)
+        name = self.provider_name()
+        profile = self.state.profile(name)
+        time.sleep(profile.delay())
+        
+        status = profile.injected_error()
+        if status:
+            self.state.count(name, status)
+            message, kind, code = INJECTED_ERRORS[status]
+            return self.send_json({'error': {'message': message, 'type': kind, 'code': code}}, status)
+        
+        answer = fake_answer(prompt_text(request.get('messages')), profile.answer_words)
+        model = request.get('model', 'fake-model')
+        if request.get('stream'):
+            return self.stream(name, profile, model, answer)
+        self.state.count(name, 200)
+        self.send_json({
+            'id': f"chatcmpl-{uuid.uuid4().hex}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': answer}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 20, 'completion_tokens': len(answer.split()),
+                      'total_tokens': 20 + len(answer.split())},
+        })
+    
+    def stream(self, name, profile, model, answer):
+        """Send the answer as OpenAI-style SSE chunks, one word at a time"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        words = answer.split(' ')
+        cut_at = len(words) // 2 if random.random() < profile.cut_rate else None
+        
+        def chunk(delta, finish_reason=None):
+            payload = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                       'model': model, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+        
+        try:
+            chunk({'role': 'assistant', 'content': ''})
+            for i, word in enumerate(words):
+                if i == cut_at:
+                    self.state.count(name, 'cut')
+                    return
+                chunk({'content': word if i == 0 else ' ' + word})
+                time.sleep(profile.token_ms / 1000)
+            chunk({}, 'stop')
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.state.count(name, 200)
+        except (BrokenPipeError, ConnectionResetError):
+            self.state.count(name, 'client_gone')
+
+def make_server(host, port, profile):
+    server = ThreadingHTTPServer((host, port), FakeProviderHandler)
+    server.daemon_threads = True
+    server.state = FakeProviderState(profile)
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible fake AI provider for load tests")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', default='lognormal:300,0.4',
+                        help="fixed:MS, uniform:MIN-MAX, exponential:MEAN or lognormal:MEDIAN,SIGMA")
+    parser.add_argument('--stall-rate', type=float, default=0.0, help="share of requests that stall")
+    parser.add_argument('--stall-ms', type=float, default=5000)
+    parser.add_argument('--errors', default='', help="injected errors, e.g. 402=0.01,429=0.05,401=0")
+    parser.add_argument('--cut-rate', type=float, default=0.0, help="share of streams dropped halfway")
+    parser.add_argument('--token-ms', type=float, default=20, help="delay between streamed tokens")
+    parser.add_argument('--answer-words', type=int, default=40)
+    parser.add_argument('--profiles', help="JSON file of per-provider settings, e.g. {\"deepseek\": {\"errors\": {\"429\": 0.1}}}")
+    args = parser.parse_args()
+    
+    profile = Profile(args.latency, args.stall_rate, args.stall_ms, args.errors, args.cut_rate, args.token_ms,
+                      args.answer_words)
+    server = make_server(args.host, args.port, profile)
+    if args.profiles:
+        with open(args.profiles) as f:
+            for name, changes in json.load(f).items():
+                server.state.set_profile(name, changes)
+    
+    url = f"http://{args.host}:{args.port}"
+    print(f"🧪 Fake AI provider on {url}")
+    print(f"   AI_FAKE_PROVIDER_URL={url} points DeepSeek ({url}/deepseek) and OpenAI ({url}/openai/v1) here")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import math
+import os
+import re
+from collections import defaultdict
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Built-in answers, editable without touching code; the compiled index is cached
+# next to it (or at KNOWLEDGE_BASE_CACHE) and rebuilt whenever the file changes
+KNOWLEDGE_BASE = os.getenv('KNOWLEDGE_BASE', os.path.join(_HERE, 'knowledge_base.json'))
+KNOWLEDGE_BASE_CACHE = os.getenv('KNOWLEDGE_BASE_CACHE')
+# Best answers scoring below this are treated as no match
+KNOWLEDGE_MIN_SCORE = float(os.getenv('KNOWLEDGE_MIN_SCORE', '0.5'))
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Bump when the cached index layout changes
+INDEX_VERSION = 2
+
+FALLBACK_ANSWER = "💡 I'm here to help! What would you like to know or do?"
+
+_TOKEN_RE = re.compile(r'\w+')
+
+def tokenize(text):
+    """Lowercase word tokens; punctuation and apostrophes split words"""
+    return _TOKEN_RE.findall(text.lower())
+
+class KnowledgeBase:
+    """Built-in answers behind an inverted index over their keyword phrases
+    
+    Every keyword phrase of an entry is one index term, so 'machine learning'
+    is a term of its own rather than 'machine' plus 'learning'. A question is
+    split into tokens and segmented greedily into the longest known phrases;
+    each phrase's postings carry a precomputed BM25 weight (times the entry's
+    optional "weight"), so a lookup is a handful of dict hits however many
+    entries there are. Ties go to the entry listed first.
+    """
+    
+    def __init__(self, entries, fallback=FALLBACK_ANSWER, default=FALLBACK_ANSWER):
+        self.entries = entries
+        self.fallback = fallback
+        self.default = default
+        self.postings = {}
+        self.max_phrase_len = 1
+        self._build()
+    
+    def _build(self):
+        terms = [{' '.join(tokenize(keyword)) for keyword in entry['keywords']} - {''} for entry in self.entries]
+        if not terms:
+            return
+        avg_len = sum(map(len, terms)) / len(terms) or 1
+        doc_freq = defaultdict(int)
+        for entry_terms in terms:
+            for term in entry_terms:
+                doc_freq[term] += 1
+        
+        postings = defaultdict(list)
+        count = len(self.entries)
+        for index, (entry, entry_terms) in enumerate(zip(self.entries, terms)):
+            # A phrase appears once per entry, so tf = 1 and only the length norm varies
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * len(entry_terms) / avg_len)
+            boost = entry.get('weight', 1.0)
+            for term in entry_terms:
+                idf = math.log(1 + (count - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+                postings[term].append((index, boost * idf * (BM25_K1 + 1) / (1 + norm)))
+        
+        self.postings = dict(postings)
+        self.max_phrase_len = max(term.count(' ') + 1 for term in self.postings)
+    
+    def to_index(self):
+        """The built index as plain JSON-serializable data"""
+        return {
+            'entries': self.entries,
+            'fallback': self.fallback,
+            'default': self.default,
+            'postings': self.postings,
+            'max_phrase_len': self.max_phrase_len,
+        }
+    
+    @classmethod
+    def from_index(cls, index):
+        """Rebuild a KnowledgeBase from to_index() data without re-indexing"""
+        knowledge_base = cls.__new__(cls)
+        knowledge_base.entries = list(index['entries'])
+        knowledge_base.fallback = str(index['fallback'])
+        knowledge_base.default = str(index['default'])
+        knowledge_base.postings = {str(term): [(int(entry), float(weight)) for entry, weight in postings]
+                                   for term, postings in index['postings'].items()}
+        knowledge_base.max_phrase_len = int(index['max_phrase_len'])
+        return knowledge_base
+    
+    def match_terms(self, text):
+        """The index terms found in text, longest phrase first at each position"""
+        tokens = tokenize(text)
+        found = set()
+        i = 0
+        while i < len(tokens):
+            for size in range(min(self.max_phrase_len, len(tokens) - i), 0, -1):
+                term = ' '.join(tokens[i:i + size])
+                if term in self.postings:
+                    found.add(term)
+                    i += size
+                    break
+            else:
+                i += 1
+        return found
+    
+    def search(self, text, min_score=None):
+        """Best (entry, score) for text, or (None, 0.0) when nothing reaches min_score"""
+        min_score = KNOWLEDGE_MIN_SCORE if min_score is None else min_score
+        scores = defaultdict(float)
+        for term in self.match_terms(text):
+            for index, weight in self.postings[term]:
+                scores[index] += weight
+        if not scores:
+            return None, 0.0
+        
+        best = min(scores, key=lambda index: (-scores[index], index))
+        if scores[best] < min_score:
+            return None, 0.0
+        return self.entries[best], scores[best]
+
+def build_knowledge_base(path):
+    """Parse a knowledge base file and index it"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return KnowledgeBase(data['entries'], data.get('fallback', FALLBACK_ANSWER), data.get('default', FALLBACK_ANSWER))
+
+def load_knowledge_base(path=None, cache_path=None):
+    """Load the knowledge base, from the index cache when it matches the file
+    
+    The cache is plain JSON keyed by the source file's mtime, size and SHA-256,
+    so a stale or tampered cache is only ever rebuilt, never executed.
+    """
+    path = path or KNOWLEDGE_BASE
+    cache_path = cache_path or KNOWLEDGE_BASE_CACHE or path + '.cache'
+    try:
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+    except OSError as e:
+        print(f"❌ Knowledge base not found: {e}")
+        return KnowledgeBase([])
+    key = [INDEX_VERSION, stat.st_mtime_ns, stat.st_size, digest]
+    
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached['key'] == key:
+            return KnowledgeBase.from_index(cached['index'])
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        print(f"⚠️  Ignoring unreadable knowledge base cache: {e}")
+    
+    try:
+        knowledge_base = build_knowledge_base(path)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"❌ Error loading knowledge base {path}: {e}")
+        return KnowledgeBase([])
+    
+    try:
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'key': key, 'index': knowledge_base.to_index()}, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"⚠️  Could not cache knowledge base index: {e}")
+    return knowledge_base
+
+_knowledge_base = None
+
+def get_knowledge_base():
+    """Get the process-wide knowledge base, loading it on first use"""
+    global _knowledge_base
+    if _knowledge_base is None:
+        _knowledge_base = load_knowledge_base()
+    return _knowledge_base
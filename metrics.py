@@ -0,0 +1,238 @@
+import bisect
+import functools
+import threading
+import time
+import weakref
+
+# Histogram buckets for latencies, in seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in pairs) + '}'
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Registry:
+    """Metrics and scrape-time collectors exported together on /metrics"""
+    
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+        self._lock = threading.Lock()
+    
+    def add(self, metric):
+        with self._lock:
+            self.metrics.append(metric)
+    
+    def add_collector(self, collector):
+        """Add a function called on each scrape for values kept elsewhere
+        
+        It returns [(name, type, help, labelnames, [(labelvalues, value), ...])].
+        """
+        with self._lock:
+            self.collectors.append(collector)
+    
+    def render(self):
+        """Every metric in the Prometheus text format"""
+        with self._lock:
+            metrics = list(self.metrics)
+            collectors = list(self.collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"❌ Metrics collector failed: {e}")
+                continue
+            for name, kind, help_text, labelnames, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f"{name}{format_labels(labelnames, values)} {format_value(value)}" for values, value in samples)
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+class Metric:
+    """A metric whose values are kept per thread
+    
+    Each thread updates only its own shard, so recording takes no lock; a
+    scrape adds the shards up. Shards of finished threads are folded into
+    one so short-lived request threads don't pile up.
+    """
+    
+    kind = None
+    
+    def __init__(self, name, help_text, labelnames=(), registry=registry):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.add(self)
+    
+    def _new_shard(self):
+        """The calling thread's shard, on its first update"""
+        shard = self._local.shard = {}
+        with self._lock:
+            self._shards.append((weakref.ref(threading.current_thread()), shard))
+        return shard
+    
+    def _merge(self, into, shard):
+        raise NotImplementedError
+    
+    def collect(self):
+        """{label values: value} summed over every thread"""
+        with self._lock:
+            total = {}
+            self._merge(total, self._retired)
+            live = []
+            for ref, shard in self._shards:
+                thread = ref()
+                if thread is None or not thread.is_alive():
+                    self._merge(self._retired, shard)
+                else:
+                    live.append((ref, shard))
+                self._merge(total, shard)
+            self._shards = live
+            return total
+    
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(self.collect().items()):
+            lines.extend(self._render_sample(labels, value))
+        return lines
+
+class Counter(Metric):
+    kind = 'counter'
+    
+    def inc(self, *labels, amount=1):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        try:
+            shard[labels] += amount
+        except KeyError:
+            shard[labels] = amount
+    
+    def _merge(self, into, shard):
+        # list() takes a snapshot the owning thread can't change halfway through
+        for labels, value in list(shard.items()):
+            into[labels] = into.get(labels, 0) + value
+    
+    def _render_sample(self, labels, value):
+        yield f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}"
+
+class Histogram(Metric):
+    """Counts observations per bucket (upper bounds, in seconds for latencies) plus their sum"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS, registry=registry):
+        super().__init__(name, help_text, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observe(self, value, *labels):
+        try:
+            counts = self._local.shard[labels]
+        except AttributeError:
+            counts = self._new_counts(self._new_shard(), labels)
+        except KeyError:
+            counts = self._new_counts(self._local.shard, labels)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+    
+    def _new_counts(self, shard, labels):
+        # One count per bucket, one for +Inf, then the sum
+        counts = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        return counts
+    
+    def time(self, *labels):
+        """Observe the seconds spent in a with block or in each call of a decorated function"""
+        return Timer(self, labels)
+    
+    def _merge(self, into, shard):
+        for labels, counts in list(shard.items()):
+            counts = list(counts)
+            total = into.get(labels)
+            into[labels] = counts if total is None else [a + b for a, b in zip(total, counts)]
+    
+    def _render_sample(self, labels, counts):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = (('le', format_value(float(bound))),)
+            yield f"{self.name}_bucket{format_labels(self.labelnames, labels, le)} {cumulative}"
+        yield f"{self.name}_sum{format_labels(self.labelnames, labels)} {format_value(counts[-1])}"
+        yield f"{self.name}_count{format_labels(self.labelnames, labels)} {cumulative}"
+
+class Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+    
+    def __call__(self, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.histogram.observe(time.perf_counter() - start, *self.labels)
+        return timed
+
+http_requests = Counter('assistant_http_requests_total', 'HTTP requests by route, method and status',
+                        ('route', 'method', 'status'))
+http_request_seconds = Histogram('assistant_http_request_duration_seconds', 'Time to produce an HTTP response',
+                                 ('route', 'method'))
+
+def record_request(route, method, status, seconds):
+    http_requests.inc(route, method, str(status))
+    http_request_seconds.observe(seconds, route, method)
+
+def instrument_app(app):
+    """Time every request a Flask app serves, labelled by its URL rule
+    
+    The time runs until the response body has been sent, which for streamed
+    responses is when the stream ends.
+    """
+    from flask import g, request
+    
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+    
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            method, status = request.method, response.status_code
+            # A streamed body hasn't been produced yet; the server closes the response once it is sent
+            response.call_on_close(lambda: record_request(route, method, status, time.perf_counter() - start))
+        return response
+    
+    return app
@@ -1,91 +1,462 @@
 import sqlite3
-from datetime import datetime
+import threading
+import re
+import base64
+import atexit
+import time
+from datetime import datetime, timedelta
 import os
+from itertools import islice
+from metrics import Histogram
+
+try:
+    import fcntl
+except ImportError:
+    # No flock() (Windows): write-behind can only see its own process's queue
+    fcntl = None
 
 DATABASE = 'assistant.db'
 
-def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect(DATABASE)
+# Connection tuning (overridable through the environment)
+DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))
+DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', '8192'))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', '128'))
+
+# One connection per worker thread, reused across requests
+_local = threading.local()
+
+# Time spent in each database function below, by function name
+db_call_seconds = Histogram('assistant_db_call_duration_seconds', 'Time spent in database calls', ('operation',))
+
+def _open_connection():
+    """Open a new tuned connection to the database"""
+    conn = sqlite3.connect(
+        DATABASE,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=DB_STATEMENT_CACHE_SIZE
+    )
     conn.row_factory = sqlite3.Row
+    
+    # WAL lets readers proceed while a writer commits; NORMAL sync is safe under WAL
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA cache_size = -{DB_CACHE_SIZE_KB}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    return conn
+
+def get_db_connection():
+    """Get the database connection for the current thread
+    
+    The connection is opened on first use and then reused, so callers must not
+    close it. A new one is opened after a fork (gunicorn --preload) or if
+    DATABASE has been pointed somewhere else.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.pid == os.getpid() and _local.database == DATABASE:
+        return conn
+    
+    if conn is not None and _local.pid == os.getpid():
+        conn.close()
+    
+    conn = _open_connection()
+    _local.conn = conn
+    _local.pid = os.getpid()
+    _local.database = DATABASE
     return conn
 
+def close_db_connection():
+    """Close the current thread's database connection if one is open"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        if _local.pid == os.getpid():
+            conn.close()
+        _local.conn = None
+
+def _recount_chat_stats(conn):
+    """Recompute every chat_stats counter from chat_history (caller commits)"""
+    conn.execute('DELETE FROM chat_stats')
+    conn.execute('''
+        INSERT INTO chat_stats (scope, key, count)
+        SELECT 'total', '', COUNT(*) FROM chat_history
+        UNION ALL
+        SELECT 'session', session_id, COUNT(*) FROM chat_history
+        WHERE session_id IS NOT NULL GROUP BY session_id
+        UNION ALL
+        SELECT 'type', COALESCE(message_type, ''), COUNT(*) FROM chat_history
+        GROUP BY COALESCE(message_type, '')
+        UNION ALL
+        SELECT 'day', substr(created_at, 1, 10), COUNT(*) FROM chat_history
+        GROUP BY substr(created_at, 1, 10)
+    ''')
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version.
+# Entry N (1-based) upgrades a database from version N-1 to N. Each entry is a
+# list of SQL statements or callables taking the connection, run in one transaction.
+MIGRATIONS = [
+    # 1: indexes for the hot history and task queries
+    [
+        '''
+            CREATE INDEX IF NOT EXISTS idx_chat_history_session_created
+            ON chat_history (session_id, created_at)
+        ''',
+        '''
+            CREATE INDEX IF NOT EXISTS idx_chat_history_created
+            ON chat_history (created_at)
+        ''',
+        '''
+            CREATE INDEX IF NOT EXISTS idx_tasks_completed_datetime
+            ON tasks (completed, datetime, created_at)
+        ''',
+    ],
+    # 2: chat_stats counters (total, per session, per message_type, per day),
+    # kept current by triggers so reading stats never scans chat_history
+    [
+        '''
+            CREATE TABLE IF NOT EXISTS chat_stats (
+                scope TEXT NOT NULL,
+                key TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (scope, key)
+            ) WITHOUT ROWID
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS chat_stats_after_insert
+            AFTER INSERT ON chat_history
+            BEGIN
+                INSERT INTO chat_stats (scope, key, count) VALUES ('total', '', 1)
+                ON CONFLICT (scope, key) DO UPDATE SET count = count + 1;
+                INSERT INTO chat_stats (scope, key, count)
+                SELECT 'session', NEW.session_id, 1 WHERE NEW.session_id IS NOT NULL
+                ON CONFLICT (scope, key) DO UPDATE SET count = count + 1;
+                INSERT INTO chat_stats (scope, key, count) VALUES ('type', COALESCE(NEW.message_type, ''), 1)
+                ON CONFLICT (scope, key) DO UPDATE SET count = count + 1;
+                INSERT INTO chat_stats (scope, key, count) VALUES ('day', substr(NEW.created_at, 1, 10), 1)
+                ON CONFLICT (scope, key) DO UPDATE SET count = count + 1;
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS chat_stats_after_delete
+            AFTER DELETE ON chat_history
+            BEGIN
+                UPDATE chat_stats SET count = count - 1
+                WHERE (scope = 'total' AND key = '')
+                   OR (scope = 'session' AND key = OLD.session_id)
+                   OR (scope = 'type' AND key = COALESCE(OLD.message_type, ''))
+                   OR (scope = 'day' AND key = substr(OLD.created_at, 1, 10));
+            END
+        ''',
+        _recount_chat_stats,
+    ],
+    # 3: full-text index over chat messages (external content, synced by triggers).
+    # session_key is hex(session_id) so a session filter is a single FTS token.
+    [
+        '''
+            CREATE VIEW IF NOT EXISTS chat_history_fts_source AS
+            SELECT id, user_message, ai_response, hex(session_id) AS session_key
+            FROM chat_history
+        ''',
+        '''
+            CREATE VIRTUAL TABLE IF NOT EXISTS chat_history_fts USING fts5 (
+                user_message, ai_response, session_key,
+                content = 'chat_history_fts_source', content_rowid = 'id',
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS chat_history_fts_after_insert
+            AFTER INSERT ON chat_history
+            BEGIN
+                INSERT INTO chat_history_fts (rowid, user_message, ai_response, session_key)
+                VALUES (NEW.id, NEW.user_message, NEW.ai_response, hex(NEW.session_id));
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS chat_history_fts_after_delete
+            AFTER DELETE ON chat_history
+            BEGIN
+                INSERT INTO chat_history_fts (chat_history_fts, rowid, user_message, ai_response, session_key)
+                VALUES ('delete', OLD.id, OLD.user_message, OLD.ai_response, hex(OLD.session_id));
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS chat_history_fts_after_update
+            AFTER UPDATE OF user_message, ai_response, session_id ON chat_history
+            BEGIN
+                INSERT INTO chat_history_fts (chat_history_fts, rowid, user_message, ai_response, session_key)
+                VALUES ('delete', OLD.id, OLD.user_message, OLD.ai_response, hex(OLD.session_id));
+                INSERT INTO chat_history_fts (rowid, user_message, ai_response, session_key)
+                VALUES (NEW.id, NEW.user_message, NEW.ai_response, hex(NEW.session_id));
+            END
+        ''',
+        "INSERT INTO chat_history_fts (chat_history_fts) VALUES ('rebuild')",
+    ],
+    # 4: retention policies and the index of archived history segments
+    [
+        '''
+            CREATE TABLE IF NOT EXISTS retention_policies (
+                session_id TEXT PRIMARY KEY,
+                max_age_days INTEGER,
+                max_rows INTEGER
+            )
+        ''',
+        '''
+            CREATE TABLE IF NOT EXISTS chat_archive (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                segment TEXT NOT NULL,
+                session_id TEXT,
+                message_count INTEGER NOT NULL,
+                first_created_at TEXT,
+                last_created_at TEXT,
+                archived_at TEXT NOT NULL
+            )
+        ''',
+        '''
+            CREATE INDEX IF NOT EXISTS idx_chat_archive_session
+            ON chat_archive (session_id)
+        ''',
+        '''
+            CREATE INDEX IF NOT EXISTS idx_chat_archive_segment
+            ON chat_archive (segment)
+        ''',
+    ],
+    # 5: reminder delivery tracking. Reminders already in the past are marked
+    # as delivered so upgrading does not fire the whole backlog at once.
+    [
+        'ALTER TABLE tasks ADD COLUMN reminded_at TEXT',
+        '''
+            UPDATE tasks SET reminded_at = created_at
+            WHERE datetime IS NOT NULL AND datetime < strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime')
+        ''',
+        '''
+            CREATE INDEX IF NOT EXISTS idx_tasks_pending_reminders
+            ON tasks (datetime, id)
+            WHERE completed = FALSE AND reminded_at IS NULL AND datetime IS NOT NULL
+        ''',
+    ],
+    # 6: task change log for delta sync. Each insert, edit, completion or
+    # delete appends (revision, task_id); only the newest 10000 entries are
+    # kept, and clients further behind than that get a full resync.
+    [
+        '''
+            CREATE TABLE IF NOT EXISTS task_changes (
+                revision INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id INTEGER NOT NULL
+            )
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS task_changes_after_insert
+            AFTER INSERT ON tasks
+            BEGIN
+                INSERT INTO task_changes (task_id) VALUES (NEW.id);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS task_changes_after_update
+            AFTER UPDATE OF content, task_type, datetime, completed ON tasks
+            BEGIN
+                INSERT INTO task_changes (task_id) VALUES (NEW.id);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS task_changes_after_delete
+            AFTER DELETE ON tasks
+            BEGIN
+                INSERT INTO task_changes (task_id) VALUES (OLD.id);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS task_changes_prune
+            AFTER INSERT ON task_changes
+            BEGIN
+                DELETE FROM task_changes WHERE revision <= NEW.revision - 10000;
+            END
+        ''',
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def get_schema_version(conn=None):
+    """Get the schema version recorded in the database"""
+    conn = conn or get_db_connection()
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate_db(conn=None):
+    """Apply any pending schema migrations, returning the resulting version"""
+    conn = conn or get_db_connection()
+    version = get_schema_version(conn)
+    
+    while version < SCHEMA_VERSION:
+        # IMMEDIATE takes the write lock up front, so concurrent workers
+        # starting together apply each migration exactly once
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            version = get_schema_version(conn)
+            if version >= SCHEMA_VERSION:
+                conn.rollback()
+                break
+            
+            for step in MIGRATIONS[version]:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            
+            version += 1
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+            print(f"✅ Database migrated to schema version {version}")
+        except Exception:
+            conn.rollback()
+            raise
+    
+    return version
+
 def init_db():
     """Initialize the database with required tables"""
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Create tasks/reminders table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                content TEXT NOT NULL,
-                task_type TEXT NOT NULL DEFAULT 'reminder',
-                datetime TEXT,
-                created_at TEXT NOT NULL,
-                completed BOOLEAN DEFAULT FALSE
-            )
-        ''')
+        with conn:
+            # Create tasks/reminders table
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    content TEXT NOT NULL,
+                    task_type TEXT NOT NULL DEFAULT 'reminder',
+                    datetime TEXT,
+                    created_at TEXT NOT NULL,
+                    completed BOOLEAN DEFAULT FALSE
+                )
+            ''')
+            
+            # Create chat history table
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS chat_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_message TEXT NOT NULL,
+                    ai_response TEXT NOT NULL,
+                    message_type TEXT DEFAULT 'text',
+                    created_at TEXT NOT NULL,
+                    session_id TEXT
+                )
+            ''')
         
-        # Create chat history table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS chat_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_message TEXT NOT NULL,
-                ai_response TEXT NOT NULL,
-                message_type TEXT DEFAULT 'text',
-                created_at TEXT NOT NULL,
-                session_id TEXT
-            )
-        ''')
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        migrate_db(conn)
         print("✅ Database initialized successfully")
     except sqlite3.Error as e:
         print(f"❌ Database initialization error: {e}")
         raise
 
+# Callbacks run after a task change commits, as listener(event, task_id, task_datetime).
+# Events: 'added', 'updated', 'deleted', 'completed' and 'imported' (task_id None).
+_task_listeners = []
+
+def add_task_listener(listener):
+    """Register a callback for task changes"""
+    _task_listeners.append(listener)
+
+def remove_task_listener(listener):
+    """Unregister a task change callback"""
+    if listener in _task_listeners:
+        _task_listeners.remove(listener)
+
+def _notify_task_listeners(event, task_id, task_datetime=None):
+    for listener in list(_task_listeners):
+        try:
+            listener(event, task_id, task_datetime)
+        except Exception as e:
+            print(f"❌ Task listener error: {e}")
+
+@db_call_seconds.time('add_task')
 def add_task(content, task_type='reminder', task_datetime=None):
     """Add a new task or reminder to the database"""
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
         created_at = datetime.now().isoformat()
         
-        cursor.execute('''
-            INSERT INTO tasks (content, task_type, datetime, created_at)
-            VALUES (?, ?, ?, ?)
-        ''', (content, task_type, task_datetime, created_at))
+        with conn:
+            cursor = conn.execute('''
+                INSERT INTO tasks (content, task_type, datetime, created_at)
+                VALUES (?, ?, ?, ?)
+            ''', (content, task_type, task_datetime, created_at))
         
         task_id = cursor.lastrowid
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
         print(f"✅ Added {task_type}: {content}")
+        _notify_task_listeners('added', task_id, task_datetime)
         return task_id
     except sqlite3.Error as e:
         print(f"❌ Error adding task: {e}")
         return None
 
+TASK_IMPORT_CHUNK_SIZE = int(os.getenv('TASK_IMPORT_CHUNK_SIZE', '1000'))
+
+@db_call_seconds.time('add_tasks_bulk')
+def add_tasks_bulk(tasks, chunk_size=None):
+    """Insert many tasks from an iterable of (content, task_type, datetime, completed)
+    
+    Rows are consumed lazily and written with executemany, one transaction per
+    chunk, so arbitrarily large imports run in constant memory. Reminders
+    already in the past are imported as delivered, as in migration 5, so the
+    scheduler doesn't fire them all at once. Returns the number of tasks
+    inserted.
+    """
+    chunk_size = chunk_size or TASK_IMPORT_CHUNK_SIZE
+    tasks = iter(tasks)
+    inserted = 0
+    try:
+        conn = get_db_connection()
+        while True:
+            chunk = list(islice(tasks, chunk_size))
+            if not chunk:
+                break
+            created_at = datetime.now().isoformat()
+            with conn:
+                conn.executemany('''
+                    INSERT INTO tasks (content, task_type, datetime, created_at, completed, reminded_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', [(content, task_type, task_datetime, created_at, bool(completed),
+                       created_at if task_datetime and task_datetime < created_at else None)
+                      for content, task_type, task_datetime, completed in chunk])
+            inserted += len(chunk)
+        return inserted
+    except sqlite3.Error as e:
+        print(f"❌ Error importing tasks after {inserted} rows: {e}")
+        return inserted
+    finally:
+        if inserted:
+            _notify_task_listeners('imported', None)
+
+def iter_tasks(include_completed=False, batch_size=500):
+    """Yield tasks one dict at a time, fetching from the database in batches"""
+    conn = get_db_connection()
+    where = '' if include_completed else 'WHERE completed = FALSE'
+    cursor = conn.execute(f'''
+        SELECT * FROM tasks 
+        {where} 
+        ORDER BY datetime ASC, created_at ASC
+    ''')
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(row)
+    finally:
+        cursor.close()
+
+@db_call_seconds.time('get_tasks')
 def get_tasks():
     """Get all tasks and reminders from the database"""
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
         
-        cursor.execute('''
+        tasks = conn.execute('''
             SELECT * FROM tasks 
             WHERE completed = FALSE 
             ORDER BY datetime ASC, created_at ASC
-        ''')
-        
-        tasks = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        ''').fetchall()
         
         # Convert to list of dictionaries for easier JSON serialization
         return [dict(task) for task in tasks]
@@ -93,21 +464,73 @@ def get_tasks():
         print(f"❌ Error getting tasks: {e}")
         return []
 
+@db_call_seconds.time('get_task_changes')
+def get_task_changes(since=None):
+    """Get open-task changes since a revision the client has already seen
+    
+    Returns the current revision plus either the tasks added or edited since
+    then ('upserted') and the ids of tasks deleted or completed ('removed'),
+    or, with 'full' set, every open task when `since` is missing or too old
+    for the change log.
+    """
+    try:
+        conn = get_db_connection()
+        # One read transaction so the revision and the rows form a consistent snapshot
+        conn.execute('BEGIN')
+        try:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'task_changes'").fetchone()
+            revision = row['seq'] if row else 0
+            oldest = conn.execute('SELECT MIN(revision) AS oldest FROM task_changes').fetchone()['oldest']
+            
+            complete_log = since is not None and 0 <= since <= revision and (
+                since == revision or (oldest is not None and since >= oldest - 1))
+            if not complete_log:
+                return {
+                    'revision': revision,
+                    'full': True,
+                    'tasks': [dict(task) for task in conn.execute('''
+                        SELECT * FROM tasks 
+                        WHERE completed = FALSE 
+                        ORDER BY datetime ASC, created_at ASC
+                    ''')]
+                }
+            
+            changed = [r['task_id'] for r in conn.execute(
+                'SELECT DISTINCT task_id FROM task_changes WHERE revision > ?', (since,))]
+            upserted = []
+            if changed:
+                upserted = [dict(task) for task in conn.execute(f'''
+                    SELECT * FROM tasks 
+                    WHERE id IN ({','.join('?' * len(changed))}) AND completed = FALSE 
+                    ORDER BY datetime ASC, created_at ASC
+                ''', changed)]
+            still_open = {task['id'] for task in upserted}
+            
+            return {
+                'revision': revision,
+                'full': False,
+                'upserted': upserted,
+                'removed': [task_id for task_id in changed if task_id not in still_open]
+            }
+        finally:
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"❌ Error getting task changes: {e}")
+        return {'revision': 0, 'full': True, 'tasks': get_tasks()}
+
+@db_call_seconds.time('delete_task')
 def delete_task(task_id):
     """Delete a task by ID"""
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
         
-        cursor.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+        with conn:
+            cursor = conn.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
         affected_rows = cursor.rowcount
         
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
         if affected_rows > 0:
             print(f"✅ Deleted task with ID: {task_id}")
+            _notify_task_listeners('deleted', task_id)
             return True
         else:
             print(f"❌ No task found with ID: {task_id}")
@@ -116,29 +539,32 @@ def delete_task(task_id):
         print(f"❌ Error deleting task: {e}")
         return False
 
+@db_call_seconds.time('update_task')
 def update_task(task_id, new_content=None, new_datetime=None):
-    """Update a task's content or datetime"""
+    """Update a task's content or datetime
+    
+    Moving a task to a new datetime re-arms its reminder.
+    """
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
         
-        if new_content and new_datetime:
-            cursor.execute('UPDATE tasks SET content = ?, datetime = ? WHERE id = ?', 
-                         (new_content, new_datetime, task_id))
-        elif new_content:
-            cursor.execute('UPDATE tasks SET content = ? WHERE id = ?', (new_content, task_id))
-        elif new_datetime:
-            cursor.execute('UPDATE tasks SET datetime = ? WHERE id = ?', (new_datetime, task_id))
-        else:
-            return False
+        with conn:
+            if new_content and new_datetime:
+                cursor = conn.execute('UPDATE tasks SET content = ?, datetime = ?, reminded_at = NULL WHERE id = ?', 
+                                      (new_content, new_datetime, task_id))
+            elif new_content:
+                cursor = conn.execute('UPDATE tasks SET content = ? WHERE id = ?', (new_content, task_id))
+            elif new_datetime:
+                cursor = conn.execute('UPDATE tasks SET datetime = ?, reminded_at = NULL WHERE id = ?', (new_datetime, task_id))
+            else:
+                return False
         
         affected_rows = cursor.rowcount
-        conn.commit()
-        cursor.close()
-        conn.close()
         
         if affected_rows > 0:
             print(f"✅ Updated task with ID: {task_id}")
+            if new_datetime:
+                _notify_task_listeners('updated', task_id, new_datetime)
             return True
         else:
             print(f"❌ No task found with ID: {task_id}")
@@ -147,21 +573,19 @@ def update_task(task_id, new_content=None, new_datetime=None):
         print(f"❌ Error updating task: {e}")
         return False
 
+@db_call_seconds.time('mark_task_completed')
 def mark_task_completed(task_id):
     """Mark a task as completed"""
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
         
-        cursor.execute('UPDATE tasks SET completed = TRUE WHERE id = ?', (task_id,))
+        with conn:
+            cursor = conn.execute('UPDATE tasks SET completed = TRUE WHERE id = ?', (task_id,))
         affected_rows = cursor.rowcount
         
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
         if affected_rows > 0:
             print(f"✅ Marked task {task_id} as completed")
+            _notify_task_listeners('completed', task_id)
             return True
         else:
             print(f"❌ No task found with ID: {task_id}")
@@ -170,46 +594,282 @@ def mark_task_completed(task_id):
         print(f"❌ Error marking task completed: {e}")
         return False
 
+# Write-behind mode for chat history: messages are queued in-process and a
+# background thread inserts them in batches instead of committing one by one.
+# Reads first wait for every worker process's queued messages (see
+# PendingWritesMarker), so a session always reads its own writes.
+CHAT_WRITE_BEHIND = os.getenv('CHAT_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes')
+CHAT_BATCH_SIZE = int(os.getenv('CHAT_BATCH_SIZE', '100'))
+CHAT_FLUSH_INTERVAL_MS = int(os.getenv('CHAT_FLUSH_INTERVAL_MS', '50'))
+
+INSERT_CHAT_MESSAGE_SQL = '''
+    INSERT INTO chat_history (user_message, ai_response, message_type, created_at, session_id)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+def _pending_writes_dir():
+    return f"{DATABASE}.pending-writes"
+
+class PendingWritesMarker:
+    """A per-process lock file, held exclusively while the process has unwritten chat rows
+    
+    Any worker process can queue a session's messages, and a later request
+    for that session can land on another worker. Readers therefore take every
+    other process's marker shared (wait_for_other_processes), which blocks
+    until those writers have caught up. flock() locks are dropped by the
+    kernel when a process exits, so a crashed worker never blocks readers.
+    """
+    
+    def __init__(self):
+        os.makedirs(_pending_writes_dir(), exist_ok=True)
+        self.path = os.path.join(_pending_writes_dir(), f"{os.getpid()}.lock")
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+    
+    def hold(self):
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+    
+    def release(self):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+    
+    def close(self):
+        os.close(self._fd)
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+    
+    @staticmethod
+    def wait_for_other_processes(timeout):
+        """Wait up to `timeout` seconds until no other process has unwritten chat rows"""
+        try:
+            names = os.listdir(_pending_writes_dir())
+        except OSError:
+            return
+        deadline = time.monotonic() + timeout
+        own = f"{os.getpid()}.lock"
+        for name in names:
+            if name == own:
+                continue
+            try:
+                fd = os.open(os.path.join(_pending_writes_dir(), name), os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                while True:
+                    try:
+                        fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        if time.monotonic() >= deadline:
+                            print(f"⚠️  Gave up waiting for queued chat messages of process {name[:-5]}")
+                            return
+                        time.sleep(0.001)
+            finally:
+                os.close(fd)
+
+class ChatWriteQueue:
+    """Batches chat history inserts on a background writer thread
+    
+    A batch is written with one executemany() in one transaction once it
+    reaches batch_size rows or has waited flush_interval seconds, whichever
+    comes first. flush() blocks until everything queued so far is on disk.
+    While rows are waiting, the process's PendingWritesMarker is held.
+    """
+    
+    def __init__(self, batch_size=None, flush_interval=None):
+        self.batch_size = batch_size or CHAT_BATCH_SIZE
+        self.flush_interval = flush_interval or CHAT_FLUSH_INTERVAL_MS / 1000
+        self._pending = []
+        self._queued = 0
+        self._written = 0
+        self._flush_requested = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._marker = PendingWritesMarker() if fcntl else None
+        self._marked = False
+        self.pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='chat-writer', daemon=True)
+        self._thread.start()
+    
+    def put(self, row):
+        """Queue one chat_history row tuple for insertion"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Chat write queue is closed")
+            if self._marker and not self._marked:
+                self._marker.hold()
+                self._marked = True
+            self._pending.append(row)
+            self._queued += 1
+            # Wake the writer to start the flush interval, or to write a full batch now
+            if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+    
+    def flush(self):
+        """Block until every row queued before this call has been written"""
+        with self._cond:
+            target = self._queued
+            if self._written >= target:
+                return
+            self._flush_requested = True
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: self._written >= target)
+    
+    def close(self):
+        """Drain the queue and stop the writer thread"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+    
+    def _batch_ready(self):
+        return len(self._pending) >= self.batch_size or self._flush_requested or self._closed
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending and self._closed:
+                    if self._marker:
+                        self._marker.close()
+                    close_db_connection()
+                    return
+                # Give the batch a short window to fill up
+                self._cond.wait_for(self._batch_ready, timeout=self.flush_interval)
+                batch = self._pending
+                self._pending = []
+                self._flush_requested = False
+            
+            self._write(batch)
+            
+            with self._cond:
+                self._written += len(batch)
+                if self._marked and self._written == self._queued:
+                    self._marker.release()
+                    self._marked = False
+                self._cond.notify_all()
+    
+    @db_call_seconds.time('write_chat_batch')
+    def _write(self, batch):
+        try:
+            conn = get_db_connection()
+            with conn:
+                conn.executemany(INSERT_CHAT_MESSAGE_SQL, batch)
+        except sqlite3.Error as e:
+            print(f"❌ Error writing {len(batch)} queued chat messages: {e}")
+
+_chat_write_queue = None
+_chat_write_queue_lock = threading.Lock()
+
+def _get_chat_write_queue():
+    """Get this process's write-behind queue, starting it on first use"""
+    global _chat_write_queue
+    queue = _chat_write_queue
+    if queue is not None and queue.pid == os.getpid():
+        return queue
+    
+    with _chat_write_queue_lock:
+        # A queue inherited across fork has no writer thread; start a fresh one
+        if _chat_write_queue is None or _chat_write_queue.pid != os.getpid():
+            _chat_write_queue = ChatWriteQueue()
+            atexit.register(_chat_write_queue.close)
+        return _chat_write_queue
+
+def flush_chat_writes():
+    """Write out this process's queued chat messages and wait for other processes' (no-op unless write-behind is on)"""
+    if not CHAT_WRITE_BEHIND:
+        return
+    queue = _chat_write_queue
+    if queue is not None and queue.pid == os.getpid():
+        queue.flush()
+    if fcntl:
+        # Another worker writes its batch within a flush interval, plus any wait for the database lock
+        PendingWritesMarker.wait_for_other_processes(CHAT_FLUSH_INTERVAL_MS / 1000 + DB_BUSY_TIMEOUT_MS / 1000)
+
+def stop_chat_write_behind():
+    """Drain and stop the write-behind queue"""
+    global _chat_write_queue
+    with _chat_write_queue_lock:
+        queue, _chat_write_queue = _chat_write_queue, None
+    if queue is not None and queue.pid == os.getpid():
+        queue.close()
+        atexit.unregister(queue.close)
+
+@db_call_seconds.time('add_chat_message')
 def add_chat_message(user_message, ai_response, message_type='text', session_id=None):
-    """Add a chat message and response to history"""
+    """Add a chat message and response to history
+    
+    In write-behind mode the message is queued and None is returned, since the
+    row id is only assigned when the batch is written.
+    """
+    created_at = datetime.now().isoformat()
+    row = (user_message, ai_response, message_type, created_at, session_id)
+    
+    if CHAT_WRITE_BEHIND:
+        _get_chat_write_queue().put(row)
+        return None
+    
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
-        created_at = datetime.now().isoformat()
-        
-        cursor.execute('''
-            INSERT INTO chat_history (user_message, ai_response, message_type, created_at, session_id)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (user_message, ai_response, message_type, created_at, session_id))
+        with conn:
+            cursor = conn.execute(INSERT_CHAT_MESSAGE_SQL, row)
         
-        message_id = cursor.lastrowid
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return message_id
+        return cursor.lastrowid
     except sqlite3.Error as e:
         print(f"❌ Error adding chat message: {e}")
         return None
 
-def get_chat_history(limit=50, session_id=None):
-    """Get chat history from database"""
+def encode_history_cursor(message):
+    """Build an opaque pagination cursor from a chat history message"""
+    raw = f"{message['created_at']}|{message['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_history_cursor(cursor):
+    """Decode a pagination cursor into (created_at, id), raising ValueError if invalid"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, message_id = base64.urlsafe_b64decode(padded.encode()).decode().rsplit('|', 1)
+        return created_at, int(message_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid history cursor: {cursor!r}") from e
+
+@db_call_seconds.time('get_chat_history')
+def get_chat_history(limit=50, session_id=None, before=None, after=None):
+    """Get chat history from database
+    
+    Pages are keyed on (created_at, id): `before` returns the newest messages
+    older than that cursor, `after` the oldest messages newer than it, and
+    neither returns the newest page. Results are always oldest first.
+    """
     try:
+        # Read-your-writes: make queued messages, in any worker process, visible before querying
+        flush_chat_writes()
         conn = get_db_connection()
-        cursor = conn.cursor()
         
+        conditions = []
+        params = []
         if session_id:
-            cursor.execute('''
-                SELECT * FROM chat_history 
-                WHERE session_id = ? 
-                ORDER BY created_at DESC 
-                LIMIT ?
-            ''', (session_id, limit))
-        else:
-            cursor.execute('''
-                SELECT * FROM chat_history 
-                ORDER BY created_at DESC 
-                LIMIT ?
-            ''', (limit,))
+            conditions.append('session_id = ?')
+            params.append(session_id)
+        if before:
+            conditions.append('(created_at, id) < (?, ?)')
+            params.extend(decode_history_cursor(before))
+        if after:
+            conditions.append('(created_at, id) > (?, ?)')
+            params.extend(decode_history_cursor(after))
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        # Walk forward from an `after` cursor, otherwise back from the newest
+        order = 'ASC' if after and not before else 'DESC'
+        
+        cursor = conn.execute(f'''
+            SELECT * FROM chat_history 
+            {where} 
+            ORDER BY created_at {order}, id {order} 
+            LIMIT ?
+        ''', (*params, limit))
         
         messages = []
         for row in cursor.fetchall():
@@ -222,60 +882,135 @@ def get_chat_history(limit=50, session_id=None):
                 'session_id': row['session_id']
             })
         
-        cursor.close()
-        conn.close()
-        
         # Return in chronological order (oldest first)
-        return list(reversed(messages))
+        return messages if order == 'ASC' else list(reversed(messages))
     except sqlite3.Error as e:
         print(f"❌ Error getting chat history: {e}")
         return []
 
+@db_call_seconds.time('search_chat_history')
+def search_chat_history(query, session_id=None, limit=20):
+    """Full-text search over chat history, best matches first
+    
+    Every message containing every word of the query is ranked by FTS5's
+    BM25 inside SQLite (the session_key column carries no weight), and only
+    the top `limit` rows come back. Each result carries snippets with the
+    matched words wrapped in **bold**.
+    """
+    try:
+        terms = list(dict.fromkeys(word.lower() for word in re.findall(r'\w+', query)))
+        if not terms:
+            return []
+        
+        # Quote every word so user input can never be parsed as FTS5 syntax
+        match = ' '.join(f'"{term}"' for term in terms)
+        if session_id:
+            match = f'session_key : "{session_id.encode().hex().upper()}" AND ({match})'
+        
+        flush_chat_writes()
+        conn = get_db_connection()
+        # Rank inside the FTS index alone, then join (CROSS JOIN keeps that order) and
+        # build snippets for just the top rows
+        rows = conn.execute('''
+            SELECT h.id, h.message_type, h.created_at, h.session_id, top.rank,
+                   snippet(chat_history_fts, 0, '**', '**', '…', 12) AS user_snippet,
+                   snippet(chat_history_fts, 1, '**', '**', '…', 24) AS ai_snippet
+            FROM (
+                SELECT rowid, bm25(chat_history_fts, 1.0, 1.0, 0.0) AS rank
+                FROM chat_history_fts
+                WHERE chat_history_fts MATCH ?
+                ORDER BY rank, rowid DESC
+                LIMIT ?
+            ) AS top
+            CROSS JOIN chat_history_fts ON chat_history_fts.rowid = top.rowid
+            JOIN chat_history h ON h.id = top.rowid
+            WHERE chat_history_fts MATCH ?
+            ORDER BY top.rank, h.id DESC
+        ''', (match, limit, match)).fetchall()
+        
+        # bm25() is lower for better matches; report it the other way round
+        return [{
+            'id': row['id'],
+            'message_type': row['message_type'],
+            'created_at': row['created_at'],
+            'session_id': row['session_id'],
+            'user_snippet': row['user_snippet'],
+            'ai_snippet': row['ai_snippet'],
+            'score': round(-row['rank'], 4)
+        } for row in rows]
+    except sqlite3.Error as e:
+        print(f"❌ Error searching chat history: {e}")
+        return []
+
+@db_call_seconds.time('clear_chat_history')
 def clear_chat_history(session_id=None):
     """Clear chat history"""
     try:
+        flush_chat_writes()
         conn = get_db_connection()
-        cursor = conn.cursor()
         
-        if session_id:
-            cursor.execute('DELETE FROM chat_history WHERE session_id = ?', (session_id,))
-        else:
-            cursor.execute('DELETE FROM chat_history')
+        with conn:
+            if session_id:
+                cursor = conn.execute('DELETE FROM chat_history WHERE session_id = ?', (session_id,))
+            else:
+                cursor = conn.execute('DELETE FROM chat_history')
         
         affected_rows = cursor.rowcount
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
         print(f"✅ Cleared {affected_rows} chat messages")
         return True
     except sqlite3.Error as e:
         print(f"❌ Error clearing chat history: {e}")
         return False
 
-def get_chat_stats():
-    """Get chat history statistics"""
+@db_call_seconds.time('rebuild_chat_stats')
+def rebuild_chat_stats():
+    """Recompute the chat_stats counters from scratch"""
     try:
+        flush_chat_writes()
+        conn = get_db_connection()
+        with conn:
+            _recount_chat_stats(conn)
+        print("✅ Rebuilt chat statistics")
+        return True
+    except sqlite3.Error as e:
+        print(f"❌ Error rebuilding chat stats: {e}")
+        return False
+
+@db_call_seconds.time('get_chat_stats')
+def get_chat_stats(session_id=None):
+    """Get chat history statistics from the maintained counters"""
+    try:
+        flush_chat_writes()
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT COUNT(*) as total_messages FROM chat_history')
-        total = cursor.fetchone()['total_messages']
-        
-        cursor.execute('''
-            SELECT COUNT(*) as recent_messages 
-            FROM chat_history 
-            WHERE created_at >= datetime('now', '-7 days')
-        ''')
-        recent = cursor.fetchone()['recent_messages']
         
-        cursor.close()
-        conn.close()
+        # Last 7 days including today, as day buckets (created_at is local time)
+        since = (datetime.now() - timedelta(days=6)).strftime('%Y-%m-%d')
+        rows = conn.execute('''
+            SELECT scope, key, count FROM chat_stats
+            WHERE (scope = 'total' AND key = '')
+               OR (scope = 'day' AND key >= ?)
+               OR (scope = 'session' AND key = ?)
+               OR scope = 'type'
+        ''', (since, session_id)).fetchall()
         
-        return {
-            'total_messages': total,
-            'recent_messages': recent
+        stats = {
+            'total_messages': 0,
+            'recent_messages': 0,
+            'messages_by_type': {}
         }
+        for row in rows:
+            if row['scope'] == 'total':
+                stats['total_messages'] = row['count']
+            elif row['scope'] == 'day':
+                stats['recent_messages'] += row['count']
+            elif row['scope'] == 'session':
+                stats['session_messages'] = row['count']
+            elif row['count'] > 0:
+                stats['messages_by_type'][row['key']] = row['count']
+        
+        if session_id is not None:
+            stats.setdefault('session_messages', 0)
+        return stats
     except sqlite3.Error as e:
         print(f"❌ Error getting chat stats: {e}")
         return {'total_messages': 0, 'recent_messages': 0}
@@ -1,7 +1,20 @@
 import re
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
 import os
+from queue import Queue, Empty
+import threading
+import time
 from models import add_task
+from knowledge import get_knowledge_base, tokenize
+from response_cache import ResponseCache, SemanticCache
+from circuit_breaker import CircuitBreaker
+from deadline import Deadline
+from provider_registry import ProviderRegistry
+from rate_limiter import RateLimiter, estimate_tokens
+from router import ProviderRouter
+from metrics import Counter, Histogram, registry
+from singleflight import SingleFlight
 
 # Load environment variables from .env file if it exists
 try:
@@ -16,58 +29,103 @@ DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 
+# Send DeepSeek and OpenAI requests to a local fake provider (python fake_provider.py)
+# for load tests, with placeholder keys so no real quota is used. Gemini doesn't use
+# the OpenAI API, so it is turned off.
+AI_FAKE_PROVIDER_URL = os.getenv('AI_FAKE_PROVIDER_URL', '').rstrip('/')
+if AI_FAKE_PROVIDER_URL:
+    DEEPSEEK_API_KEY = OPENAI_API_KEY = 'fake-provider-key'
+    GEMINI_API_KEY = None
+
+# Provider endpoints; OPENAI_BASE_URL unset means the official API
+DEEPSEEK_BASE_URL = os.getenv('DEEPSEEK_BASE_URL',
+                              f'{AI_FAKE_PROVIDER_URL}/deepseek' if AI_FAKE_PROVIDER_URL else 'https://api.deepseek.com')
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', f'{AI_FAKE_PROVIDER_URL}/openai/v1' if AI_FAKE_PROVIDER_URL else None)
+
+# Model settings; they are part of the response cache key
+DEEPSEEK_MODEL = os.getenv('DEEPSEEK_MODEL', 'deepseek-chat')
+OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-1.5-flash')
+VISION_MODEL = os.getenv('VISION_MODEL', 'gpt-4-vision-preview')
+AI_MAX_TOKENS = int(os.getenv('AI_MAX_TOKENS', '150'))
+AI_TEMPERATURE = float(os.getenv('AI_TEMPERATURE', '0.7'))
+# SDK-level retries; each one would get the full remaining deadline again, and the
+# provider chain already falls back to the next provider
+AI_MAX_RETRIES = int(os.getenv('AI_MAX_RETRIES', '0'))
+
+SYSTEM_PROMPT = "You are Aditya AI, a helpful personal assistant. Provide concise, helpful answers. Keep responses under 100 words unless the user specifically asks for detailed information."
+
+# How questions reach the providers: 'sequential' (one after another), 'hedged' (also
+# ask the next provider when there is no answer within AI_HEDGE_DELAY_MS) or 'race'
+# (ask all at once). Routes can override it per call.
+PROVIDER_MODES = ('sequential', 'hedged', 'race')
+AI_PROVIDER_MODE = os.getenv('AI_PROVIDER_MODE', 'sequential')
+AI_HEDGE_DELAY_MS = int(os.getenv('AI_HEDGE_DELAY_MS', '500'))
+AI_HEDGE_WORKERS = int(os.getenv('AI_HEDGE_WORKERS', '8'))
+
 # Determine which API to use (prioritize APIs that are working)
 USE_DEEPSEEK = DEEPSEEK_API_KEY is not None
 USE_OPENAI = OPENAI_API_KEY is not None
 USE_GEMINI = GEMINI_API_KEY is not None
 
-# Initialize clients if keys are available
-deepseek_client = None
-openai_client = None
-gemini_client = None
-
-# DeepSeek API setup
-if USE_DEEPSEEK:
+# Provider clients are built on first use: importing the SDKs is slow, and routes
+# that never ask a provider shouldn't pay for it
+def create_deepseek_client():
+    """DeepSeek client (OpenAI-compatible API), or None if it can't be set up"""
     try:
         from openai import OpenAI
-        deepseek_client = OpenAI(
+        client = OpenAI(
             api_key=DEEPSEEK_API_KEY,
-            base_url="https://api.deepseek.com"
+            base_url=DEEPSEEK_BASE_URL,
+            max_retries=AI_MAX_RETRIES
         )
         print("✅ DeepSeek API configured")
+        return client
     except ImportError:
         print("⚠️  OpenAI library not installed. DeepSeek will not be available.")
-        USE_DEEPSEEK = False
     except Exception as e:
         print(f"⚠️  DeepSeek configuration error: {e}.")
-        USE_DEEPSEEK = False
+    return None
 
-# OpenAI API setup
-if USE_OPENAI:
+def create_openai_client():
+    """OpenAI client, or None if it can't be set up"""
     try:
         from openai import OpenAI
-        openai_client = OpenAI(api_key=OPENAI_API_KEY)
+        client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, max_retries=AI_MAX_RETRIES)
         print("✅ OpenAI API configured")
+        return client
     except ImportError:
         print("⚠️  OpenAI library not installed.")
-        USE_OPENAI = False
     except Exception as e:
         print(f"⚠️  OpenAI configuration error: {e}.")
-        USE_OPENAI = False
+    return None
 
-# Gemini API setup
-if USE_GEMINI:
+def create_gemini_client():
+    """Gemini model client, or None if it can't be set up"""
     try:
         import google.generativeai as genai
         genai.configure(api_key=GEMINI_API_KEY)
-        gemini_client = genai.GenerativeModel('gemini-1.5-flash')
+        client = genai.GenerativeModel(GEMINI_MODEL)
         print("✅ Gemini API configured")
+        return client
     except ImportError:
         print("⚠️  Google Generative AI library not installed. Run: pip install google-generativeai")
-        USE_GEMINI = False
     except Exception as e:
         print(f"⚠️  Gemini configuration error: {e}.")
-        USE_GEMINI = False
+    return None
+
+provider_clients = ProviderRegistry()
+if USE_DEEPSEEK:
+    provider_clients.register('deepseek', create_deepseek_client)
+if USE_OPENAI:
+    provider_clients.register('openai', create_openai_client)
+if USE_GEMINI:
+    provider_clients.register('gemini', create_gemini_client)
+
+def get_provider_client(name):
+    """Client for a provider with an API key, built on first use; None if unavailable"""
+    enabled = {'deepseek': USE_DEEPSEEK, 'openai': USE_OPENAI, 'gemini': USE_GEMINI}[name]
+    return provider_clients.get(name) if enabled else None
 
 if not USE_DEEPSEEK and not USE_OPENAI and not USE_GEMINI:
     print("ℹ️  Using built-in responses (no API keys provided or configured)")
@@ -138,27 +196,76 @@ def extract_datetime_from_text(text):
     
     return None
 
-def detect_intent(text):
-    """Detect user intent from natural language text"""
-    text_lower = text.lower()
+class KeywordMatcher:
+    """Finds the first of several keyword groups that occurs in a text
     
-    # Reminder keywords
-    reminder_keywords = ['remind', 'reminder', 'remember', 'don\'t forget']
-    if any(keyword in text_lower for keyword in reminder_keywords):
-        return 'reminder'
+    Groups are in priority order and keywords match as plain substrings, so
+    match() gives the same answer as trying `any(k in text for k in group)`
+    group by group. All keywords are compiled once into a single trie-shaped
+    regex, so the text is scanned by the regex engine rather than once per
+    keyword. Each search resumes one character after the previous match
+    starts, which still finds keywords that overlap.
+    """
     
-    # Schedule/task keywords
-    schedule_keywords = ['schedule', 'plan', 'appointment', 'meeting', 'task', 'todo']
-    if any(keyword in text_lower for keyword in schedule_keywords):
-        return 'schedule'
+    def __init__(self, groups):
+        ranks = {}
+        for rank, group in enumerate(groups):
+            for keyword in group:
+                ranks.setdefault(keyword, rank)
+        
+        # The regex reports the longest keyword at each position; every shorter
+        # keyword matching there is a prefix of it, so fold their ranks in
+        self._ranks = {
+            keyword: min(rank for other, rank in ranks.items() if keyword.startswith(other))
+            for keyword in ranks
+        }
+        self._pattern = re.compile(self._trie_pattern(ranks))
     
-    # Question keywords
-    question_keywords = ['what', 'how', 'when', 'where', 'why', 'who', 'which', '?']
-    if any(keyword in text_lower for keyword in question_keywords):
-        return 'question'
+    @staticmethod
+    def _trie_pattern(keywords):
+        trie = {}
+        for keyword in keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = {}
+        
+        def build(node):
+            branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+            if not branches:
+                return ''
+            body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+            # Greedy optional group: prefer the longer keyword at this position
+            return f"(?:{body})?" if '' in node else body
+        
+        return build(trie)
+    
+    def match(self, text):
+        """Index of the highest-priority group with a keyword in text, or None"""
+        best = None
+        found = self._pattern.search(text)
+        while found:
+            rank = self._ranks[found.group()]
+            if best is None or rank < best:
+                best = rank
+                if best == 0:
+                    break
+            found = self._pattern.search(text, found.start() + 1)
+        return best
+
+INTENT_KEYWORDS = [
+    ('reminder', ['remind', 'reminder', 'remember', 'don\'t forget']),
+    ('schedule', ['schedule', 'plan', 'appointment', 'meeting', 'task', 'todo']),
+    ('question', ['what', 'how', 'when', 'where', 'why', 'who', 'which', '?']),
+]
+_intent_matcher = KeywordMatcher([keywords for _, keywords in INTENT_KEYWORDS])
+
+def detect_intent(text):
+    """Detect user intent from natural language text"""
+    rank = _intent_matcher.match(text.lower())
     
     # Default to question if unsure
-    return 'question'
+    return INTENT_KEYWORDS[rank][0] if rank is not None else 'question'
 
 def extract_task_content(text, intent):
     """Extract the actual task content from the user input"""
@@ -195,117 +302,108 @@ def extract_task_content(text, intent):
     
     return text.strip()
 
+# Questions that miss the knowledge base still get the "interesting question" reply
+QUESTION_WORDS = {'what', 'how', 'why', 'when', 'where', 'who'}
+
 def get_predefined_answer(question):
-    """Provide comprehensive predefined answers for common questions"""
-    question_lower = question.lower()
-    
-    # Enhanced AI and tech questions
-    if any(phrase in question_lower for phrase in ['artificial intelligence', 'what is ai', 'what ai', 'ai is']):
-        return "🤖 Artificial Intelligence (AI) enables machines to simulate human intelligence through learning, reasoning, and problem-solving. AI includes machine learning, natural language processing, computer vision, and robotics. Modern AI powers virtual assistants, recommendation systems, autonomous vehicles, and medical diagnostics. I'm an example of AI designed to help you manage tasks and answer questions intelligently!"
-    
-    if any(phrase in question_lower for phrase in ['machine learning', 'what is ml', 'ml is', 'deep learning']):
-        return "🧠 Machine Learning is AI that learns patterns from data without explicit programming. It powers Netflix recommendations, fraud detection, image recognition, and language translation. Types include: Supervised (labeled data), Unsupervised (pattern finding), and Reinforcement (trial-and-error). Deep Learning uses neural networks to process complex data like images and speech."
-    
-    if any(phrase in question_lower for phrase in ['python programming', 'python', 'learn python']):
-        return "🐍 Python is a versatile, beginner-friendly programming language known for readable syntax. It's used in web development (Django/Flask), data science (pandas/numpy), AI/ML (TensorFlow/PyTorch), automation, and scientific computing. Start with basics: variables, functions, loops, then explore libraries for your interests!"
-    
-    if any(phrase in question_lower for phrase in ['javascript', 'js programming', 'web development']):
-        return "💻 JavaScript powers interactive websites and web applications. It runs in browsers (frontend) and servers (Node.js backend). Key concepts: variables, functions, DOM manipulation, async/await, and frameworks like React, Vue, Angular. Essential for modern web development!"
-    
-    if any(phrase in question_lower for phrase in ['blockchain', 'cryptocurrency', 'bitcoin', 'crypto']):
-        return "⛓️ Blockchain is a distributed ledger technology using cryptographic hashing to secure transaction records. Each block contains previous block's hash, creating an immutable chain. Applications: cryptocurrencies (Bitcoin, Ethereum), smart contracts, supply chain tracking, and decentralized finance (DeFi)."
-    
-    # Enhanced productivity and work questions
-    if any(phrase in question_lower for phrase in ['productivity', 'time management', 'organize', 'be productive', 'more productive', 'productive tips']):
-        return "⏰ Boost productivity with: 1) Time blocking - schedule specific tasks, 2) Pomodoro Technique - 25min focused work + 5min breaks, 3) GTD system - capture, clarify, organize, reflect, engage, 4) Eliminate distractions - phone notifications off, 5) Prioritize with Eisenhower Matrix (urgent/important)."
-    
-    if any(phrase in question_lower for phrase in ['study tips', 'learning', 'how to learn']):
-        return "📚 Effective learning strategies: 1) Active recall - test yourself frequently, 2) Spaced repetition - review at increasing intervals, 3) Feynman Technique - explain concepts simply, 4) Practice retrieval over re-reading, 5) Create connections between new and existing knowledge, 6) Take breaks for memory consolidation."
-    
-    # Health and wellness
-    if any(phrase in question_lower for phrase in ['meditation', 'mindfulness', 'stress relief']):
-        return "🧘 Meditation reduces stress, improves focus, and enhances emotional well-being. Start with 5-10 minutes daily: 1) Find quiet space, 2) Focus on breathing, 3) Notice when mind wanders, 4) Gently return attention to breath. Apps like Headspace or Calm can guide beginners. Benefits include lower anxiety, better sleep, and increased concentration."
-    
-    if any(phrase in question_lower for phrase in ['exercise', 'fitness', 'workout', 'health']):
-        return "💪 Regular exercise improves physical and mental health. WHO recommends 150 minutes moderate aerobic activity weekly plus 2 strength training sessions. Benefits: stronger heart, bones, muscles, better mood, cognitive function, sleep quality. Start small - 10-minute walks, bodyweight exercises, then gradually increase intensity."
-    
-    if any(phrase in question_lower for phrase in ['sleep', 'better sleep', 'insomnia']):
-        return "😴 Quality sleep is crucial for health. Tips: 1) Consistent sleep schedule (same bedtime/wake time), 2) Cool, dark room (60-67°F), 3) No screens 1 hour before bed, 4) Limit caffeine after 2 PM, 5) Regular exercise (not before bed), 6) Relaxation techniques, 7) Comfortable mattress/pillows."
-    
-    # Science questions
-    if any(phrase in question_lower for phrase in ['climate change', 'global warming', 'environment']):
-        return "🌍 Climate change refers to long-term shifts in global temperatures and weather patterns. Human activities, especially fossil fuel burning, increase greenhouse gases (CO₂, methane). Effects: rising sea levels, extreme weather, ecosystem disruption. Solutions: renewable energy, energy efficiency, sustainable transportation, carbon capture."
-    
-    if any(phrase in question_lower for phrase in ['space', 'universe', 'astronomy', 'stars']):
-        return "🌌 The universe is approximately 13.8 billion years old and contains billions of galaxies, each with billions of stars. Recent discoveries include gravitational waves, exoplanets in habitable zones, and images of black holes. Space exploration continues with Mars rovers, James Webb Space Telescope, and plans for lunar bases."
-    
-    # Personal development
-    if any(phrase in question_lower for phrase in ['career advice', 'job search', 'career']):
-        return "🚀 Career development tips: 1) Identify your strengths and interests, 2) Develop both technical and soft skills, 3) Network genuinely - help others first, 4) Seek mentorship and feedback, 5) Embrace continuous learning, 6) Build an online presence (LinkedIn, portfolio), 7) Practice interviewing, 8) Consider side projects to showcase skills."
-    
-    if any(phrase in question_lower for phrase in ['communication', 'public speaking', 'presentation']):
-        return "🗣️ Effective communication skills: 1) Listen actively - understand before seeking to be understood, 2) Be clear and concise, 3) Use storytelling for engagement, 4) Practice empathy, 5) Ask thoughtful questions, 6) For presentations: know your audience, practice extensively, use visuals effectively, manage nerves through preparation."
+    """Answer from the built-in knowledge base (knowledge_base.json)"""
+    knowledge_base = get_knowledge_base()
+    entry, _ = knowledge_base.search(question)
     
-    # Technology trends
-    if any(phrase in question_lower for phrase in ['future technology', 'tech trends', 'innovation']):
-        return "🚀 Emerging tech trends: 1) AI & Machine Learning automation, 2) Quantum computing breakthroughs, 3) Extended Reality (AR/VR/MR), 4) 5G and edge computing, 5) Internet of Things (IoT) expansion, 6) Sustainable technology solutions, 7) Biotechnology advances, 8) Autonomous systems. These will reshape work, communication, and daily life."
-    
-    # Creative and hobbies
-    if any(phrase in question_lower for phrase in ['creative', 'creativity', 'art', 'drawing']):
-        return "🎨 Boost creativity: 1) Set aside dedicated creative time, 2) Try new experiences and perspectives, 3) Practice regularly - skill enables creativity, 4) Embrace failure as learning, 5) Collaborate with others, 6) Study masters in your field, 7) Take breaks for inspiration, 8) Keep a creative journal or sketchbook."
-    
-    # Time and date questions
-    if any(phrase in question_lower for phrase in ['what time', 'time is', 'current time']):
-        return f"⏰ Current time: {datetime.now().strftime('%I:%M %p on %A, %B %d, %Y')}"
-    
-    if any(phrase in question_lower for phrase in ['what date', 'date today', 'today']):
-        return f"📅 Today is {datetime.now().strftime('%A, %B %d, %Y')}"
-    
-    # Basic greetings and conversation
-    if any(phrase in question_lower for phrase in ['hello', 'hi there', 'hey there', 'good morning', 'good afternoon']) or question_lower.strip() in ['hi', 'hello', 'hey']:
-        return "👋 Hello! I'm Aditya AI, your intelligent assistant. I can help you set reminders, schedule tasks, answer questions on technology, science, health, productivity, and much more. What would you like to know or accomplish today?"
-    
-    if any(phrase in question_lower for phrase in ['how are you', 'how do you feel', 'what\'s up']):
-        return "😊 I'm doing excellent and ready to help! I have extensive built-in knowledge and can assist with tasks, answer questions, and provide detailed explanations on many topics. How can I assist you today?"
-    
-    if any(phrase in question_lower for phrase in ['thank you', 'thanks', 'appreciate']):
-        return "🙏 You're very welcome! I'm here to help whenever you need assistance. Feel free to ask me anything or set up reminders and tasks!"
-    
-    # Help and capabilities
-    if 'help' in question_lower or 'what can you do' in question_lower:
-        return "🔧 I can help you with:\n• 📝 Setting reminders ('remind me to call mom tomorrow')\n• 📅 Scheduling tasks ('schedule meeting at 3pm')\n• 🤖 Technology & programming questions\n• 🧪 Science explanations\n• 💪 Health & wellness advice\n• 📚 Learning & productivity tips\n• 🚀 Career guidance\n• 🎨 Creative inspiration\n\nJust ask me anything!"
+    if entry is not None:
+        if not entry.get('template'):
+            return entry['answer']
+        now = datetime.now()
+        return entry['answer'].format(
+            question=question,
+            time=now.strftime('%I:%M %p on %A, %B %d, %Y'),
+            date=now.strftime('%A, %B %d, %Y'),
+        )
     
     # Fallback for unmatched questions
-    if '?' in question or any(word in question_lower for word in ['what', 'how', 'why', 'when', 'where', 'who']):
-        return f"🤔 That's an interesting question about '{question}'. While I have extensive built-in knowledge, I may not have specific information about this topic. I can help with technology, science, health, productivity, learning, and general questions. Could you try rephrasing or ask about a related topic I might know?"
+    if '?' in question or QUESTION_WORDS.intersection(tokenize(question)):
+        return knowledge_base.fallback.format(question=question)
     
     # Default friendly response
-    return "💡 I'm here to help! I have knowledge about technology, science, health, productivity, learning, and many other topics. I can also help you set reminders and schedule tasks. What would you like to know or do?"
+    return knowledge_base.default
+
+# Answers to these change from one moment to the next, so they are never cached
+TIME_SENSITIVE_WORDS = {'time', 'date', 'day', 'today', 'tonight', 'now', 'tomorrow', 'yesterday',
+                        'current', 'currently', 'latest', 'news', 'weather'}
+
+# Exact repeats per provider, and near-duplicates in front of the whole provider chain
+response_cache = ResponseCache()
+semantic_cache = SemanticCache()
+# Identical questions asked at the same time share one round of provider calls
+provider_flights = SingleFlight()
+
+def is_time_sensitive(question):
+    return bool(TIME_SENSITIVE_WORDS.intersection(tokenize(question)))
+
+def response_cache_key(provider, model, question):
+    """Cache key for a provider answer, or None when the question must not be cached"""
+    normalized = clean_user_input(question).casefold()
+    if not normalized or is_time_sensitive(normalized):
+        return None
+    return (provider, model, AI_MAX_TOKENS, AI_TEMPERATURE, normalized)
+
+def provider_model(name):
+    """The model a provider is asked for; part of its response cache key"""
+    return {'deepseek': DEEPSEEK_MODEL, 'openai': OPENAI_MODEL, 'gemini': GEMINI_MODEL}[name]
+
+def cached_provider_answer(question, providers, route=None):
+    """An answer one of `providers` (configured names) already gave to this exact question, or None
     
-    # More comprehensive fallback
-    return "I have built-in knowledge on topics like technology (AI, programming, quantum computing), science (biology, physics, space), health (exercise, meditation), and general knowledge. I can also help you set reminders and schedule tasks. What would you like to know about?"
+    Checked before any provider is picked, so a cached answer costs no rate
+    limit quota and isn't counted as a provider attempt. A pinned route is
+    narrowed to configured providers, as route_providers() does, and the
+    whole check counts as a single cache hit or miss.
+    """
+    names = [name for name in route if name in providers] if route is not None else providers
+    return response_cache.get_first(response_cache_key(name, provider_model(name), question) for name in names)
+
+def get_similar_answer(question):
+    """A provider answer given earlier to a near-duplicate question, or None"""
+    if is_time_sensitive(question):
+        return None
+    return semantic_cache.get(question)
 
-def query_deepseek(question):
+def remember_answer(question, answer):
+    if not is_time_sensitive(question):
+        semantic_cache.put(question, answer)
+
+def request_timeout(timeout):
+    """Per-call SDK options for a timeout in seconds (None: the client's default)"""
+    return {} if timeout is None else {'timeout': timeout}
+
+def query_deepseek(question, timeout=None):
     """Query DeepSeek API for smart answers"""
-    if not USE_DEEPSEEK or not deepseek_client:
+    client = get_provider_client('deepseek')
+    if not client:
         return None
     
+    # Looked up by answer_with_ai() before any quota is spent; only stored here
+    cache_key = response_cache_key('deepseek', DEEPSEEK_MODEL, question)
+    
     try:
         # Create the prompt for DeepSeek
         messages = [
-            {"role": "system", "content": "You are Aditya AI, a helpful personal assistant. Provide concise, helpful answers. Keep responses under 100 words unless the user specifically asks for detailed information."},
+            {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": question}
         ]
         
-        response = deepseek_client.chat.completions.create(
-            model="deepseek-chat",
+        response = client.chat.completions.create(
+            model=DEEPSEEK_MODEL,
             messages=messages,
-            max_tokens=150,
-            temperature=0.7
+            max_tokens=AI_MAX_TOKENS,
+            temperature=AI_TEMPERATURE,
+            **request_timeout(timeout)
         )
         
         if response.choices and response.choices[0].message.content:
-            return response.choices[0].message.content.strip()
+            answer = response.choices[0].message.content.strip()
+            response_cache.put(cache_key, answer)
+            return answer
         else:
             return None
     
@@ -324,27 +422,34 @@ def query_deepseek(question):
             print(f"❌ DeepSeek API error: {e}")
             return None
 
-def query_openai(question):
+def query_openai(question, timeout=None):
     """Query OpenAI API for smart answers"""
-    if not USE_OPENAI or not openai_client:
+    client = get_provider_client('openai')
+    if not client:
         return None
     
+    # Looked up by answer_with_ai() before any quota is spent; only stored here
+    cache_key = response_cache_key('openai', OPENAI_MODEL, question)
+    
     try:
         # Create the prompt for OpenAI
         messages = [
-            {"role": "system", "content": "You are Aditya AI, a helpful personal assistant. Provide concise, helpful answers. Keep responses under 100 words unless the user specifically asks for detailed information."},
+            {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": question}
         ]
         
-        response = openai_client.chat.completions.create(
-            model="gpt-3.5-turbo",
+        response = client.chat.completions.create(
+            model=OPENAI_MODEL,
             messages=messages,
-            max_tokens=150,
-            temperature=0.7
+            max_tokens=AI_MAX_TOKENS,
+            temperature=AI_TEMPERATURE,
+            **request_timeout(timeout)
         )
         
         if response.choices and response.choices[0].message.content:
-            return response.choices[0].message.content.strip()
+            answer = response.choices[0].message.content.strip()
+            response_cache.put(cache_key, answer)
+            return answer
         else:
             return None
     
@@ -360,21 +465,28 @@ def query_openai(question):
             print(f"❌ OpenAI API error: {e}")
             return None
 
-def query_gemini(question):
+def query_gemini(question, timeout=None):
     """Query Gemini API for smart answers"""
-    if not USE_GEMINI or not gemini_client:
+    client = get_provider_client('gemini')
+    if not client:
         return None
     
+    # Looked up by answer_with_ai() before any quota is spent; only stored here
+    cache_key = response_cache_key('gemini', GEMINI_MODEL, question)
+    
     try:
         # Create the prompt for Gemini
-        prompt = f"""You are Aditya AI, a helpful personal assistant. Provide concise, helpful answers. Keep responses under 100 words unless the user specifically asks for detailed information.
+        prompt = f"""{SYSTEM_PROMPT}
 
 User question: {question}"""
         
-        response = gemini_client.generate_content(prompt)
+        options = {} if timeout is None else {'request_options': {'timeout': timeout}}
+        response = client.generate_content(prompt, **options)
         
         if response.text:
-            return response.text.strip()
+            answer = response.text.strip()
+            response_cache.put(cache_key, answer)
+            return answer
         else:
             return None
     
@@ -390,7 +502,418 @@ User question: {question}"""
             print(f"❌ Gemini API error: {e}")
             return None
 
-def process_query(user_input):
+# Fallback order for questions, and each provider's shared health state
+PROVIDER_NAMES = {'deepseek': 'DeepSeek', 'openai': 'OpenAI', 'gemini': 'Gemini'}
+PROVIDER_ERRORS = ("billing_error", "quota_exceeded", "auth_error")
+provider_breakers = {name: CircuitBreaker(label) for name, label in PROVIDER_NAMES.items()}
+# Client-side quotas, e.g. DEEPSEEK_RPM=60 and DEEPSEEK_TPM=100000 (0 or unset: no limit)
+provider_limiters = {
+    name: RateLimiter(label, int(os.getenv(f'{name.upper()}_RPM', '0')), int(os.getenv(f'{name.upper()}_TPM', '0')))
+    for name, label in PROVIDER_NAMES.items()
+}
+# Orders the providers for each question by their observed latency and success rate
+provider_router = ProviderRouter()
+# Call outcomes are 'success', one of PROVIDER_ERRORS, 'error' or 'rate_limited'
+provider_calls = Counter('assistant_provider_calls_total', 'AI provider calls by outcome', ('provider', 'outcome'))
+provider_call_seconds = Histogram('assistant_provider_call_duration_seconds', 'AI provider call latency',
+                                  ('provider',))
+# Which tier answered each question: 'cache' (an earlier provider answer), 'provider' or 'builtin'
+answers_served = Counter('assistant_answers_total', 'Questions answered, by the tier that answered', ('tier',))
+rate_limit_wait_seconds = Histogram('assistant_rate_limit_wait_seconds',
+                                    'Time admitted questions waited for a provider quota', ('provider',))
+
+if AI_PROVIDER_MODE not in PROVIDER_MODES:
+    print(f"⚠️  Unknown AI_PROVIDER_MODE '{AI_PROVIDER_MODE}', using sequential")
+    AI_PROVIDER_MODE = 'sequential'
+
+def configured_providers():
+    """(name, query function) for each provider with an API key, in fallback order"""
+    providers = []
+    if get_provider_client('deepseek'):
+        providers.append(('deepseek', query_deepseek))
+    if get_provider_client('openai'):
+        providers.append(('openai', query_openai))
+    if get_provider_client('gemini'):
+        providers.append(('gemini', query_gemini))
+    return providers
+
+def route_providers(providers, route=None):
+    """The providers in the order to ask them: as pinned by `route`, else by the router"""
+    queries = dict(providers)
+    return [(name, queries[name]) for name in provider_router.order(list(queries), route)]
+
+def attempt_outcome(answer):
+    """'success', or the failure kind for a query function's return value"""
+    if answer in PROVIDER_ERRORS:
+        return answer
+    return 'success' if answer else 'error'
+
+def record_attempt(name, outcome, seconds):
+    """Feed one upstream provider request to the router and the metrics
+    
+    Only real requests belong here: cached answers are served before a
+    provider is picked, so they never skew its latency or success rate.
+    """
+    provider_router.record(name, outcome == 'success', seconds)
+    provider_calls.inc(name, outcome)
+    provider_call_seconds.observe(seconds, name)
+
+def estimate_request_tokens(question):
+    """Tokens a question may use: the prompt plus the longest allowed answer"""
+    return estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(question) + AI_MAX_TOKENS
+
+def admission_wait(name, deadline=None):
+    """Longest a question may wait for the provider's quota"""
+    limiter = provider_limiters[name]
+    return min(limiter.max_wait, deadline.remaining()) if deadline else None
+
+def record_admission(name, admitted, seconds):
+    """Count a rate limit decision: the wait if admitted, a 'rate_limited' call if not"""
+    if admitted:
+        if provider_limiters[name].enabled:
+            rate_limit_wait_seconds.observe(seconds, name)
+        return
+    provider_calls.inc(name, 'rate_limited')
+    print(f"⚠️ {PROVIDER_NAMES[name]} rate limit reached, trying the next provider")
+
+def admit(name, question, deadline=None):
+    """Wait for room in the provider's rate limit; False when the question should go elsewhere"""
+    start = time.monotonic()
+    admitted = provider_limiters[name].acquire(estimate_request_tokens(question), admission_wait(name, deadline))
+    record_admission(name, admitted, time.monotonic() - start)
+    return admitted
+
+def call_provider(name, query, question, deadline=None):
+    """Ask one provider and record the outcome on its breaker, the router and the metrics; the answer or None"""
+    breaker = provider_breakers[name]
+    if not admit(name, question, deadline):
+        # The provider was never asked, so a half-open probe is still free
+        breaker.release_probe()
+        return None
+    start = time.monotonic()
+    try:
+        answer = query(question, deadline.remaining()) if deadline else query(question)
+    except Exception as e:
+        print(f"❌ {PROVIDER_NAMES[name]} query failed: {e}")
+        answer = None
+    
+    outcome = attempt_outcome(answer)
+    record_attempt(name, outcome, time.monotonic() - start)
+    if outcome == 'success':
+        breaker.record_success()
+        return answer
+    breaker.record_failure(outcome)
+    return None
+
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+
+def get_hedge_executor():
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=AI_HEDGE_WORKERS, thread_name_prefix='ai-hedge')
+        return _hedge_executor
+
+def query_providers_hedged(question, providers, delay, deadline=None):
+    """Start providers in fallback order on the hedge pool and return the first answer
+    
+    The next provider starts when the running ones have been quiet for `delay`
+    seconds or one of them fails; delay=0 starts them all at once. Slower
+    requests, and all of them once the deadline passes, are abandoned, but
+    still record their outcome on the breakers.
+    """
+    executor = get_hedge_executor()
+    remaining = iter(providers)
+    pending = {}
+    
+    def launch_next():
+        for name, query in remaining:
+            if provider_breakers[name].allow():
+                pending[executor.submit(call_provider, name, query, question, deadline)] = name
+                return True
+        return False
+    
+    def cancel_pending():
+        # Calls that never started give back any breaker probe they were granted
+        for future, name in pending.items():
+            if future.cancel():
+                provider_breakers[name].release_probe()
+    
+    more = launch_next()
+    while more and delay <= 0:
+        more = launch_next()
+    
+    while pending:
+        timeout = delay if more else None
+        if deadline:
+            if deadline.expired():
+                break
+            timeout = deadline.remaining() if timeout is None else min(timeout, deadline.remaining())
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            del pending[future]
+        for future in done:
+            answer = future.result()
+            if answer:
+                cancel_pending()
+                return answer
+        # Either the hedge delay passed or a provider failed: bring in the next one
+        if more:
+            more = launch_next()
+    # Out of time: calls still queued on the pool needn't start at all
+    cancel_pending()
+    return None
+
+def query_ai_providers(question, mode=None, deadline=None, route=None):
+    """Ask the healthy providers and return the first answer, or None
+    
+    Providers are tried in the router's order, or the one pinned by `route`.
+    Those whose circuit breaker is open are skipped without a request, so a
+    provider that is out of credit costs nothing until its next probe. No
+    provider is asked once the deadline has passed.
+    """
+    mode = mode or AI_PROVIDER_MODE
+    providers = route_providers(configured_providers(), route)
+    if mode in ('hedged', 'race') and len(providers) > 1:
+        delay = 0 if mode == 'race' else AI_HEDGE_DELAY_MS / 1000
+        return query_providers_hedged(question, providers, delay, deadline)
+    
+    for name, query in providers:
+        if deadline and deadline.expired():
+            break
+        if not provider_breakers[name].allow():
+            continue
+        answer = call_provider(name, query, question, deadline)
+        if answer:
+            return answer
+    return None
+
+def get_provider_health():
+    """Circuit breaker and rate limit state of every provider"""
+    configured = {name for name, _ in configured_providers()}
+    return {name: dict(breaker.snapshot(), configured=name in configured,
+                        rate_limit=provider_limiters[name].stats())
+            for name, breaker in provider_breakers.items()}
+
+def get_provider_routing():
+    """The router's live provider scores and recent routing decisions"""
+    return provider_router.snapshot()
+
+def provider_state_metrics():
+    """Breaker, rate limit, cache and routing state for /metrics, read on each scrape"""
+    router = provider_router.snapshot()['providers']
+    caches = {'response': response_cache.stats(), 'semantic': semantic_cache.stats()}
+    return [
+        ('assistant_provider_circuit_open', 'gauge', 'Whether the provider is out of rotation', ('provider',),
+         [((name,), int(breaker.snapshot()['state'] != 'closed')) for name, breaker in provider_breakers.items()]),
+        ('assistant_rate_limit_waiting', 'gauge', 'Questions waiting for a provider quota', ('provider',),
+         [((name,), limiter.stats()['waiting']) for name, limiter in provider_limiters.items()]),
+        ('assistant_provider_expected_seconds', 'gauge', 'Router estimate of the time to a good answer',
+         ('provider',), [((name,), score['expected_ms'] / 1000) for name, score in router.items()]),
+        ('assistant_cache_hits_total', 'counter', 'Answer cache hits', ('cache',),
+         [((name,), stats['hits']) for name, stats in caches.items()]),
+        ('assistant_cache_misses_total', 'counter', 'Answer cache misses', ('cache',),
+         [((name,), stats['misses']) for name, stats in caches.items()]),
+        ('assistant_coalesced_questions_total', 'counter', 'Questions answered by an identical one in flight', (),
+         [((), provider_flights.stats()['shared'])]),
+    ]
+
+registry.add_collector(provider_state_metrics)
+
+def flight_key(question, provider_mode=None, route=None):
+    """Questions with the same key are coalesced while one of them is being answered"""
+    return (provider_mode or AI_PROVIDER_MODE, tuple(route or ()), clean_user_input(question).casefold())
+
+def fetch_ai_answer(question, provider_mode=None, deadline=None, route=None):
+    """(answer or None, whether the deadline ran out); shared with every caller coalesced onto this one"""
+    answer = query_ai_providers(question, provider_mode, deadline, route)
+    if answer:
+        remember_answer(question, answer)
+    return answer, not answer and deadline is not None and deadline.expired()
+
+def answer_with_ai(question, provider_mode=None, deadline=None, route=None):
+    """A provider answer for the question (possibly a cached or shared one), or None
+    
+    Without a deadline the default budget applies; if it runs out before an
+    answer arrives, deadline.exceeded is set.
+    """
+    deadline = deadline or Deadline()
+    configured = [name for name, _ in configured_providers()]
+    answer = cached_provider_answer(question, configured, route) or get_similar_answer(question)
+    if answer:
+        answers_served.inc('cache')
+        return answer
+    while True:
+        try:
+            # An identical question already in flight answers this one too, if it does so in time
+            answer, timed_out = provider_flights.do(flight_key(question, provider_mode, route), fetch_ai_answer,
+                                                    question, provider_mode, deadline, route,
+                                                    timeout=deadline.remaining())
+        except TimeoutError:
+            answer, timed_out = None, True
+        # A call that ran out of its own, shorter budget says nothing about this one's: ask again
+        if answer or not timed_out or deadline.expired():
+            break
+    if not answer and deadline.expired():
+        deadline.exceeded = True
+    # Without an answer the callers fall back to the built-in answers
+    answers_served.inc('provider' if answer else 'builtin')
+    return answer
+
+def classify_provider_error(error):
+    """Map a provider exception to 'billing_error', 'quota_exceeded', 'auth_error' or 'error'"""
+    error_str = str(error).lower()
+    if "402" in error_str or "insufficient balance" in error_str or "billing" in error_str:
+        return "billing_error"
+    if "quota" in error_str or "limit" in error_str:
+        return "quota_exceeded"
+    if "401" in error_str or "api key" in error_str or "unauthorized" in error_str:
+        return "auth_error"
+    return "error"
+
+def stream_chat_completion(client, model, question, timeout=None):
+    """Yield answer text from an OpenAI-compatible streaming chat completion"""
+    stream = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": question}
+        ],
+        max_tokens=AI_MAX_TOKENS,
+        temperature=AI_TEMPERATURE,
+        stream=True,
+        **request_timeout(timeout)
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+def stream_deepseek(question, timeout=None):
+    return stream_chat_completion(get_provider_client('deepseek'), DEEPSEEK_MODEL, question, timeout)
+
+def stream_openai(question, timeout=None):
+    return stream_chat_completion(get_provider_client('openai'), OPENAI_MODEL, question, timeout)
+
+def stream_gemini(question, timeout=None):
+    """Yield answer text from a streaming Gemini completion"""
+    prompt = f"""{SYSTEM_PROMPT}
+
+User question: {question}"""
+    options = {} if timeout is None else {'request_options': {'timeout': timeout}}
+    for chunk in get_provider_client('gemini').generate_content(prompt, stream=True, **options):
+        if chunk.text:
+            yield chunk.text
+
+PROVIDER_STREAMS = {'deepseek': stream_deepseek, 'openai': stream_openai, 'gemini': stream_gemini}
+
+def stream_before(chunks, deadline):
+    """Yield `chunks` until the deadline, then raise TimeoutError
+    
+    The SDK timeout only limits each wait for a chunk, so a slow trickle
+    could run well past the deadline. The chunks are read on a helper thread
+    instead, which is abandoned (and stops at its next chunk) once the
+    caller gives up or goes away.
+    """
+    queue = Queue()
+    stop = threading.Event()
+    
+    def read():
+        try:
+            for text in chunks:
+                if stop.is_set():
+                    return
+                queue.put((text, None))
+            queue.put((None, None))
+        except Exception as e:
+            queue.put((None, e))
+    
+    threading.Thread(target=read, name='ai-stream', daemon=True).start()
+    try:
+        while True:
+            try:
+                text, error = queue.get(timeout=deadline.remaining())
+            except Empty:
+                raise TimeoutError("Answer not finished before the deadline") from None
+            if error:
+                raise error
+            if text is None:
+                return
+            yield text
+    finally:
+        stop.set()
+
+def stream_ai_answer(user_input, deadline=None):
+    """Yield ('token', text) pieces of the answer as the providers produce them
+    
+    A provider that fails before its first token is skipped for the next one,
+    as in query_ai_providers. One that dies mid-answer can't be resumed by
+    another provider, so a ('reset', None) event tells the caller to drop the
+    partial text and the built-in answer follows. The deadline (the default
+    budget if None) bounds both the wait for the first token and the whole
+    answer; running out counts as such a failure and sets deadline.exceeded.
+    """
+    question = clean_user_input(user_input)
+    if not question:
+        yield 'token', "Please provide a valid question."
+        return
+    
+    deadline = deadline or Deadline()
+    providers = configured_providers()
+    similar_answer = cached_provider_answer(question, [name for name, _ in providers]) or get_similar_answer(question)
+    if similar_answer:
+        answers_served.inc('cache')
+        yield 'token', similar_answer
+        return
+    
+    for name, _ in route_providers(providers):
+        if deadline.expired():
+            break
+        breaker = provider_breakers[name]
+        if not breaker.allow():
+            continue
+        if not admit(name, question, deadline):
+            breaker.release_probe()
+            continue
+        
+        parts = []
+        start = time.monotonic()
+        try:
+            for text in stream_before(PROVIDER_STREAMS[name](question, deadline.remaining()), deadline):
+                parts.append(text)
+                yield 'token', text
+        except GeneratorExit:
+            # The client went away mid-answer; that says nothing about the provider
+            breaker.release_probe()
+            raise
+        except Exception as e:
+            print(f"❌ {PROVIDER_NAMES[name]} stream failed: {e}")
+            kind = classify_provider_error(e)
+            breaker.record_failure(kind)
+            record_attempt(name, kind, time.monotonic() - start)
+            if parts:
+                yield 'reset', None
+                break
+            continue
+        
+        answer = ''.join(parts).strip()
+        record_attempt(name, 'success' if answer else 'error', time.monotonic() - start)
+        if answer:
+            breaker.record_success()
+            # Cached like query_*()'s answers, so the next /ask or /process gets it without a call
+            response_cache.put(response_cache_key(name, provider_model(name), question), answer)
+            remember_answer(question, answer)
+            answers_served.inc('provider')
+            return
+        breaker.record_failure('error')
+    
+    if deadline.expired():
+        deadline.exceeded = True
+    # Use enhanced built-in knowledge if every provider failed
+    answers_served.inc('builtin')
+    yield 'token', get_predefined_answer(question)
+
+def process_query(user_input, provider_mode=None, deadline=None, route=None):
     """Main function to process user queries and return appropriate responses"""
     try:
         # Clean and validate input
@@ -426,24 +949,11 @@ def process_query(user_input):
                 return f"✅ {intent.capitalize()} added: '{content}'"
         
         elif intent == 'question':
-            # Try DeepSeek first, then OpenAI, then Gemini, then use built-in knowledge
-            answer = query_deepseek(cleaned_input) if USE_DEEPSEEK else None
-            
-            # Fallback to OpenAI if DeepSeek fails or has issues
-            if not answer or answer in ["quota_exceeded", "auth_error", "billing_error"]:
-                if USE_OPENAI:
-                    answer = query_openai(cleaned_input)
-            
-            # Fallback to Gemini if both DeepSeek and OpenAI fail or have issues
-            if not answer or answer in ["quota_exceeded", "auth_error", "billing_error"]:
-                if USE_GEMINI:
-                    answer = query_gemini(cleaned_input)
-            
-            # Use enhanced built-in knowledge if all APIs fail
-            if answer and answer not in ["quota_exceeded", "auth_error", "billing_error"]:
+            # Ask the providers in the router's order, then use built-in knowledge
+            answer = answer_with_ai(cleaned_input, provider_mode, deadline, route)
+            if answer:
                 return f"🤖 {answer}"
-            else:
-                return get_predefined_answer(cleaned_input)
+            return get_predefined_answer(cleaned_input)
         
         else:
             return "I'm not sure how to help with that. Try asking me to set a reminder, schedule a task, or ask a question!"
@@ -452,7 +962,7 @@ def process_query(user_input):
         print(f"❌ Error processing query: {e}")
         return "Sorry, I encountered an error processing your request. Please try again."
 
-def ask_ai_question(user_input):
+def ask_ai_question(user_input, provider_mode=None, deadline=None, route=None):
     """Handle questions that should be sent to AI APIs (DeepSeek or OpenAI)"""
     try:
         # Clean input
@@ -460,47 +970,81 @@ def ask_ai_question(user_input):
         if not cleaned_input:
             return "Please provide a valid question."
         
-        # Try DeepSeek first if available
-        if USE_DEEPSEEK and deepseek_client:
-            ai_response = query_deepseek(cleaned_input)
-            if ai_response and ai_response not in ["quota_exceeded", "auth_error", "billing_error"]:
-                return ai_response
-            elif ai_response == "billing_error":
-                print("⚠️ DeepSeek has insufficient balance, switching to built-in knowledge")
-            elif ai_response == "quota_exceeded":
-                print("⚠️ DeepSeek API quota exceeded, switching to built-in knowledge")
-            elif ai_response == "auth_error":
-                print("⚠️ DeepSeek API authentication issue, switching to built-in knowledge")
-        
-        # Try OpenAI if DeepSeek fails or isn't available
-        if USE_OPENAI and openai_client:
-            ai_response = query_openai(cleaned_input)
-            if ai_response and ai_response not in ["quota_exceeded", "auth_error"]:
-                return ai_response
-            elif ai_response == "quota_exceeded":
-                print("⚠️ OpenAI API quota exceeded, trying Gemini...")
-            elif ai_response == "auth_error":
-                print("⚠️ OpenAI API authentication issue, trying Gemini...")
-        
-        # Try Gemini if both DeepSeek and OpenAI fail or aren't available
-        if USE_GEMINI and gemini_client:
-            ai_response = query_gemini(cleaned_input)
-            if ai_response and ai_response not in ["quota_exceeded", "auth_error"]:
-                return ai_response
-            elif ai_response == "quota_exceeded":
-                print("⚠️ Gemini API quota exceeded, using built-in knowledge")
-            elif ai_response == "auth_error":
-                print("⚠️ Gemini API authentication issue, using built-in knowledge")
-        
-        # Use enhanced built-in knowledge - no error messages shown to user
-        predefined_answer = get_predefined_answer(cleaned_input)
-        return predefined_answer
+        # Providers in fallback order, then enhanced built-in knowledge - no error messages shown to user
+        return answer_with_ai(cleaned_input, provider_mode, deadline, route) or get_predefined_answer(cleaned_input)
     
     except Exception as e:
         print(f"❌ Error in ask_ai_question: {e}")
         # Even on exception, provide helpful built-in response
         return get_predefined_answer(user_input)
 
+def build_vision_messages(image_path, prompt):
+    """OpenAI vision request messages with the image inlined as base64 JPEG"""
+    import base64
+    import io
+    from PIL import Image
+    
+    # Load and prepare the image
+    image = Image.open(image_path)
+    
+    # Convert to RGB if necessary
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    
+    # Convert image to base64
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG")
+    img_base64 = base64.b64encode(buffered.getvalue()).decode()
+    
+    # Create the prompt for OpenAI Vision
+    return [
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": f"""You are Aditya AI, an AI assistant analyzing an image. {prompt}
+
+Please provide a helpful and detailed response that includes:
+1. What you see in the image
+2. Any text or important details
+3. Context or insights about the image
+4. Any questions the user might have about what's shown
+
+Be conversational and helpful in your response."""
+                },
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/jpeg;base64,{img_base64}"
+                    }
+                }
+            ]
+        }
+    ]
+
+def image_analysis_unavailable():
+    """Reply for image requests when no vision-capable provider is configured"""
+    # If DeepSeek is available but no OpenAI for vision, provide text-based analysis
+    if get_provider_client('deepseek') and not get_provider_client('openai'):
+        return f"🖼️ **Image Analysis**: I can see you've uploaded an image, but DeepSeek doesn't currently support image analysis. I can help you with text-based questions about the image if you describe what you see!"
+    
+    # If neither API is available
+    return "⚠️ Image analysis requires either OpenAI API for vision support. Using text description: I can see you've uploaded an image, but I need API access to analyze it. Please ensure your API keys are configured."
+
+def image_analysis_error(e):
+    """Reply for an image analysis that failed with exception e"""
+    error_str = str(e)
+    if "quota" in error_str.lower() or "limit" in error_str.lower():
+        print(f"❌ API quota exceeded for image analysis: {e}")
+        return "⚠️ API quota exceeded for image analysis. Please try again later or check your API usage."
+    elif "403" in error_str or "401" in error_str or "api key" in error_str.lower():
+        print(f"❌ API authentication error for image analysis: {e}")
+        return "⚠️ API authentication issue. Please check your API key configuration."
+    else:
+        print(f"❌ Image analysis error: {e}")
+        return "⚠️ Sorry, I encountered an error analyzing the image. Please try again."
+
 def analyze_image(image_path, prompt="Describe this image in detail."):
     """Analyze an image using DeepSeek or OpenAI Vision APIs"""
     try:
@@ -510,55 +1054,13 @@ def analyze_image(image_path, prompt="Describe this image in detail."):
         except ImportError:
             return "⚠️ Image processing requires Pillow library. Please install it with: pip install Pillow"
         
-        # Try DeepSeek first if available (DeepSeek doesn't have vision yet, so we'll use OpenAI for images)
         # Try OpenAI for image analysis since DeepSeek doesn't support vision yet
-        if USE_OPENAI and openai_client:
+        client = get_provider_client('openai')
+        if client:
             try:
-                import base64
-                import io
-                
-                # Load and prepare the image
-                image = Image.open(image_path)
-                
-                # Convert to RGB if necessary
-                if image.mode != 'RGB':
-                    image = image.convert('RGB')
-                
-                # Convert image to base64
-                buffered = io.BytesIO()
-                image.save(buffered, format="JPEG")
-                img_base64 = base64.b64encode(buffered.getvalue()).decode()
-                
-                # Create the prompt for OpenAI Vision
-                messages = [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": f"""You are Aditya AI, an AI assistant analyzing an image. {prompt}
-
-Please provide a helpful and detailed response that includes:
-1. What you see in the image
-2. Any text or important details
-3. Context or insights about the image
-4. Any questions the user might have about what's shown
-
-Be conversational and helpful in your response."""
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{img_base64}"
-                                }
-                            }
-                        ]
-                    }
-                ]
-                
-                response = openai_client.chat.completions.create(
-                    model="gpt-4-vision-preview",
-                    messages=messages,
+                response = client.chat.completions.create(
+                    model=VISION_MODEL,
+                    messages=build_vision_messages(image_path, prompt),
                     max_tokens=300
                 )
                 
@@ -568,21 +1070,7 @@ Be conversational and helpful in your response."""
             except Exception as openai_error:
                 print(f"❌ OpenAI vision error: {openai_error}")
         
-        # If DeepSeek is available but no OpenAI for vision, provide text-based analysis
-        if USE_DEEPSEEK and deepseek_client and not (USE_OPENAI and openai_client):
-            return f"🖼️ **Image Analysis**: I can see you've uploaded an image, but DeepSeek doesn't currently support image analysis. I can help you with text-based questions about the image if you describe what you see!"
-        
-        # If neither API is available
-        return "⚠️ Image analysis requires either OpenAI API for vision support. Using text description: I can see you've uploaded an image, but I need API access to analyze it. Please ensure your API keys are configured."
+        return image_analysis_unavailable()
     
     except Exception as e:
-        error_str = str(e)
-        if "quota" in error_str.lower() or "limit" in error_str.lower():
-            print(f"❌ API quota exceeded for image analysis: {e}")
-            return "⚠️ API quota exceeded for image analysis. Please try again later or check your API usage."
-        elif "403" in error_str or "401" in error_str or "api key" in error_str.lower():
-            print(f"❌ API authentication error for image analysis: {e}")
-            return "⚠️ API authentication issue. Please check your API key configuration."
-        else:
-            print(f"❌ Image analysis error: {e}")
-            return "⚠️ Sorry, I encountered an error analyzing the image. Please try again."
+        return image_analysis_error(e)
@@ -0,0 +1,39 @@
+import threading
+
+class ProviderRegistry:
+    """AI provider clients, each built by its factory on first use
+    
+    Importing the provider SDKs and constructing their clients is the slowest
+    part of starting the app, and many requests never reach a provider. So
+    factories are registered at import and only run when a client is first
+    asked for; a factory that fails returns None and is not retried.
+    """
+    
+    def __init__(self, clients=None):
+        self._factories = {}
+        self._clients = dict(clients or {})
+        self._lock = threading.Lock()
+    
+    def register(self, name, factory):
+        self._factories[name] = factory
+    
+    def get(self, name):
+        """The client for name, or None when it has no factory or the factory failed"""
+        try:
+            return self._clients[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._clients:
+                factory = self._factories.get(name)
+                self._clients[name] = factory() if factory else None
+            return self._clients[name]
+    
+    def set(self, name, client):
+        """Use client for name instead of building one"""
+        with self._lock:
+            self._clients[name] = client
+    
+    def loaded(self):
+        """Names of the providers whose clients have been built"""
+        return sorted(name for name, client in self._clients.items() if client is not None)
@@ -0,0 +1,156 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+# How many requests may wait for one provider's quota, and for how long, before
+# the rest spill over to the next provider
+RATE_LIMIT_QUEUE_SIZE = int(os.getenv('RATE_LIMIT_QUEUE_SIZE', '32'))
+RATE_LIMIT_MAX_WAIT_MS = int(os.getenv('RATE_LIMIT_MAX_WAIT_MS', '2000'))
+# Recent queue waits kept for the percentiles in stats()
+RATE_LIMIT_WAIT_SAMPLES = 1000
+
+def estimate_tokens(text):
+    """Rough token count of text (about four characters per token for English)"""
+    return len(text) // 4 + 1
+
+class TokenBucket:
+    """Refills at `rate` per second up to `capacity`; a rate of 0 means unlimited
+    
+    Takes are allowed to drive the level below zero: that debt is what later
+    requests wait out, so waiting requests are served in arrival order.
+    """
+    
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = now
+    
+    def refill(self, now):
+        if self.rate:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_for(self, amount):
+        """Seconds until amount is available"""
+        if not self.rate or self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+    
+    def take(self, amount):
+        if self.rate:
+            self.level -= amount
+
+class RateLimiter:
+    """Client-side request and token quotas for one AI provider
+    
+    `requests_per_minute` and `tokens_per_minute` each feed a token bucket
+    that holds up to one minute of quota. A request reserves one request
+    and its estimated tokens; if that quota isn't there yet it waits in the
+    admission queue, unless the queue is full or the wait would exceed its
+    deadline, in which case it is rejected at once so the caller can move on.
+    """
+    
+    def __init__(self, name, requests_per_minute=0, tokens_per_minute=0, max_queue=None, max_wait=None,
+                 clock=time.monotonic):
+        self.name = name
+        self.clock = clock
+        self.max_queue = RATE_LIMIT_QUEUE_SIZE if max_queue is None else max_queue
+        self.max_wait = RATE_LIMIT_MAX_WAIT_MS / 1000 if max_wait is None else max_wait
+        now = clock()
+        self.requests = TokenBucket(requests_per_minute / 60, requests_per_minute, now)
+        self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute, now)
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_queue_full = 0
+        self.rejected_deadline = 0
+        self.total_wait = 0.0
+        self._waits = deque(maxlen=RATE_LIMIT_WAIT_SAMPLES)
+        self._lock = threading.Lock()
+    
+    @property
+    def enabled(self):
+        return bool(self.requests.rate or self.tokens.rate)
+    
+    def reserve(self, tokens, max_wait=None):
+        """Seconds to wait before sending a request of `tokens`, or None if it must spill over"""
+        if not self.enabled:
+            return 0.0
+        max_wait = self.max_wait if max_wait is None else max_wait
+        with self._lock:
+            now = self.clock()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            wait = max(self.requests.wait_for(1), self.tokens.wait_for(tokens))
+            if wait > 0:
+                if self.waiting >= self.max_queue:
+                    self.rejected_queue_full += 1
+                    return None
+                if wait > max_wait:
+                    self.rejected_deadline += 1
+                    return None
+                self.waiting += 1
+                self.queued += 1
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.admitted += 1
+            self.total_wait += wait
+            self._waits.append(wait)
+            return wait
+    
+    def _done_waiting(self):
+        with self._lock:
+            self.waiting -= 1
+    
+    def acquire(self, tokens, max_wait=None):
+        """Block until the request may go out; False if it was rejected instead"""
+        wait = self.reserve(tokens, max_wait)
+        if wait is None:
+            return False
+        if wait > 0:
+            try:
+                time.sleep(wait)
+            finally:
+                self._done_waiting()
+        return True
+    
+    async def acquire_async(self, tokens, max_wait=None):
+        """acquire() for the event loop"""
+        wait = self.reserve(tokens, max_wait)
+        if wait is None:
+            return False
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._done_waiting()
+        return True
+    
+    def stats(self):
+        """Quota, admission counters and queue wait times"""
+        with self._lock:
+            waits = sorted(self._waits)
+            now = self.clock()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            return {
+                'enabled': self.enabled,
+                'requests_per_minute': self.requests.capacity,
+                'tokens_per_minute': self.tokens.capacity,
+                'requests_available': int(self.requests.level) if self.requests.rate else None,
+                'tokens_available': int(self.tokens.level) if self.tokens.rate else None,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'rejected_queue_full': self.rejected_queue_full,
+                'rejected_deadline': self.rejected_deadline,
+                'wait_ms': {
+                    'avg': round(self.total_wait / self.admitted * 1000, 1) if self.admitted else 0.0,
+                    'p50': round(waits[len(waits) // 2] * 1000, 1) if waits else 0.0,
+                    'p95': round(waits[int(len(waits) * 0.95)] * 1000, 1) if waits else 0.0,
+                    'max': round(waits[-1] * 1000, 1) if waits else 0.0,
+                },
+            }
@@ -0,0 +1,272 @@
+import heapq
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from models import get_db_connection, add_task_listener, remove_task_listener
+
+REMINDER_SCHEDULER = os.getenv('REMINDER_SCHEDULER', '1').lower() in ('1', 'true', 'yes')
+# How many upcoming reminders to hold in memory; later ones are paged in as these fire
+REMINDER_BATCH_SIZE = int(os.getenv('REMINDER_BATCH_SIZE', '10000'))
+# Upper bound on how long the scheduler thread sleeps before re-reading the database,
+# which also picks up changes made by other worker processes
+REMINDER_REFRESH_S = int(os.getenv('REMINDER_REFRESH_S', '300'))
+REMINDER_RETRY_S = int(os.getenv('REMINDER_RETRY_S', '60'))
+
+def print_reminder(task):
+    """Default delivery hook: log the reminder"""
+    print(f"⏰ Reminder: {task['content']} (due {task['datetime']})")
+
+def _parse_due(value):
+    """Naive local due time of a task datetime, or None"""
+    try:
+        due = datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+    if due is not None and due.tzinfo is not None:
+        # Older imports kept their UTC offset; naive and aware values can't be compared
+        due = due.astimezone().replace(tzinfo=None)
+    return due
+
+class ReminderScheduler:
+    """Fires due task reminders from an in-memory min-heap
+    
+    The heap holds (due, task_id) for the next REMINDER_BATCH_SIZE pending
+    reminders, loaded in (datetime, id) order through the partial
+    idx_tasks_pending_reminders index. Task changes arrive through the
+    models task listeners: a change pushes a fresh entry and records the
+    task's current due time in _due, and entries that no longer match _due
+    are skipped when popped, so every update is O(log n).
+    
+    A reminder is claimed by setting tasks.reminded_at before delivery, so
+    with several worker processes each reminder is delivered once.
+    """
+    
+    def __init__(self, deliver=None, clock=datetime.now, batch_size=None):
+        self.deliver = deliver or print_reminder
+        self.clock = clock
+        self.batch_size = batch_size or REMINDER_BATCH_SIZE
+        self._heap = []
+        self._due = {}
+        # (due, id, raw datetime) of the last loaded row; None once everything is loaded
+        self._horizon = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+    
+    def __len__(self):
+        return len(self._due)
+    
+    # Loading
+    
+    def load(self):
+        """(Re)build the heap from the database"""
+        with self._cond:
+            self._heap = []
+            self._due = {}
+            self._horizon = None
+            self._load_batch(None)
+            self._cond.notify_all()
+    
+    def _load_batch(self, after):
+        """Load the next batch of pending reminders after the (raw datetime, id) key"""
+        conn = get_db_connection()
+        if after is None:
+            rows = conn.execute('''
+                SELECT id, datetime FROM tasks
+                WHERE completed = FALSE AND reminded_at IS NULL AND datetime IS NOT NULL
+                ORDER BY datetime, id
+                LIMIT ?
+            ''', (self.batch_size,)).fetchall()
+        else:
+            rows = conn.execute('''
+                SELECT id, datetime FROM tasks
+                WHERE completed = FALSE AND reminded_at IS NULL AND datetime IS NOT NULL
+                  AND (datetime, id) > (?, ?)
+                ORDER BY datetime, id
+                LIMIT ?
+            ''', (*after, self.batch_size)).fetchall()
+        
+        for row in rows:
+            due = _parse_due(row['datetime'])
+            if due is not None:
+                self._due[row['id']] = due
+                self._heap.append((due, row['id']))
+        heapq.heapify(self._heap)
+        
+        if len(rows) < self.batch_size:
+            self._horizon = None
+        else:
+            last = rows[-1]
+            self._horizon = (_parse_due(last['datetime']), last['id'], last['datetime'])
+    
+    def _beyond_horizon(self, due, task_id):
+        return self._horizon is not None and (due, task_id) > self._horizon[:2]
+    
+    # Keeping in sync with task changes
+    
+    def on_task_changed(self, event, task_id, task_datetime=None):
+        """models task listener: keep the heap consistent with the tasks table"""
+        if event == 'imported':
+            self.load()
+            return
+        
+        with self._cond:
+            if event in ('deleted', 'completed'):
+                self._due.pop(task_id, None)
+            elif event in ('added', 'updated'):
+                due = _parse_due(task_datetime)
+                if due is None or self._beyond_horizon(due, task_id):
+                    # Not scheduled, or it will be paged in with a later batch
+                    self._due.pop(task_id, None)
+                else:
+                    self._due[task_id] = due
+                    heapq.heappush(self._heap, (due, task_id))
+            self._compact()
+            self._cond.notify_all()
+    
+    def _compact(self):
+        # Drop stale entries once they make up most of the heap
+        if len(self._heap) > 2 * len(self._due) + 64:
+            self._heap = [(due, task_id) for task_id, due in self._due.items()]
+            heapq.heapify(self._heap)
+    
+    # Firing
+    
+    def next_due(self):
+        """When the earliest pending reminder is due, or None"""
+        with self._cond:
+            self._discard_stale()
+            return self._heap[0][0] if self._heap else None
+    
+    def _discard_stale(self):
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap and self._horizon is not None:
+            self._load_batch(self._horizon[2:] + (self._horizon[1],))
+            while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+    
+    def _pop_due(self, now):
+        due_items = []
+        with self._cond:
+            while True:
+                self._discard_stale()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                due, task_id = heapq.heappop(self._heap)
+                del self._due[task_id]
+                due_items.append((due, task_id))
+        return due_items
+    
+    def run_pending(self, now=None):
+        """Deliver every reminder due at `now`, returning the delivered tasks"""
+        now = now or self.clock()
+        delivered = []
+        for due, task_id in self._pop_due(now):
+            task = self._claim(task_id, now)
+            if task is None:
+                continue
+            try:
+                self.deliver(task)
+                delivered.append(task)
+            except Exception as e:
+                print(f"❌ Reminder delivery failed for task {task_id}: {e}")
+                self._release(task_id)
+                retry_at = now.timestamp() + REMINDER_RETRY_S
+                self.on_task_changed('added', task_id, datetime.fromtimestamp(retry_at).isoformat())
+        return delivered
+    
+    def _claim(self, task_id, now):
+        """Mark a reminder as delivered unless another process got there first or it changed"""
+        try:
+            conn = get_db_connection()
+            with conn:
+                row = conn.execute('''
+                    SELECT * FROM tasks
+                    WHERE id = ? AND completed = FALSE AND reminded_at IS NULL
+                ''', (task_id,)).fetchone()
+                if row is None or _parse_due(row['datetime']) is None or _parse_due(row['datetime']) > now:
+                    return None
+                cursor = conn.execute('''
+                    UPDATE tasks SET reminded_at = ? WHERE id = ? AND reminded_at IS NULL
+                ''', (now.isoformat(), task_id))
+            return dict(row) if cursor.rowcount else None
+        except sqlite3.Error as e:
+            print(f"❌ Error claiming reminder {task_id}: {e}")
+            return None
+    
+    def _release(self, task_id):
+        try:
+            conn = get_db_connection()
+            with conn:
+                conn.execute('UPDATE tasks SET reminded_at = NULL WHERE id = ?', (task_id,))
+        except sqlite3.Error as e:
+            print(f"❌ Error releasing reminder {task_id}: {e}")
+    
+    # Background thread
+    
+    def start(self):
+        """Load pending reminders, follow task changes and fire reminders on a daemon thread"""
+        if self._thread is not None:
+            return self._thread
+        add_task_listener(self.on_task_changed)
+        self.load()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='reminder-scheduler', daemon=True)
+        self._thread.start()
+        return self._thread
+    
+    def stop(self):
+        remove_task_listener(self.on_task_changed)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def _run(self):
+        last_refresh = self.clock()
+        while True:
+            try:
+                with self._cond:
+                    if self._stopping:
+                        return
+                    next_due = self.next_due()
+                    timeout = REMINDER_REFRESH_S
+                    if next_due is not None:
+                        timeout = min(timeout, max(0.0, (next_due - self.clock()).total_seconds()))
+                    self._cond.wait(timeout)
+                    if self._stopping:
+                        return
+                
+                now = self.clock()
+                if (now - last_refresh).total_seconds() >= REMINDER_REFRESH_S:
+                    self.load()
+                    last_refresh = now
+                self.run_pending(now)
+            except Exception as e:
+                # Keep the thread alive; one bad row mustn't stop every later reminder
+                print(f"❌ Reminder scheduler error: {e}")
+                with self._cond:
+                    if not self._stopping:
+                        self._cond.wait(REMINDER_RETRY_S)
+
+_scheduler = None
+
+def set_delivery_hook(deliver):
+    """Route fired reminders to `deliver(task)` instead of the default log line"""
+    get_scheduler().deliver = deliver
+
+def get_scheduler():
+    """Get the process-wide reminder scheduler"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ReminderScheduler()
+    return _scheduler
+
+def start_reminder_scheduler():
+    """Start the process-wide scheduler thread"""
+    return get_scheduler().start()
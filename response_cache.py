@@ -0,0 +1,267 @@
+import importlib.util
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+# Provider answers kept in memory; RESPONSE_CACHE_SIZE=0 turns the cache off
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '1000'))
+RESPONSE_CACHE_TTL_S = int(os.getenv('RESPONSE_CACHE_TTL_S', '3600'))
+
+# Near-duplicate questions (needs NumPy); SEMANTIC_CACHE_SIZE=0 turns it off
+SEMANTIC_CACHE_SIZE = int(os.getenv('SEMANTIC_CACHE_SIZE', '10000'))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.9'))
+SEMANTIC_CACHE_DIM = int(os.getenv('SEMANTIC_CACHE_DIM', '512'))
+
+# NumPy takes longer to import than the rest of the app's modules together, so it is
+# only imported when the semantic cache is first used
+NUMPY_AVAILABLE = importlib.util.find_spec('numpy') is not None
+np = None
+if not NUMPY_AVAILABLE and SEMANTIC_CACHE_SIZE > 0:
+    print("⚠️  NumPy not installed; semantic response cache disabled. Run: pip install numpy")
+
+def load_numpy():
+    """The numpy module, imported on first call (None when it isn't installed)"""
+    global np
+    if np is None and NUMPY_AVAILABLE:
+        import numpy
+        np = numpy
+    return np
+
+class ResponseCache:
+    """Thread-safe LRU cache of AI answers with a per-entry TTL
+    
+    Entries live in an OrderedDict in least-recently-used order, so lookups,
+    inserts and evictions are all O(1). Expired entries are dropped when they
+    are looked up, or evicted like any other entry once the cache is full.
+    """
+    
+    def __init__(self, max_entries=None, ttl=None, clock=time.monotonic):
+        self.max_entries = RESPONSE_CACHE_SIZE if max_entries is None else max_entries
+        self.ttl = RESPONSE_CACHE_TTL_S if ttl is None else ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def get(self, key):
+        """Cached value for key, or None; a None key is never cached"""
+        return self.get_first([key])
+    
+    def get_first(self, keys):
+        """Cached value of the first key that has one, or None; counted as one lookup"""
+        keys = [key for key in keys if key is not None]
+        if not keys or self.max_entries <= 0:
+            return None
+        with self._lock:
+            now = self.clock()
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] <= now:
+                    del self._entries[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+            self.misses += 1
+            return None
+    
+    def put(self, key, value, ttl=None):
+        if key is None or self.max_entries <= 0:
+            return
+        expires_at = self.clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+# Filler that says nothing about the topic: "explain X" and "can you tell me about X" are the same question
+SEMANTIC_STOP_WORDS = frozenset('''
+    a an the is are was were be to of in on for with about and or it this that
+    what whats s how do does did can could would should will i me my you your
+    please tell explain describe give show know
+'''.split())
+
+# Words that flip or orient a question without changing its other words: "should I
+# buy a house" vs "should I not buy a house", "is X faster than Y" vs "is Y faster
+# than X". Two questions only match if they agree on these ("don't" and "can't"
+# tokenize to "don", "t" and "can", "t").
+SEMANTIC_NEGATIONS = frozenset('not no never nor none nothing neither without cannot t'.split())
+SEMANTIC_COMPARISONS = frozenset('''
+    than vs versus better worse best worst more less most least faster slower
+    bigger smaller larger cheaper safer easier harder compare compared difference
+'''.split())
+
+_WORD_RE = re.compile(r'\w+')
+
+def content_words(text):
+    """The words of text that aren't filler, in order"""
+    return [word for word in _WORD_RE.findall(text.casefold()) if word not in SEMANTIC_STOP_WORDS]
+
+def featurize(text, dim=None):
+    """Hashed word, word-bigram and character-trigram vector of text, L2-normalized (None if nothing is left)"""
+    dim = dim or SEMANTIC_CACHE_DIM
+    np = load_numpy()
+    vector = np.zeros(dim, dtype=np.float32)
+    words = content_words(text)
+    for i, word in enumerate(words):
+        vector[zlib.crc32(word.encode()) % dim] += 1.0
+        if i:
+            vector[zlib.crc32(f"{words[i - 1]} {word}".encode()) % dim] += 1.0
+        padded = f" {word} "
+        for j in range(len(padded) - 2):
+            vector[zlib.crc32(padded[j:j + 3].encode()) % dim] += 0.5
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+def must_match_key(text):
+    """Hash of what a match has to agree on exactly, 0 if nothing
+    
+    That is the negation words in text and, for comparisons, every content
+    word in order, so "is python faster than java" never answers "is java
+    faster than python".
+    """
+    words = content_words(text)
+    negations = sorted({word for word in words if word in SEMANTIC_NEGATIONS})
+    if SEMANTIC_COMPARISONS.intersection(words):
+        return zlib.crc32(' '.join(negations + ['|'] + words).encode())
+    return zlib.crc32(' '.join(negations).encode()) if negations else 0
+
+class SemanticCache:
+    """Answers for questions that are near-duplicates of earlier ones
+    
+    Questions are featurized into hashed n-gram vectors and stored as columns
+    of a (dim x capacity) matrix. A query vector has only a few dozen non-zero
+    features, so the cosine similarity against every stored question is a dot
+    product over just those rows of the matrix, and the best match is an
+    argmax over the slots whose must_match_key() equals the query's. When
+    the matrix is full the least recently used (or any expired) slot is
+    reused. The matrix is allocated on the first put. Without NumPy the cache
+    stays empty.
+    """
+    
+    def __init__(self, capacity=None, threshold=None, ttl=None, dim=None, clock=time.monotonic):
+        self.capacity = SEMANTIC_CACHE_SIZE if capacity is None else capacity
+        self.threshold = SEMANTIC_CACHE_THRESHOLD if threshold is None else threshold
+        self.ttl = RESPONSE_CACHE_TTL_S if ttl is None else ttl
+        self.dim = dim or SEMANTIC_CACHE_DIM
+        self.clock = clock
+        self.enabled = NUMPY_AVAILABLE and self.capacity > 0
+        self._lock = threading.Lock()
+        self._size = 0
+        self._answers = []
+        self._matrix = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def __len__(self):
+        return self._size
+    
+    def lookup(self, question):
+        """(answer, similarity) of the closest stored question above the threshold, or (None, best similarity)"""
+        if not self.enabled:
+            return None, 0.0
+        vector = featurize(question, self.dim)
+        if vector is None:
+            return None, 0.0
+        
+        features = np.flatnonzero(vector)
+        key = must_match_key(question)
+        now = self.clock()
+        with self._lock:
+            if not self._size:
+                self.misses += 1
+                return None, 0.0
+            similarities = vector[features] @ self._matrix[features, :self._size]
+            similarities[self._expires[:self._size] <= now] = -1.0
+            similarities[self._keys[:self._size] != key] = -1.0
+            slot = int(np.argmax(similarities))
+            similarity = float(similarities[slot])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None, max(similarity, 0.0)
+            self._last_used[slot] = now
+            self.hits += 1
+            return self._answers[slot], similarity
+    
+    def get(self, question):
+        return self.lookup(question)[0]
+    
+    def put(self, question, answer, ttl=None):
+        if not self.enabled:
+            return
+        vector = featurize(question, self.dim)
+        if vector is None:
+            return
+        
+        now = self.clock()
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.dim, self.capacity), dtype=np.float32)
+                self._expires = np.zeros(self.capacity, dtype=np.float64)
+                self._last_used = np.zeros(self.capacity, dtype=np.float64)
+                self._keys = np.zeros(self.capacity, dtype=np.int64)
+            if self._size < self.capacity:
+                slot = self._size
+                self._size += 1
+                self._answers.append(answer)
+            else:
+                # Expired slots go first, then the least recently used
+                slot = int(np.argmin(np.where(self._expires <= now, -np.inf, self._last_used)))
+                self._answers[slot] = answer
+                self.evictions += 1
+            self._matrix[:, slot] = vector
+            self._keys[slot] = must_match_key(question)
+            self._expires[slot] = now + (self.ttl if ttl is None else ttl)
+            self._last_used[slot] = now
+    
+    def clear(self):
+        with self._lock:
+            self._size = 0
+            self._answers = []
+    
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'size': self._size,
+                'capacity': self.capacity,
+                'threshold': self.threshold,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,253 @@
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from models import get_db_connection, flush_chat_writes
+
+# Global retention defaults (0 keeps history forever); per-session overrides
+# live in the retention_policies table
+CHAT_RETENTION_DAYS = int(os.getenv('CHAT_RETENTION_DAYS', '0'))
+CHAT_RETENTION_MAX_ROWS = int(os.getenv('CHAT_RETENTION_MAX_ROWS', '0'))
+CHAT_RETENTION_INTERVAL_S = int(os.getenv('CHAT_RETENTION_INTERVAL_S', '0'))
+
+# Archived rows go to gzip-compressed JSONL segments in this directory
+CHAT_ARCHIVE_DIR = os.getenv('CHAT_ARCHIVE_DIR', 'archive')
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '5000'))
+
+ARCHIVE_COLUMNS = ('id', 'user_message', 'ai_response', 'message_type', 'created_at', 'session_id')
+
+def set_retention_policy(session_id, max_age_days=None, max_rows=None):
+    """Override the global retention limits for one session
+    
+    None falls back to the global default for that limit, 0 means unlimited.
+    """
+    try:
+        conn = get_db_connection()
+        with conn:
+            conn.execute('''
+                INSERT INTO retention_policies (session_id, max_age_days, max_rows)
+                VALUES (?, ?, ?)
+                ON CONFLICT (session_id) DO UPDATE
+                SET max_age_days = excluded.max_age_days, max_rows = excluded.max_rows
+            ''', (session_id, max_age_days, max_rows))
+        return True
+    except sqlite3.Error as e:
+        print(f"❌ Error setting retention policy: {e}")
+        return False
+
+def clear_retention_policy(session_id):
+    """Remove a session's retention override"""
+    try:
+        conn = get_db_connection()
+        with conn:
+            conn.execute('DELETE FROM retention_policies WHERE session_id = ?', (session_id,))
+        return True
+    except sqlite3.Error as e:
+        print(f"❌ Error clearing retention policy: {e}")
+        return False
+
+def find_expired_message_ids(now=None):
+    """Get the ids of chat messages that are past their retention limits"""
+    now = now or datetime.now()
+    conn = get_db_connection()
+    policies = {row['session_id']: row for row in conn.execute('SELECT * FROM retention_policies')}
+    expired = set()
+    
+    # Age limits: the global cutoff skips sessions with their own age policy
+    if CHAT_RETENTION_DAYS > 0:
+        cutoff = (now - timedelta(days=CHAT_RETENTION_DAYS)).isoformat()
+        overridden = {sid for sid, policy in policies.items() if policy['max_age_days'] is not None}
+        for row in conn.execute('SELECT id, session_id FROM chat_history WHERE created_at < ?', (cutoff,)):
+            if row['session_id'] not in overridden:
+                expired.add(row['id'])
+    
+    for sid, policy in policies.items():
+        if policy['max_age_days']:
+            cutoff = (now - timedelta(days=policy['max_age_days'])).isoformat()
+            expired.update(row['id'] for row in conn.execute(
+                'SELECT id FROM chat_history WHERE session_id = ? AND created_at < ?', (sid, cutoff)))
+    
+    # Row limits: the per-session counters find sessions over the global limit
+    row_limits = {}
+    if CHAT_RETENTION_MAX_ROWS > 0:
+        for row in conn.execute('''
+            SELECT key, count FROM chat_stats WHERE scope = 'session' AND count > ?
+        ''', (CHAT_RETENTION_MAX_ROWS,)):
+            row_limits[row['key']] = CHAT_RETENTION_MAX_ROWS
+    
+    for sid, policy in policies.items():
+        if policy['max_rows'] is not None:
+            if policy['max_rows'] > 0:
+                row_limits[sid] = policy['max_rows']
+            else:
+                row_limits.pop(sid, None)
+    
+    for sid, max_rows in row_limits.items():
+        expired.update(row['id'] for row in conn.execute('''
+            SELECT id FROM chat_history WHERE session_id = ?
+            ORDER BY created_at DESC, id DESC
+            LIMIT -1 OFFSET ?
+        ''', (sid, max_rows)))
+    
+    return sorted(expired)
+
+def _write_segment(rows):
+    """Write rows to a new compressed archive segment, returning its file name"""
+    os.makedirs(CHAT_ARCHIVE_DIR, exist_ok=True)
+    name = f"chat-{datetime.now().strftime('%Y%m%dT%H%M%S')}-{rows[0]['id']}-{rows[-1]['id']}.jsonl.gz"
+    path = os.path.join(CHAT_ARCHIVE_DIR, name)
+    tmp_path = path + '.tmp'
+    
+    with open(tmp_path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as gz:
+            for row in rows:
+                gz.write(json.dumps(dict(zip(ARCHIVE_COLUMNS, row)), ensure_ascii=False).encode() + b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp_path, path)
+    return name
+
+def _read_segment(name):
+    """Yield the archived messages stored in a segment"""
+    with gzip.open(os.path.join(CHAT_ARCHIVE_DIR, name), 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+def archive_expired_messages(now=None):
+    """Move expired chat messages into archive segments
+    
+    Each batch is written, indexed in chat_archive and deleted from
+    chat_history under one write lock, so concurrent workers never archive
+    the same row twice.
+    """
+    flush_chat_writes()
+    conn = get_db_connection()
+    ids = find_expired_message_ids(now)
+    archived = 0
+    segments = 0
+    
+    for start in range(0, len(ids), ARCHIVE_BATCH_SIZE):
+        batch = ids[start:start + ARCHIVE_BATCH_SIZE]
+        segment = None
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            placeholders = ','.join('?' * len(batch))
+            rows = conn.execute(f'''
+                SELECT {', '.join(ARCHIVE_COLUMNS)} FROM chat_history
+                WHERE id IN ({placeholders}) ORDER BY id
+            ''', batch).fetchall()
+            if not rows:
+                conn.rollback()
+                continue
+            
+            segment = _write_segment(rows)
+            
+            by_session = {}
+            for row in rows:
+                summary = by_session.setdefault(row['session_id'], [0, row['created_at'], row['created_at']])
+                summary[0] += 1
+                summary[1] = min(summary[1], row['created_at'])
+                summary[2] = max(summary[2], row['created_at'])
+            
+            archived_at = datetime.now().isoformat()
+            conn.executemany('''
+                INSERT INTO chat_archive (segment, session_id, message_count, first_created_at, last_created_at, archived_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(segment, sid, count, first, last, archived_at) for sid, (count, first, last) in by_session.items()])
+            conn.executemany('DELETE FROM chat_history WHERE id = ?', [(row['id'],) for row in rows])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            if segment:
+                os.remove(os.path.join(CHAT_ARCHIVE_DIR, segment))
+            raise
+        
+        archived += len(rows)
+        segments += 1
+    
+    if archived:
+        print(f"✅ Archived {archived} chat messages into {segments} segment(s)")
+    return {'archived': archived, 'segments': segments}
+
+def rehydrate_session(session_id):
+    """Restore a session's archived messages into chat_history, returning the count"""
+    try:
+        conn = get_db_connection()
+        segments = [row['segment'] for row in conn.execute(
+            'SELECT DISTINCT segment FROM chat_archive WHERE session_id = ?', (session_id,))]
+        if not segments:
+            return 0
+        
+        restored = 0
+        with conn:
+            for segment in segments:
+                rows = [tuple(message[column] for column in ARCHIVE_COLUMNS)
+                        for message in _read_segment(segment) if message['session_id'] == session_id]
+                # Original ids are kept so history cursors stay valid
+                cursor = conn.executemany(f'''
+                    INSERT OR IGNORE INTO chat_history ({', '.join(ARCHIVE_COLUMNS)})
+                    VALUES ({', '.join('?' * len(ARCHIVE_COLUMNS))})
+                ''', rows)
+                restored += cursor.rowcount
+            conn.execute('DELETE FROM chat_archive WHERE session_id = ?', (session_id,))
+            
+            still_used = {row['segment'] for row in conn.execute(
+                f"SELECT DISTINCT segment FROM chat_archive WHERE segment IN ({','.join('?' * len(segments))})",
+                segments)}
+        
+        # Segments are immutable; drop the ones nothing points at any more
+        for segment in set(segments) - still_used:
+            try:
+                os.remove(os.path.join(CHAT_ARCHIVE_DIR, segment))
+            except OSError:
+                pass
+        
+        print(f"✅ Restored {restored} archived messages for session {session_id}")
+        return restored
+    except (sqlite3.Error, OSError) as e:
+        print(f"❌ Error restoring archived history: {e}")
+        return 0
+
+def compact_database(max_pages=0):
+    """Return free pages to the filesystem with an incremental vacuum
+    
+    max_pages=0 releases the whole freelist. The first run on a database
+    created without auto_vacuum does a one-off full VACUUM to enable it.
+    """
+    conn = get_db_connection()
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        print("ℹ️  Enabling incremental auto-vacuum (one-off full VACUUM)")
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+    
+    free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    conn.execute(f'PRAGMA incremental_vacuum({int(max_pages)})').fetchall()
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+    return free_pages
+
+def run_retention(now=None):
+    """Archive expired history, then compact the database"""
+    try:
+        result = archive_expired_messages(now)
+        result['freed_pages'] = compact_database() if result['archived'] else 0
+        return result
+    except (sqlite3.Error, OSError) as e:
+        print(f"❌ Retention run failed: {e}")
+        return {'archived': 0, 'segments': 0, 'freed_pages': 0}
+
+def start_retention_worker(interval=None):
+    """Run retention every `interval` seconds on a daemon thread"""
+    interval = interval or CHAT_RETENTION_INTERVAL_S
+    
+    def loop():
+        while True:
+            time.sleep(interval)
+            run_retention()
+    
+    thread = threading.Thread(target=loop, name='chat-retention', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,141 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+
+# Weight of the newest measurement in each provider's moving averages
+ROUTER_EWMA_ALPHA = float(os.getenv('ROUTER_EWMA_ALPHA', '0.2'))
+# After this long without an attempt, a new measurement counts for half of the
+# average, so a provider's score doesn't stay stuck on what it did long ago
+ROUTER_HALF_LIFE_S = float(os.getenv('ROUTER_HALF_LIFE_S', '30'))
+# Share of requests that try a provider other than the best one first, so a
+# provider that has recovered (or slowed down) gets measured again
+ROUTER_EXPLORE_RATE = float(os.getenv('ROUTER_EXPLORE_RATE', '0.05'))
+# Latency assumed for a provider that hasn't answered yet
+ROUTER_PRIOR_LATENCY_MS = int(os.getenv('ROUTER_PRIOR_LATENCY_MS', '2000'))
+# Routing decisions kept for the introspection endpoint
+ROUTER_RECENT_DECISIONS = 50
+# Floor for the success rate, so a failing provider's score stays finite and it sorts last
+ROUTER_MIN_SUCCESS_RATE = 0.05
+
+def parse_route(value):
+    """Provider names from a request's optional `route` value (a list or 'a,b'); None if missing"""
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, (list, tuple)):
+        return None
+    names = [str(name).strip().lower() for name in value if str(name).strip()]
+    return names or None
+
+class ProviderScore:
+    """Moving averages of one provider's attempt latency and success rate"""
+    
+    def __init__(self, prior_latency):
+        self.latency = prior_latency
+        self.success_rate = 1.0
+        self.attempts = 0
+        self.failures = 0
+        self.last_attempt = None
+    
+    def record(self, success, latency, alpha, half_life, now):
+        if self.last_attempt is not None and half_life > 0:
+            alpha = max(alpha, 1 - 0.5 ** ((now - self.last_attempt) / half_life))
+        # The first measurement replaces the prior outright
+        self.latency = latency if not self.attempts else alpha * latency + (1 - alpha) * self.latency
+        self.success_rate = alpha * (1.0 if success else 0.0) + (1 - alpha) * self.success_rate
+        self.attempts += 1
+        self.failures += 0 if success else 1
+        self.last_attempt = now
+    
+    def expected_time(self):
+        """Seconds until a good answer if the provider were asked until it gave one"""
+        return self.latency / max(self.success_rate, ROUTER_MIN_SUCCESS_RATE)
+
+class ProviderRouter:
+    """Orders the providers for each request by expected time to a good answer
+    
+    Every attempt updates the provider's latency and success rate, and it
+    counts for more the longer the provider went without one. Providers that
+    haven't been measured yet count as ROUTER_PRIOR_LATENCY_MS with no
+    failures, and ties keep the fallback order. With probability
+    `explore_rate`, the provider that has gone longest without an attempt goes
+    first instead of the best one, so a recovered provider gets noticed. A
+    request may pin its own order, which skips scoring altogether. Either way
+    the decision is kept in `recent` for debugging.
+    """
+    
+    def __init__(self, alpha=None, explore_rate=None, prior_latency=None, half_life=None, rng=None,
+                 clock=time.monotonic):
+        self.alpha = ROUTER_EWMA_ALPHA if alpha is None else alpha
+        self.half_life = ROUTER_HALF_LIFE_S if half_life is None else half_life
+        self.explore_rate = ROUTER_EXPLORE_RATE if explore_rate is None else explore_rate
+        self.prior_latency = ROUTER_PRIOR_LATENCY_MS / 1000 if prior_latency is None else prior_latency
+        self.rng = rng or random.Random()
+        self.clock = clock
+        self.scores = {}
+        self.decisions = 0
+        self.explored = 0
+        self.recent = deque(maxlen=ROUTER_RECENT_DECISIONS)
+        self._lock = threading.Lock()
+    
+    def _score(self, name):
+        if name not in self.scores:
+            self.scores[name] = ProviderScore(self.prior_latency)
+        return self.scores[name]
+    
+    def record(self, name, success, latency):
+        """Count one attempt at a provider that took `latency` seconds"""
+        with self._lock:
+            self._score(name).record(success, latency, self.alpha, self.half_life, self.clock())
+    
+    def order(self, names, pinned=None):
+        """The names in the order to try them for one request
+        
+        `pinned` names the providers to use, in order; those that aren't in
+        `names` are dropped.
+        """
+        with self._lock:
+            expected = {name: self._score(name).expected_time() for name in names}
+            explored = False
+            if pinned is not None:
+                order = [name for name in pinned if name in expected]
+            else:
+                order = sorted(names, key=expected.get)
+                if len(order) > 1 and self.rng.random() < self.explore_rate:
+                    stalest = min(order[1:], key=lambda name: self.scores[name].last_attempt or float('-inf'))
+                    order.remove(stalest)
+                    order.insert(0, stalest)
+                    explored = True
+            self.decisions += 1
+            self.explored += explored
+            self.recent.append({
+                'at': time.time(),
+                'order': order,
+                'pinned': pinned is not None,
+                'explored': explored,
+                'expected_ms': {name: round(seconds * 1000, 1) for name, seconds in expected.items()},
+            })
+            return order
+    
+    def snapshot(self):
+        """Live scores and the most recent routing decisions"""
+        with self._lock:
+            now = self.clock()
+            return {
+                'explore_rate': self.explore_rate,
+                'decisions': self.decisions,
+                'explored': self.explored,
+                'providers': {
+                    name: {
+                        'latency_ms': round(score.latency * 1000, 1),
+                        'success_rate': round(score.success_rate, 3),
+                        'expected_ms': round(score.expected_time() * 1000, 1),
+                        'attempts': score.attempts,
+                        'failures': score.failures,
+                        'last_attempt_s_ago': round(now - score.last_attempt, 1) if score.last_attempt is not None else None,
+                    }
+                    for name, score in self.scores.items()
+                },
+                'recent': list(self.recent)[::-1],
+            }
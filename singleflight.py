@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+class _Call:
+    """One in-flight call and, once it finishes, its outcome"""
+    __slots__ = ('done', 'result', 'error')
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one
+    
+    The first caller for a key runs the function; callers arriving while it
+    is still running wait for it and get the same result, or the same
+    exception. Nothing is kept afterwards, so this is not a cache: the next
+    call after it finishes runs the function again.
+    """
+    
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+    
+    def do(self, key, func, *args, timeout=None):
+        """func(*args), or the result of an identical call already running
+        
+        A caller waiting on another's call gives up with TimeoutError after
+        `timeout` seconds; the call itself carries on.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+        
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"shared call still running after {timeout}s")
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = func(*args)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+    
+    def stats(self):
+        with self._lock:
+            return {'in_flight': len(self._calls), 'calls': self.calls, 'shared': self.shared}
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines on one event loop
+    
+    The shared call runs as its own task, so a caller that is cancelled
+    doesn't cancel it for the others.
+    """
+    
+    def __init__(self):
+        self._calls = {}
+        self.calls = 0
+        self.shared = 0
+    
+    async def do(self, key, func, *args, timeout=None):
+        """await func(*args), or the result of an identical call already running
+        
+        Gives up with TimeoutError after `timeout` seconds, leaving the call
+        running for the others.
+        """
+        task = self._calls.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(func(*args))
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._calls.pop(key) if self._calls.get(key) is done else None)
+            self.calls += 1
+        else:
+            self.shared += 1
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+    
+    def stats(self):
+        return {'in_flight': len(self._calls), 'calls': self.calls, 'shared': self.shared}
@@ -0,0 +1,33 @@
+import json
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Event with a JSON payload"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def stream_answer(events, on_complete=None, done_fields=None):
+    """Turn nlp.stream_ai_answer() events into an SSE stream
+    
+    Tokens go out as unnamed events ({"text": ...}), a 'reset' event means the
+    client should discard the text so far, and a final 'done' event carries
+    the whole answer, which is also passed to on_complete(answer). The fields
+    returned by done_fields(), if given, are added to the 'done' event.
+    """
+    parts = []
+    try:
+        for kind, text in events:
+            if kind == 'reset':
+                parts = []
+                yield sse_event({}, 'reset')
+            else:
+                parts.append(text)
+                yield sse_event({'text': text})
+    except Exception as e:
+        print(f"❌ Error streaming answer: {e}")
+        yield sse_event({'error': 'Sorry, I encountered an error processing your request. Please try again.'}, 'error')
+        return
+    
+    answer = ''.join(parts)
+    if on_complete:
+        on_complete(answer)
+    yield sse_event({'response': answer, **(done_fields() if done_fields else {})}, 'done')
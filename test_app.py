@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for the task import/export endpoints in app.py
+"""
+
+import csv
+import io
+import json
+import os
+import time
+
+import pytest
+
+@pytest.fixture
+def tokyo_time():
+    """Run with a local time zone that isn't UTC, so offset conversion shows"""
+    old = os.environ.get('TZ')
+    os.environ['TZ'] = 'Asia/Tokyo'
+    time.tzset()
+    yield
+    if old is None:
+        del os.environ['TZ']
+    else:
+        os.environ['TZ'] = old
+    time.tzset()
+
+def test_ndjson_import_stores_local_time_and_reports_bad_rows(client, tokyo_time):
+    rows = [
+        {'content': 'Call mom', 'datetime': '2030-01-02T09:30:00'},
+        {'content': 'Standup', 'datetime': '2030-01-02T09:30:00+05:30', 'task_type': 'meeting'},
+        {'content': '', 'datetime': '2030-01-02T10:00:00'},
+        {'content': 'Bad date', 'datetime': 'next tuesday'},
+    ]
+    body = '\n'.join(json.dumps(row) for row in rows) + '\nnot json\n'
+    result = client.post('/tasks/import', data=body, content_type='application/x-ndjson').get_json()
+    assert result['imported'] == 2
+    assert [error['line'] for error in result['errors']] == [3, 4, 5]
+    
+    exported = [json.loads(line) for line in client.get('/tasks/export').get_data(as_text=True).splitlines()]
+    assert sorted((task['content'], task['datetime']) for task in exported) == [
+        ('Call mom', '2030-01-02T09:30:00'), ('Standup', '2030-01-02T13:00:00')]
+
+def test_csv_round_trip(client, tokyo_time):
+    body = 'content,task_type,datetime,completed\nWater plants,reminder,2030-03-01T08:00:00Z,no\nDone already,,,yes\n'
+    result = client.post('/tasks/import?format=csv', data=body, content_type='text/csv').get_json()
+    assert (result['imported'], result['skipped']) == (2, 0)
+    
+    response = client.get('/tasks/export?format=csv&completed=1')
+    assert response.mimetype == 'text/csv'
+    exported = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert sorted((task['content'], task['datetime'], task['completed']) for task in exported) == [
+        ('Done already', '', '1'), ('Water plants', '2030-03-01T17:00:00', '0')]
+    # Without completed=1 only open tasks are exported
+    assert len(list(csv.DictReader(io.StringIO(client.get('/tasks/export?format=csv').get_data(as_text=True))))) == 1
+
+def test_unsupported_format_is_rejected(client):
+    assert client.post('/tasks/import?format=xml', data='').status_code == 400
+    assert client.get('/tasks/export?format=xml').status_code == 400
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Tests for the asyncio provider layer (async_providers.py) and the ASGI entry point
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import async_providers
+import models
+import nlp
+import reminders
+from circuit_breaker import CircuitBreaker, OPEN
+from deadline import Deadline
+from response_cache import ResponseCache
+
+class AsyncChatClient:
+    """AsyncOpenAI-compatible client that answers after `delay` seconds, or raises `error`"""
+    
+    def __init__(self, name, delay=0.0, error=None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+    
+    async def create(self, model, messages, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise Exception(self.error)
+        message = SimpleNamespace(content=f"{self.name} answer")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+@pytest.fixture
+def providers(providers, monkeypatch):
+    """The shared provider state, with async fakes in place of the sync clients"""
+    clients = SimpleNamespace(
+        deepseek=AsyncChatClient('deepseek'),
+        openai=AsyncChatClient('openai'),
+        gemini=None,
+    )
+    monkeypatch.setattr(async_providers, 'get_async_clients', lambda: clients)
+    return clients
+
+def ask(question, mode=None):
+    return asyncio.run(async_providers.ask_ai_question_async(question, mode))
+
+def test_sequential_answer_from_the_primary(providers):
+    assert ask('what is asyncio?', 'sequential') == 'deepseek answer'
+    assert providers.openai.calls == 0
+
+def test_quota_error_falls_through_and_opens_the_breaker(providers):
+    providers.deepseek.error = '429 quota exceeded'
+    assert ask('what is asyncio?', 'sequential') == 'openai answer'
+    assert nlp.provider_breakers['deepseek'].state == OPEN
+
+def test_timeout_counts_as_a_failure(providers, monkeypatch):
+    monkeypatch.setattr(async_providers, 'AI_REQUEST_TIMEOUT_S', 0.05)
+    providers.deepseek.delay = 1.0
+    assert ask('what is asyncio?', 'sequential') == 'openai answer'
+    assert providers.deepseek.cancelled
+    assert nlp.provider_breakers['deepseek'].failures == 1
+
+def test_hedge_cancels_the_slow_primary(providers):
+    providers.deepseek.delay = 1.0
+    assert ask('what is asyncio?', 'hedged') == 'openai answer'
+    assert providers.deepseek.cancelled
+
+def test_cancelled_attempts_hand_back_their_probe(providers):
+    breaker = CircuitBreaker('openai', clock=lambda: 1000.0)
+    breaker.record_failure('quota_exceeded')
+    breaker.clock = lambda: 1000.0 + breaker.cooldown
+    nlp.provider_breakers['openai'] = breaker
+    providers.deepseek.delay = providers.openai.delay = 1.0
+    
+    asyncio.run(async_providers.query_ai_providers_async('what is a probe?', 'race', Deadline(50)))
+    assert providers.openai.cancelled
+    assert breaker.allow()
+
+def test_cache_hits_are_not_provider_attempts(providers, monkeypatch):
+    monkeypatch.setattr(nlp, 'response_cache', ResponseCache(max_entries=10, ttl=60))
+    for _ in range(3):
+        assert ask('what is asyncio?', 'sequential') == 'deepseek answer'
+    assert providers.deepseek.calls == 1
+    assert nlp.provider_router.snapshot()['providers']['deepseek']['attempts'] == 1
+
+def test_async_leader_out_of_time_does_not_answer_for_the_others(providers):
+    providers.openai.delay = 0.2
+    short, generous = Deadline(50), Deadline(2000)
+    
+    async def both():
+        leader = asyncio.ensure_future(async_providers.answer_with_ai_async('What is AI?', None, short, ['openai']))
+        await asyncio.sleep(0.01)
+        return await asyncio.gather(leader, async_providers.answer_with_ai_async('What is AI?', None, generous,
+                                                                                 ['openai']))
+    
+    assert asyncio.run(both()) == [None, 'openai answer']
+    assert short.exceeded and not generous.exceeded
+
+def test_many_requests_share_one_event_loop(providers):
+    providers.deepseek.delay = 0.2
+    
+    async def burst():
+        return await asyncio.gather(*(async_providers.query_ai_providers_async(f"question {i}?") for i in range(200)))
+    
+    # 200 slow answers at once take one provider delay, not 200 of them
+    answers = asyncio.run(asyncio.wait_for(burst(), 2.0))
+    assert answers == ['deepseek answer'] * 200
+
+def test_all_providers_failing_uses_the_built_in_answer(providers):
+    providers.deepseek.error = providers.openai.error = 'boom'
+    question = 'what is asyncio?'
+    assert ask(question) == nlp.get_predefined_answer(question)
+
+@pytest.fixture
+def asgi_app(db, monkeypatch, providers):
+    monkeypatch.setattr(reminders, 'REMINDER_SCHEDULER', False)
+    import asgi
+    return asgi.app
+
+def call_asgi(app, method, path, body=b'', headers=(), query_string=b''):
+    """Run one HTTP request through an ASGI app; (status, headers, body)"""
+    messages = []
+    requests = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': query_string,
+        'headers': [(b'content-type', b'application/json'), *headers],
+    }
+    
+    async def receive():
+        return requests.pop(0) if requests else {'type': 'http.disconnect'}
+    
+    async def send(message):
+        messages.append(message)
+    
+    asyncio.run(app(scope, receive, send))
+    start = messages[0]
+    return start['status'], dict(start['headers']), b''.join(m.get('body', b'') for m in messages[1:])
+
+def test_asgi_ask_answers_and_saves_history(asgi_app):
+    status, _, body = call_asgi(asgi_app, 'POST', '/ask', json.dumps({'question': 'what is asyncio?'}).encode())
+    assert status == 200
+    assert json.loads(body) == {'response': 'deepseek answer', 'type': 'ai_response'}
+    
+    history = models.get_chat_history()
+    assert [(m['user_message'], m['ai_response'], m['message_type']) for m in history] == [
+        ('what is asyncio?', 'deepseek answer', 'ai_question')]
+
+def test_asgi_ask_requires_a_question(asgi_app):
+    status, _, _ = call_asgi(asgi_app, 'POST', '/ask', b'{}')
+    assert status == 400
+
+def test_asgi_passes_other_routes_to_flask(asgi_app):
+    status, _, body = call_asgi(asgi_app, 'GET', '/test')
+    assert status == 200
+    assert b'Flask is working!' in body
+
+def test_asgi_rejects_oversized_bodies(asgi_app, monkeypatch):
+    import asgi
+    monkeypatch.setitem(asgi.flask_app.config, 'MAX_CONTENT_LENGTH', 10)
+    status, _, _ = call_asgi(asgi_app, 'POST', '/ask', json.dumps({'question': 'what is asyncio?'}).encode())
+    assert status == 413
+
+def test_asgi_streams_flask_generator_responses(asgi_app):
+    # stream_with_context bodies need the request context on every chunk
+    models.add_task('water plants', task_datetime='2030-01-01T09:00:00')
+    status, headers, body = call_asgi(asgi_app, 'GET', '/tasks/export')
+    assert status == 200
+    assert [json.loads(line)['content'] for line in body.decode().splitlines()] == ['water plants']
+    
+    status, headers, body = call_asgi(asgi_app, 'GET', '/ask/stream', query_string=b'question=what+is+asyncio%3F')
+    assert status == 200
+    assert headers[b'Content-Type'].startswith(b'text/event-stream')
+    assert b'event: done' in body
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tests for provider circuit breakers in circuit_breaker.py and the nlp.py fallback chain
+"""
+
+import nlp
+from circuit_breaker import CircuitBreaker, BREAKER_COOLDOWNS, CLOSED, OPEN, HALF_OPEN
+from conftest import FakeClock
+from rate_limiter import RateLimiter
+
+def test_transient_failures_open_after_threshold():
+    clock = FakeClock()
+    breaker = CircuitBreaker('p', failure_threshold=3, clock=clock)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+    
+    clock.now += BREAKER_COOLDOWNS['error']
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.failures == 0
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker('p', failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+def test_billing_errors_open_immediately_for_longer():
+    clock = FakeClock()
+    breaker = CircuitBreaker('p', clock=clock)
+    breaker.record_failure('billing_error')
+    assert breaker.state == OPEN
+    assert breaker.cooldown == BREAKER_COOLDOWNS['billing_error'] > BREAKER_COOLDOWNS['error']
+    clock.now += BREAKER_COOLDOWNS['error']
+    assert not breaker.allow()
+
+def test_failed_probes_back_off_exponentially():
+    clock = FakeClock()
+    breaker = CircuitBreaker('p', clock=clock)
+    breaker.record_failure('quota_exceeded')
+    cooldowns = []
+    for _ in range(3):
+        clock.now = breaker.open_until
+        assert breaker.allow()
+        breaker.record_failure('quota_exceeded')
+        cooldowns.append(breaker.cooldown)
+    base = BREAKER_COOLDOWNS['quota_exceeded']
+    assert cooldowns == [base * 2, base * 4, base * 8]
+
+def test_stuck_probe_is_replaced(monkeypatch):
+    monkeypatch.setattr('circuit_breaker.BREAKER_PROBE_TIMEOUT_S', 30)
+    clock = FakeClock()
+    breaker = CircuitBreaker('p', clock=clock)
+    breaker.record_failure('quota_exceeded')
+    clock.now = breaker.open_until
+    assert breaker.allow()
+    clock.now += 31
+    assert breaker.allow()
+
+def test_unused_probe_can_be_released():
+    clock = FakeClock()
+    breaker = CircuitBreaker('p', clock=clock)
+    breaker.record_failure('quota_exceeded')
+    clock.now = breaker.open_until
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release_probe()
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+
+def half_open_breaker(name):
+    """A breaker whose cooldown is over, so its next allow() grants a probe"""
+    clock = FakeClock()
+    breaker = CircuitBreaker(name, clock=clock)
+    breaker.record_failure('quota_exceeded')
+    clock.now = breaker.open_until
+    return breaker
+
+def test_dead_provider_is_skipped(providers):
+    providers['deepseek'].error = '402 Insufficient Balance'
+    assert nlp.ask_ai_question('what is rust?') == 'openai answer'
+    assert nlp.process_query('what is go?') == '🤖 openai answer'
+    assert nlp.ask_ai_question('what is zig?') == 'openai answer'
+    # Only the first question paid for the billing error
+    assert providers['deepseek'].calls == 1
+    assert providers['openai'].calls == 3
+    health = nlp.get_provider_health()
+    assert health['deepseek']['state'] == OPEN
+    assert health['deepseek']['last_failure'] == 'billing_error'
+    assert health['openai']['state'] == CLOSED
+    assert not health['gemini']['configured']
+
+def test_rate_limited_probe_is_handed_back(providers, monkeypatch):
+    monkeypatch.setitem(nlp.provider_breakers, 'deepseek', half_open_breaker('deepseek'))
+    full = RateLimiter('DeepSeek', requests_per_minute=1, max_wait=0)
+    assert full.acquire(1)
+    monkeypatch.setitem(nlp.provider_limiters, 'deepseek', full)
+    assert nlp.ask_ai_question('what is a probe?') == 'openai answer'
+    assert providers['deepseek'].calls == 0
+    
+    # Once there is room again, the next question probes DeepSeek straight away
+    monkeypatch.setitem(nlp.provider_limiters, 'deepseek', RateLimiter('DeepSeek'))
+    assert nlp.ask_ai_question('what is a second probe?', route=['deepseek', 'openai']) == 'deepseek answer'
+    assert nlp.provider_breakers['deepseek'].state == CLOSED
+
+def test_all_providers_down_falls_back_to_built_in_answers(providers):
+    providers['deepseek'].error = 'quota limit reached'
+    providers['openai'].error = '401 unauthorized'
+    question = 'what is a circuit breaker?'
+    assert nlp.ask_ai_question(question) == nlp.get_predefined_answer(question)
+    nlp.ask_ai_question(question)
+    assert providers['deepseek'].calls == 1 and providers['openai'].calls == 1
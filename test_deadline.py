@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for request deadlines (deadline.py) and degraded answers
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import async_providers
+import nlp
+from conftest import timed
+from deadline import Deadline, request_deadline
+
+def test_request_deadline_parsing():
+    assert request_deadline('250').budget_ms == 250
+    assert request_deadline(None).budget_ms == request_deadline('soon').budget_ms == request_deadline(-5).budget_ms
+    assert Deadline(10 ** 9).budget_ms == Deadline(10 ** 10).budget_ms
+
+def test_attempts_get_the_remaining_budget(providers):
+    providers['deepseek'].delay = 0.1
+    deadline = Deadline(1000)
+    assert nlp.ask_ai_question('what is a deadline?', 'sequential', deadline) == 'deepseek answer'
+    assert 0.9 < providers['deepseek'].timeouts[0] <= 1.0
+    assert not deadline.exceeded
+
+def test_slow_provider_leaves_less_for_the_next(providers):
+    providers['deepseek'].delay = 5
+    deadline = Deadline(300)
+    question = 'what is a deadline?'
+    answer, elapsed = timed(nlp.ask_ai_question, question, 'sequential', deadline)
+    assert answer == nlp.get_predefined_answer(question)
+    assert elapsed < 0.6
+    assert deadline.exceeded
+    # DeepSeek used up the whole budget, so OpenAI was never asked
+    assert providers['openai'].timeouts == []
+
+def test_hedged_chain_stops_at_the_deadline_even_if_calls_hang(providers):
+    for client in providers.values():
+        client.delay = 1.0
+        client.ignores_timeout = True
+    deadline = Deadline(200)
+    question = 'what is a deadline?'
+    answer, elapsed = timed(nlp.ask_ai_question, question, 'hedged', deadline)
+    assert answer == nlp.get_predefined_answer(question)
+    assert elapsed < 0.5
+    assert deadline.exceeded
+
+def test_fast_failures_are_not_degraded(providers):
+    deadline = Deadline(100)
+    for breaker in nlp.provider_breakers.values():
+        breaker.record_failure('billing_error')
+    question = 'what is a deadline?'
+    assert nlp.ask_ai_question(question, None, deadline) == nlp.get_predefined_answer(question)
+    assert not deadline.exceeded
+
+def test_async_answers_respect_the_deadline(monkeypatch, providers):
+    async def hang(model, messages, **kwargs):
+        await asyncio.sleep(5)
+    
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=hang)))
+    monkeypatch.setattr(async_providers, 'get_async_clients',
+                        lambda: SimpleNamespace(deepseek=client, openai=client, gemini=None))
+    deadline = Deadline(200)
+    question = 'what is a deadline?'
+    answer, elapsed = timed(asyncio.run, async_providers.ask_ai_question_async(question, None, deadline))
+    assert answer == nlp.get_predefined_answer(question)
+    assert elapsed < 0.5
+    assert deadline.exceeded
+
+def test_ask_marks_answers_past_the_deadline_as_degraded(client, providers):
+    response = client.post('/ask', json={'question': 'what is a deadline?'})
+    assert response.get_json() == {'response': 'deepseek answer', 'type': 'ai_response'}
+    
+    providers['deepseek'].delay = providers['openai'].delay = 5
+    response = client.post('/ask', json={'question': 'what is a deadline?', 'deadline_ms': 150})
+    data = response.get_json()
+    assert data['degraded'] is True
+    assert data['response'] == nlp.get_predefined_answer('what is a deadline?')
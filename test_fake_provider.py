@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests for the fake OpenAI-compatible provider used in load tests (fake_provider.py)
+"""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from fake_provider import Profile, make_server, parse_errors, parse_latency
+
+@pytest.fixture
+def server():
+    server = make_server('127.0.0.1', 0, Profile('fixed:0', token_ms=0, answer_words=5))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), method='POST',
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return response.read().decode()
+
+def test_latency_and_error_specs():
+    assert parse_latency('fixed:250')() == 0.25
+    assert 0.1 <= parse_latency('uniform:100-200')() <= 0.2
+    assert parse_errors('402=0.01, 429=0.05') == parse_errors({'402': 0.01, 429: 0.05}) == {402: 0.01, 429: 0.05}
+    with pytest.raises(ValueError):
+        parse_latency('gaussian:5')
+    with pytest.raises(ValueError):
+        parse_errors('503=0.1')
+
+def test_chat_completion_and_stream(server):
+    messages = [{'role': 'user', 'content': [{'type': 'text', 'text': 'hello there'}]}]
+    answer = json.loads(post(f"{server}/deepseek/chat/completions", {'model': 'deepseek-chat', 'messages': messages}))
+    assert answer['model'] == 'deepseek-chat'
+    assert answer['choices'][0]['message']['content'].startswith("Fake answer to 'hello there'")
+    
+    events = post(f"{server}/openai/v1/chat/completions", {'messages': messages, 'stream': True}).split('\n\n')
+    chunks = [json.loads(event[len('data: '):]) for event in events if event.startswith('data: {')]
+    assert ''.join(chunk['choices'][0]['delta'].get('content', '') for chunk in chunks).startswith('Fake answer')
+    assert chunks[-1]['choices'][0]['finish_reason'] == 'stop'
+    assert 'data: [DONE]' in events
+
+def test_profiles_change_one_provider_at_runtime(server):
+    assert json.loads(post(f"{server}/_profile/deepseek", {'errors': {'402': 1}}))['errors'] == {'402': 1.0}
+    with pytest.raises(urllib.error.HTTPError) as failure:
+        post(f"{server}/deepseek/chat/completions", {'messages': []})
+    assert failure.value.code == 402
+    assert json.loads(failure.value.read())['error']['message'] == 'Insufficient Balance'
+    post(f"{server}/openai/v1/chat/completions", {'messages': []})
+    
+    with urllib.request.urlopen(f"{server}/_stats", timeout=5) as response:
+        stats = json.loads(response.read())
+    assert stats['requests'] == {'deepseek 402': 1, 'openai 200': 1}
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for hedged and raced provider requests in nlp.py
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+import nlp
+from circuit_breaker import CircuitBreaker, OPEN
+from conftest import timed
+from deadline import Deadline
+
+class SlowGemini:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.started = []
+    
+    def generate_content(self, prompt, **kwargs):
+        self.started.append(time.monotonic())
+        time.sleep(self.delay)
+        return SimpleNamespace(text='gemini answer')
+
+@pytest.fixture
+def providers(providers, monkeypatch):
+    """The shared fake providers, with Gemini as a third"""
+    providers['gemini'] = SlowGemini()
+    nlp.provider_clients.set('gemini', providers['gemini'])
+    monkeypatch.setattr(nlp, 'USE_GEMINI', True)
+    return providers
+
+def test_sequential_waits_for_the_slow_primary(providers):
+    providers['deepseek'].delay = 0.3
+    answer, elapsed = timed(nlp.ask_ai_question, 'what is a hedge?', 'sequential')
+    assert answer == 'deepseek answer' and elapsed >= 0.3
+    assert not providers['openai'].started
+
+def test_hedge_answers_from_the_backup(providers):
+    providers['deepseek'].delay = 0.5
+    answer, elapsed = timed(nlp.ask_ai_question, 'what is a hedge?', 'hedged')
+    assert answer == 'openai answer'
+    assert elapsed < 0.3
+    # The backup started after the hedge delay, and the third provider was never needed
+    assert providers['openai'].started[0] - providers['deepseek'].started[0] >= 0.04
+    assert not providers['gemini'].started
+
+def test_fast_primary_needs_no_hedge(providers):
+    assert nlp.ask_ai_question('what is a hedge?', 'hedged') == 'deepseek answer'
+    time.sleep(0.1)
+    assert not providers['openai'].started
+
+def test_failure_starts_the_next_provider_at_once(providers, monkeypatch):
+    monkeypatch.setattr(nlp, 'AI_HEDGE_DELAY_MS', 10_000)
+    providers['deepseek'].error = 'connection reset'
+    answer, elapsed = timed(nlp.process_query, 'what is a hedge?', 'hedged')
+    assert answer == '🤖 openai answer' and elapsed < 1
+
+def test_race_starts_everything(providers):
+    providers['deepseek'].delay = 0.2
+    providers['openai'].delay = 0.2
+    assert nlp.ask_ai_question('what is a race?', 'race') == 'gemini answer'
+    assert providers['deepseek'].started and providers['openai'].started
+
+def test_cancelled_attempts_hand_back_their_probe(providers, monkeypatch):
+    # One worker: OpenAI's probe is still queued behind DeepSeek when time runs out
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(nlp, '_hedge_executor', executor)
+    breaker = CircuitBreaker('openai', clock=lambda: 1000.0)
+    breaker.record_failure('quota_exceeded')
+    breaker.clock = lambda: 1000.0 + breaker.cooldown
+    monkeypatch.setitem(nlp.provider_breakers, 'openai', breaker)
+    providers['deepseek'].delay = 0.2
+    providers['deepseek'].ignores_timeout = True
+    
+    nlp.ask_ai_question('what is a probe?', 'race', Deadline(50))
+    assert not providers['openai'].started
+    assert breaker.allow()
+    executor.shutdown()
+
+def test_abandoned_requests_still_update_health(providers):
+    providers['deepseek'].delay = 0.2
+    providers['deepseek'].error = '402 Insufficient Balance'
+    assert nlp.ask_ai_question('what is a hedge?', 'hedged') == 'openai answer'
+    deadline = time.monotonic() + 2
+    while nlp.provider_breakers['deepseek'].state != OPEN and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert nlp.provider_breakers['deepseek'].state == OPEN
+    assert nlp.ask_ai_question('what is a hedge?', 'hedged') == 'openai answer'
+    assert len(providers['deepseek'].started) == 1
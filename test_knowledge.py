@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for the knowledge base index in knowledge.py
+"""
+
+import json
+import os
+
+import knowledge
+from knowledge import KnowledgeBase, load_knowledge_base
+
+ENTRIES = [
+    {'id': 'ml', 'keywords': ['machine learning', 'deep learning'], 'answer': 'ML'},
+    {'id': 'study', 'keywords': ['learning', 'study tips'], 'answer': 'Study'},
+    {'id': 'greeting', 'keywords': ['hello', 'hi'], 'answer': 'Hi', 'weight': 0.5},
+    {'id': 'python', 'keywords': ['python'], 'answer': 'Python'},
+]
+
+def write_kb(path, entries=ENTRIES):
+    path.write_text(json.dumps({'fallback': '? {question}', 'default': 'default', 'entries': entries}))
+
+def test_longest_phrase_wins():
+    knowledge_base = KnowledgeBase(ENTRIES)
+    assert knowledge_base.match_terms('Machine learning, or learning?') == {'machine learning', 'learning'}
+    assert knowledge_base.search('tell me about machine learning')[0]['id'] == 'ml'
+    assert knowledge_base.search('learning to cook')[0]['id'] == 'study'
+
+def test_scores_combine_and_weights_apply():
+    knowledge_base = KnowledgeBase(ENTRIES)
+    # The greeting is down-weighted, so the topic wins
+    assert knowledge_base.search('hello, python?')[0]['id'] == 'python'
+    assert knowledge_base.search('hi')[0]['id'] == 'greeting'
+    assert knowledge_base.search('this python')[0]['id'] == 'python'
+
+def test_threshold():
+    knowledge_base = KnowledgeBase(ENTRIES)
+    entry, score = knowledge_base.search('hi')
+    assert score > 0
+    assert knowledge_base.search('hi', min_score=score + 0.01) == (None, 0.0)
+    assert knowledge_base.search('nothing relevant') == (None, 0.0)
+
+def test_index_cache_round_trip(tmp_path, monkeypatch):
+    source = tmp_path / 'kb.json'
+    cache = tmp_path / 'kb.json.cache'
+    write_kb(source)
+    
+    first = load_knowledge_base(str(source))
+    assert cache.exists()
+    assert first.default == 'default'
+    
+    # A matching cache is used without re-reading the source
+    def fail(*args, **kwargs):
+        raise AssertionError('knowledge base rebuilt')
+    monkeypatch.setattr(knowledge, 'build_knowledge_base', fail)
+    assert load_knowledge_base(str(source)).search('python')[0]['answer'] == 'Python'
+    monkeypatch.undo()
+    
+    # Editing the file invalidates it
+    write_kb(source, ENTRIES + [{'id': 'rust', 'keywords': ['rust'], 'answer': 'Rust'}])
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert load_knowledge_base(str(source)).search('rust')[0]['answer'] == 'Rust'
+
+def test_unreadable_cache_is_rebuilt(tmp_path):
+    source = tmp_path / 'kb.json'
+    write_kb(source)
+    (tmp_path / 'kb.json.cache').write_bytes(b'not json')
+    assert load_knowledge_base(str(source)).search('python')[0]['id'] == 'python'
+
+def test_cache_is_json_and_checked_against_the_source_hash(tmp_path):
+    source = tmp_path / 'kb.json'
+    cache = tmp_path / 'kb.json.cache'
+    write_kb(source)
+    load_knowledge_base(str(source))
+    cached = json.loads(cache.read_text())
+    
+    # Same mtime and size but different content: the hash catches it
+    stat = source.stat()
+    source.write_text(source.read_text().replace('Python', 'PYTHON'))
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert load_knowledge_base(str(source)).search('python')[0]['answer'] == 'PYTHON'
+    assert json.loads(cache.read_text())['key'] != cached['key']
+
+def test_missing_file(tmp_path):
+    knowledge_base = load_knowledge_base(str(tmp_path / 'missing.json'))
+    assert knowledge_base.search('python') == (None, 0.0)
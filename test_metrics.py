@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for the metrics layer (metrics.py) and the /metrics endpoint
+"""
+
+import threading
+
+import pytest
+
+import nlp
+from metrics import Counter, Histogram, Registry
+from response_cache import ResponseCache
+
+def test_counters_and_histograms_render_in_prometheus_text_format():
+    registry = Registry()
+    calls = Counter('calls_total', 'Calls', ('provider', 'outcome'), registry=registry)
+    latency = Histogram('call_seconds', 'Latency', ('provider',), buckets=(0.1, 1), registry=registry)
+    calls.inc('deepseek', 'success')
+    calls.inc('deepseek', 'success', amount=2)
+    latency.observe(0.05, 'deepseek')
+    latency.observe(0.1, 'deepseek')
+    latency.observe(3, 'deepseek')
+    registry.add_collector(lambda: [('waiting', 'gauge', 'Waiting', ('name',), [(('say "hi"',), 2)])])
+    assert registry.render() == (
+        '# HELP calls_total Calls\n'
+        '# TYPE calls_total counter\n'
+        'calls_total{provider="deepseek",outcome="success"} 3\n'
+        '# HELP call_seconds Latency\n'
+        '# TYPE call_seconds histogram\n'
+        'call_seconds_bucket{provider="deepseek",le="0.1"} 2\n'
+        'call_seconds_bucket{provider="deepseek",le="1.0"} 2\n'
+        'call_seconds_bucket{provider="deepseek",le="+Inf"} 3\n'
+        'call_seconds_sum{provider="deepseek"} 3.15\n'
+        'call_seconds_count{provider="deepseek"} 3\n'
+        '# HELP waiting Waiting\n'
+        '# TYPE waiting gauge\n'
+        'waiting{name="say \\"hi\\""} 2\n'
+    )
+
+def test_threads_record_separately_and_finished_ones_are_folded():
+    calls = Counter('calls_total', 'Calls', registry=None)
+    latency = Histogram('call_seconds', 'Latency', buckets=(1,), registry=None)
+    
+    def work():
+        for _ in range(1000):
+            calls.inc()
+            latency.observe(0.5)
+    
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls.collect() == {(): 8000}
+    assert latency.collect() == {(): [8000, 0, 4000.0]}
+    # Scraping folded the finished threads' shards into one
+    assert calls._shards == [] and calls.collect() == {(): 8000}
+
+def test_timer_times_blocks_and_functions():
+    latency = Histogram('call_seconds', 'Latency', ('operation',), buckets=(1,), registry=None)
+    
+    @latency.time('decorated')
+    def fails():
+        raise ValueError('boom')
+    
+    with latency.time('block'):
+        pass
+    with pytest.raises(ValueError):
+        fails()
+    counts = latency.collect()
+    assert counts[('block',)][0] == counts[('decorated',)][0] == 1
+
+def sample(text, series):
+    """Value of one series in a /metrics body, 0 if it isn't there"""
+    for line in text.splitlines():
+        if line.startswith(series + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+@pytest.fixture
+def providers(providers):
+    """The shared fake providers, with DeepSeek failing every call"""
+    providers['deepseek'].error = 'upstream error'
+    return providers
+
+def test_metrics_endpoint_reports_providers_tiers_routes_and_database(client):
+    series = [
+        'assistant_provider_calls_total{provider="deepseek",outcome="error"}',
+        'assistant_provider_calls_total{provider="openai",outcome="success"}',
+        'assistant_provider_call_duration_seconds_count{provider="openai"}',
+        'assistant_answers_total{tier="provider"}',
+        'assistant_http_requests_total{route="/ask",method="POST",status="200"}',
+        'assistant_db_call_duration_seconds_count{operation="add_chat_message"}',
+    ]
+    before = client.get('/metrics').get_data(as_text=True)
+    # Request metrics are recorded when the server closes the response
+    with client.post('/ask', json={'question': 'what are metrics?'}) as response:
+        assert response.get_json()['response'] == 'openai answer'
+    
+    response = client.get('/metrics')
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    after = response.get_data(as_text=True)
+    assert [sample(after, name) - sample(before, name) for name in series] == [1] * len(series)
+    assert 'assistant_provider_circuit_open{provider="deepseek"} 0' in after
+
+def test_cache_hits_count_as_answers_not_provider_calls(client, monkeypatch):
+    monkeypatch.setattr(nlp, 'response_cache', ResponseCache(max_entries=10, ttl=60))
+    series = [
+        'assistant_provider_calls_total{provider="openai",outcome="success"}',
+        'assistant_provider_call_duration_seconds_count{provider="openai"}',
+        'assistant_answers_total{tier="provider"}',
+        'assistant_answers_total{tier="cache"}',
+    ]
+    before = client.get('/metrics').get_data(as_text=True)
+    for _ in range(3):
+        client.post('/ask', json={'question': 'what are cached metrics?', 'route': ['openai']}).close()
+    after = client.get('/metrics').get_data(as_text=True)
+    assert [sample(after, name) - sample(before, name) for name in series] == [1, 1, 1, 2]
+
+def test_streamed_requests_are_timed_to_the_end_of_the_stream(client):
+    name = 'assistant_http_request_duration_seconds_count{route="/ask/stream",method="GET"}'
+    before = sample(client.get('/metrics').get_data(as_text=True), name)
+    response = client.get('/ask/stream?question=what+is+streaming%3F')
+    response.get_data()
+    # Not recorded until the body has been sent and the response closed
+    assert sample(client.get('/metrics').get_data(as_text=True), name) == before
+    response.close()
+    assert sample(client.get('/metrics').get_data(as_text=True), name) == before + 1
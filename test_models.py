@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Tests for the SQLite layer in models.py
+"""
+
+import os
+import sqlite3
+
+import pytest
+
+import models
+
+def query_plan(conn, sql, params=()):
+    """Return the EXPLAIN QUERY PLAN detail lines for a query"""
+    return ' | '.join(row['detail'] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params))
+
+def test_connection_is_reused_per_thread(db):
+    assert models.get_db_connection() is db
+    assert db.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+def test_init_db_sets_schema_version(db):
+    assert models.get_schema_version(db) == models.SCHEMA_VERSION
+
+def test_session_history_query_uses_index(db):
+    plan = query_plan(db, '''
+        SELECT * FROM chat_history WHERE session_id = ? ORDER BY created_at DESC LIMIT ?
+    ''', ('abc', 50))
+    assert 'idx_chat_history_session_created' in plan
+    assert 'TEMP B-TREE' not in plan
+
+def test_open_tasks_query_uses_index(db):
+    plan = query_plan(db, '''
+        SELECT * FROM tasks WHERE completed = FALSE ORDER BY datetime ASC, created_at ASC
+    ''')
+    assert 'idx_tasks_completed_datetime' in plan
+    assert 'TEMP B-TREE' not in plan
+
+def test_existing_database_is_upgraded_in_place(tmp_path, monkeypatch):
+    path = tmp_path / 'legacy.db'
+    legacy = sqlite3.connect(path)
+    legacy.execute('''
+        CREATE TABLE chat_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_message TEXT NOT NULL,
+            ai_response TEXT NOT NULL,
+            message_type TEXT DEFAULT 'text',
+            created_at TEXT NOT NULL,
+            session_id TEXT
+        )
+    ''')
+    legacy.execute('''
+        INSERT INTO chat_history (user_message, ai_response, created_at, session_id)
+        VALUES ('hi', 'hello', '2025-01-01T10:00:00', 's1')
+    ''')
+    legacy.commit()
+    legacy.close()
+    
+    monkeypatch.setattr(models, 'DATABASE', str(path))
+    try:
+        models.init_db()
+        conn = models.get_db_connection()
+        assert models.get_schema_version(conn) == models.SCHEMA_VERSION
+        indexes = {row['name'] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert 'idx_chat_history_session_created' in indexes
+        assert [m['user_message'] for m in models.get_chat_history(session_id='s1')] == ['hi']
+    finally:
+        models.close_db_connection()
+
+def test_history_pages_with_cursors(db):
+    for i in range(7):
+        models.add_chat_message(f'q{i}', f'a{i}', session_id='s1')
+    models.add_chat_message('other', 'session', session_id='s2')
+    
+    newest = models.get_chat_history(limit=3, session_id='s1')
+    assert [m['user_message'] for m in newest] == ['q4', 'q5', 'q6']
+    
+    older = models.get_chat_history(limit=3, session_id='s1', before=models.encode_history_cursor(newest[0]))
+    assert [m['user_message'] for m in older] == ['q1', 'q2', 'q3']
+    
+    newer = models.get_chat_history(limit=3, session_id='s1', after=models.encode_history_cursor(older[0]))
+    assert [m['user_message'] for m in newer] == ['q2', 'q3', 'q4']
+
+def test_history_cursor_query_uses_index(db):
+    plan = query_plan(db, '''
+        SELECT * FROM chat_history WHERE session_id = ? AND (created_at, id) < (?, ?)
+        ORDER BY created_at DESC, id DESC LIMIT ?
+    ''', ('s1', '2025-01-01T00:00:00', 10, 50))
+    assert 'idx_chat_history_session_created' in plan
+    assert 'TEMP B-TREE' not in plan
+
+def test_invalid_history_cursor_is_rejected(db):
+    with pytest.raises(ValueError):
+        models.get_chat_history(before='not-a-cursor')
+
+def test_write_behind_batches_and_reads_own_writes(db, monkeypatch):
+    monkeypatch.setattr(models, 'CHAT_WRITE_BEHIND', True)
+    monkeypatch.setattr(models, 'CHAT_FLUSH_INTERVAL_MS', 10_000)
+    try:
+        for i in range(5):
+            assert models.add_chat_message(f'q{i}', f'a{i}', session_id='s1') is None
+        
+        # The long flush interval means nothing is written until a reader asks
+        history = models.get_chat_history(session_id='s1')
+        assert [m['user_message'] for m in history] == [f'q{i}' for i in range(5)]
+        
+        models.add_chat_message('last', 'one', session_id='s1')
+    finally:
+        models.stop_chat_write_behind()
+    
+    assert db.execute('SELECT COUNT(*) FROM chat_history').fetchone()[0] == 6
+
+@pytest.mark.skipif(not hasattr(os, 'fork') or models.fcntl is None, reason='needs fork() and flock()')
+def test_write_behind_reads_writes_queued_by_another_worker(db, monkeypatch):
+    monkeypatch.setattr(models, 'CHAT_WRITE_BEHIND', True)
+    monkeypatch.setattr(models, 'CHAT_FLUSH_INTERVAL_MS', 300)
+    queued_r, queued_w = os.pipe()
+    done_r, done_w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # Another worker: queues a message, which its writer inserts a flush interval later
+        try:
+            models.add_chat_message('from worker 2', 'a', session_id='s1')
+            os.write(queued_w, b'x')
+            os.read(done_r, 1)
+        finally:
+            os._exit(0)
+    try:
+        os.read(queued_r, 1)
+        history = models.get_chat_history(session_id='s1')
+        assert [m['user_message'] for m in history] == ['from worker 2']
+    finally:
+        os.write(done_w, b'x')
+        os.waitpid(pid, 0)
+        models.stop_chat_write_behind()
+
+def test_chat_stats_follow_inserts_and_clears(db):
+    models.add_chat_message('q', 'a', 'ai_question', session_id='s1')
+    models.add_chat_message('q', 'a', 'task', session_id='s1')
+    models.add_chat_message('q', 'a', 'ai_question', session_id='s2')
+    
+    stats = models.get_chat_stats(session_id='s1')
+    assert stats['total_messages'] == 3
+    assert stats['recent_messages'] == 3
+    assert stats['session_messages'] == 2
+    assert stats['messages_by_type'] == {'ai_question': 2, 'task': 1}
+    
+    models.clear_chat_history(session_id='s1')
+    stats = models.get_chat_stats(session_id='s1')
+    assert stats['total_messages'] == 1
+    assert stats['session_messages'] == 0
+    assert stats['messages_by_type'] == {'ai_question': 1}
+
+def test_rebuild_chat_stats_recounts(db):
+    models.add_chat_message('old', 'a', session_id='s1')
+    db.execute("UPDATE chat_history SET created_at = '2020-01-01T00:00:00'")
+    db.execute("UPDATE chat_stats SET count = 99")
+    db.commit()
+    
+    assert models.rebuild_chat_stats()
+    stats = models.get_chat_stats()
+    assert stats['total_messages'] == 1
+    assert stats['recent_messages'] == 0
+
+def test_search_chat_history_ranks_and_filters(db):
+    models.add_chat_message('what is machine learning', 'Machine learning finds patterns in data', session_id='s1')
+    models.add_chat_message('tell me about sleep', 'Keep a consistent schedule', session_id='s1')
+    models.add_chat_message('machine learning again', 'Still about machine learning', session_id='s2')
+    
+    results = models.search_chat_history('machine learning', session_id='s1')
+    assert len(results) == 1
+    assert '**machine**' in results[0]['user_snippet']
+    
+    assert len(models.search_chat_history('learning', limit=10)) == 2
+    # FTS5 operators in user input are treated as plain words
+    assert models.search_chat_history('sleep" OR NEAR(') == []
+    
+    models.clear_chat_history(session_id='s2')
+    assert len(models.search_chat_history('learning')) == 1
+
+def test_search_ranks_every_match_not_just_the_newest(db):
+    models.add_chat_message('zebra facts', 'Zebra stripes: every zebra has its own zebra pattern', session_id='s1')
+    filler = ' '.join(['word'] * 30)
+    with db:
+        db.executemany(models.INSERT_CHAT_MESSAGE_SQL, [
+            (f'question {i}', f'{filler} zebra {filler}', 'ai_question', f'2030-01-01T00:{i // 60:02d}:{i % 60:02d}', 's1')
+            for i in range(250)
+        ])
+    
+    best = models.search_chat_history('zebra', session_id='s1', limit=1)
+    assert best[0]['user_snippet'] == '**zebra** facts'
+    assert best[0]['ai_snippet'].lower().count('**zebra**') == 3
+    assert len(models.search_chat_history('zebra', limit=300)) == 251
+
+def test_bulk_import_and_streaming_export(db):
+    rows = ((f'task {i}', 'schedule', f'2025-01-{i % 28 + 1:02d}T09:00:00', i % 2 == 0) for i in range(25))
+    assert models.add_tasks_bulk(rows, chunk_size=10) == 25
+    
+    assert len(list(models.iter_tasks(batch_size=4))) == 12
+    exported = list(models.iter_tasks(include_completed=True))
+    assert len(exported) == 25
+    assert [t['datetime'] for t in exported] == sorted(t['datetime'] for t in exported)
+
+def test_task_changes_report_deltas_since_revision(db):
+    first = models.add_task('first')
+    base = models.get_task_changes()
+    assert base['full'] and [t['id'] for t in base['tasks']] == [first]
+    
+    second = models.add_task('second')
+    models.update_task(first, new_content='first, edited')
+    
+    delta = models.get_task_changes(since=base['revision'])
+    assert not delta['full']
+    assert {t['content'] for t in delta['upserted']} == {'first, edited', 'second'}
+    assert delta['removed'] == []
+    
+    models.mark_task_completed(first)
+    models.delete_task(second)
+    later = models.get_task_changes(since=delta['revision'])
+    assert later['upserted'] == []
+    assert sorted(later['removed']) == [first, second]
+    
+    assert models.get_task_changes(since=later['revision'])['upserted'] == []
+    # Revisions the server never issued force a full resync
+    assert models.get_task_changes(since=later['revision'] + 5)['full']
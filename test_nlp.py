@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for intent detection and built-in answers in nlp.py
+"""
+
+import random
+
+import pytest
+
+import nlp
+from nlp import KeywordMatcher
+
+def scan_intent(text):
+    """detect_intent as a plain substring scan, group by group"""
+    text_lower = text.lower()
+    for intent, keywords in nlp.INTENT_KEYWORDS:
+        if any(keyword in text_lower for keyword in keywords):
+            return intent
+    return 'question'
+
+def random_queries(count, seed=0):
+    """Queries glued together from keywords, so matches overlap and nest"""
+    rng = random.Random(seed)
+    words = sorted({keyword for _, keywords in nlp.INTENT_KEYWORDS for keyword in keywords})
+    words += ['planet', 'whatever', 'showtime', 'xyz', 'the', '??']
+    queries = []
+    for _ in range(count):
+        query = rng.choice(['', ' ']).join(rng.choices(words, k=rng.randint(1, 4)))
+        queries.append(query.upper() if rng.random() < 0.3 else query)
+    return queries
+
+def test_matcher_prefers_earlier_groups():
+    matcher = KeywordMatcher([['career advice'], ['car'], ['advice', 'reer']])
+    assert matcher.match('some career advice') == 0
+    assert matcher.match('a career') == 1
+    assert matcher.match('good advice') == 2
+    assert matcher.match('nothing') is None
+
+def test_matcher_sees_overlapping_and_prefix_keywords():
+    # 'planet' must not hide 'plan', and 'his' inside 'this' still counts
+    matcher = KeywordMatcher([['plan'], ['planet'], ['hi']])
+    assert matcher.match('planetary') == 0
+    assert KeywordMatcher([['his'], ['this']]).match('this') == 0
+    assert KeywordMatcher([['x'], ['ab', 'bc']]).match('abc') == 1
+
+def test_intent_matches_substring_scan():
+    for query in random_queries(20000) + ['', "don't forget the meeting"]:
+        assert nlp.detect_intent(query) == scan_intent(query), query
+
+def answer_for(entry_id):
+    entry = next(entry for entry in nlp.get_knowledge_base().entries if entry['id'] == entry_id)
+    return entry['answer']
+
+@pytest.mark.parametrize('question, entry_id', [
+    ('What is machine learning?', 'machine-learning'),
+    ('hi', 'greeting'),
+    ('  Hey ', 'greeting'),
+    ('help me with python', 'python'),
+    ('what can you do', 'help'),
+    ('thanks for the help', 'thanks'),
+    ('time management tips', 'productivity'),
+])
+def test_predefined_answers(question, entry_id):
+    assert nlp.get_predefined_answer(question) == answer_for(entry_id)
+
+def test_predefined_answer_templates():
+    assert nlp.get_predefined_answer('what time is it').startswith('⏰ Current time: ')
+    assert nlp.get_predefined_answer("what's today's date?").startswith('📅 Today is ')
+
+def test_predefined_answer_fallbacks():
+    knowledge_base = nlp.get_knowledge_base()
+    question = 'Why is the sky blue?'
+    assert nlp.get_predefined_answer(question) == knowledge_base.fallback.format(question=question)
+    # Keywords only match whole words now: 'art' is not in 'start a party'
+    assert nlp.get_predefined_answer('start a party') == knowledge_base.default
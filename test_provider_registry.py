@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Tests for lazily built provider clients (provider_registry.py)
+"""
+
+import os
+import subprocess
+import sys
+
+from provider_registry import ProviderRegistry
+
+def test_client_is_built_once_on_first_use():
+    built = []
+    registry = ProviderRegistry()
+    registry.register('openai', lambda: built.append('openai') or 'client')
+    assert built == [] and registry.loaded() == []
+    assert registry.get('openai') == 'client'
+    assert registry.get('openai') == 'client'
+    assert built == ['openai'] and registry.loaded() == ['openai']
+
+def test_failed_factory_is_not_retried():
+    calls = []
+    registry = ProviderRegistry()
+    registry.register('gemini', lambda: calls.append(1))
+    assert registry.get('gemini') is None
+    assert registry.get('gemini') is None
+    assert len(calls) == 1
+
+def test_unregistered_provider_has_no_client():
+    assert ProviderRegistry().get('deepseek') is None
+    assert ProviderRegistry({'deepseek': 'fake'}).get('deepseek') == 'fake'
+
+def test_importing_nlp_defers_heavy_libraries(tmp_path):
+    root = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=root, DEEPSEEK_API_KEY='test-key', OPENAI_API_KEY='test-key')
+    code = "import sys, nlp; print(sorted(m for m in ('openai', 'httpx', 'numpy') if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-c', code], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == '[]'
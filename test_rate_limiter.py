@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for client-side provider rate limits (rate_limiter.py)
+"""
+
+import time
+
+import pytest
+
+import nlp
+from circuit_breaker import CLOSED
+from conftest import FakeClock
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache
+
+def test_requests_beyond_the_burst_wait_for_refill():
+    clock = FakeClock()
+    limiter = RateLimiter('test', requests_per_minute=60, max_wait=5, clock=clock)
+    assert all(limiter.reserve(1) == 0 for _ in range(60))
+    assert limiter.reserve(1) == pytest.approx(1.0)
+    # Waiting requests queue up behind each other
+    assert limiter.reserve(1) == pytest.approx(2.0)
+    clock.now += 30
+    limiter._done_waiting()
+    limiter._done_waiting()
+    assert limiter.reserve(1) == 0
+
+def test_token_quota_counts_estimated_tokens():
+    clock = FakeClock()
+    limiter = RateLimiter('test', tokens_per_minute=600, max_wait=5, clock=clock)
+    assert limiter.reserve(500) == 0
+    # 400 more tokens need 300 of refill at 10 per second
+    assert limiter.reserve(400) is None
+    assert limiter.reserve(140) == pytest.approx(4.0)
+    assert limiter.stats()['rejected_deadline'] == 1
+
+def test_full_queue_rejects_at_once():
+    clock = FakeClock()
+    limiter = RateLimiter('test', requests_per_minute=1, max_queue=1, max_wait=120, clock=clock)
+    assert limiter.reserve(1) == 0
+    assert limiter.reserve(1) == pytest.approx(60.0)
+    assert limiter.reserve(1) is None
+    stats = limiter.stats()
+    assert (stats['waiting'], stats['queued'], stats['rejected_queue_full']) == (1, 1, 1)
+
+def test_acquire_sleeps_and_records_the_wait():
+    limiter = RateLimiter('test', requests_per_minute=1200, max_wait=1)
+    for _ in range(1200):
+        limiter.reserve(1)
+    start = time.monotonic()
+    assert limiter.acquire(1)
+    assert time.monotonic() - start >= 0.04
+    stats = limiter.stats()
+    assert stats['waiting'] == 0
+    assert 40 <= stats['wait_ms']['max'] <= 60
+
+def test_unlimited_by_default():
+    limiter = RateLimiter('test')
+    assert not limiter.enabled
+    assert all(limiter.acquire(10 ** 6) for _ in range(1000))
+
+def test_exhausted_provider_spills_over_to_the_next(providers):
+    nlp.provider_limiters['deepseek'] = RateLimiter('deepseek', requests_per_minute=1, max_wait=0.5)
+    assert nlp.ask_ai_question('what is a token bucket?') == 'deepseek answer'
+    assert nlp.ask_ai_question('what is a leaky bucket?') == 'openai answer'
+    assert providers['deepseek'].calls == 1
+    # Running out of quota locally is not a provider failure
+    assert nlp.provider_breakers['deepseek'].state == CLOSED
+    assert nlp.get_provider_health()['deepseek']['rate_limit']['rejected_deadline'] == 1
+
+def test_all_providers_exhausted_uses_the_built_in_answer(providers):
+    for name in ('deepseek', 'openai'):
+        nlp.provider_limiters[name] = RateLimiter(name, tokens_per_minute=10, max_wait=0.5)
+    question = 'what is a token bucket?'
+    assert nlp.ask_ai_question(question) == nlp.get_predefined_answer(question)
+    assert providers['deepseek'].calls == providers['openai'].calls == 0
+
+def test_cached_answers_spend_no_quota(providers, monkeypatch):
+    monkeypatch.setattr(nlp, 'response_cache', ResponseCache(max_entries=10, ttl=60))
+    nlp.provider_limiters['deepseek'] = RateLimiter('deepseek', requests_per_minute=2, max_wait=0)
+    question = 'what is a token bucket?'
+    assert [nlp.ask_ai_question(question) for _ in range(3)] == ['deepseek answer'] * 3
+    # The repeats came from the cache, so the second question still fits the quota
+    assert nlp.ask_ai_question('what is a leaky bucket?') == 'deepseek answer'
+    assert providers['deepseek'].calls == 2
+    assert nlp.provider_limiters['deepseek'].stats()['admitted'] == 2
+
+def test_queue_waits_are_exported(providers):
+    nlp.provider_limiters['deepseek'] = RateLimiter('deepseek', requests_per_minute=60, max_wait=2)
+    nlp.provider_limiters['deepseek'].requests.level = 0
+    # Bucket counts, then the sum
+    before = nlp.rate_limit_wait_seconds.collect().get(('deepseek',), [0, 0.0])
+    assert nlp.ask_ai_question('what is a token bucket?') == 'deepseek answer'
+    after = nlp.rate_limit_wait_seconds.collect()[('deepseek',)]
+    assert sum(after[:-1]) - sum(before[:-1]) == 1
+    assert after[-1] - before[-1] >= 0.9
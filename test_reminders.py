@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tests for the reminder scheduler in reminders.py, driven by a simulated clock
+"""
+
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import models
+import reminders
+from conftest import FakeClock
+from reminders import ReminderScheduler
+
+START = datetime(2030, 1, 1, 9, 0)
+
+@pytest.fixture
+def scheduler(db):
+    clock = FakeClock(START)
+    delivered = []
+    sched = ReminderScheduler(deliver=delivered.append, clock=clock, batch_size=3)
+    sched.delivered = delivered
+    models.add_task_listener(sched.on_task_changed)
+    yield sched
+    models.remove_task_listener(sched.on_task_changed)
+
+def at(minutes):
+    return (START + timedelta(minutes=minutes)).isoformat()
+
+def test_fires_in_due_order_and_only_once(scheduler):
+    later = models.add_task('later', task_datetime=at(30))
+    sooner = models.add_task('sooner', task_datetime=at(10))
+    models.add_task('no time')
+    scheduler.load()
+    
+    assert scheduler.run_pending() == []
+    scheduler.clock.advance(minutes=45)
+    assert [t['id'] for t in scheduler.run_pending()] == [sooner, later]
+    assert scheduler.run_pending() == []
+    
+    # Delivery is recorded, so a reload does not fire them again
+    scheduler.load()
+    assert scheduler.run_pending() == []
+
+def test_follows_updates_deletes_and_completions(scheduler):
+    scheduler.load()
+    moved = models.add_task('moved', task_datetime=at(5))
+    deleted = models.add_task('deleted', task_datetime=at(5))
+    done = models.add_task('done', task_datetime=at(5))
+    kept = models.add_task('kept', task_datetime=at(5))
+    
+    models.update_task(moved, new_datetime=at(60))
+    models.delete_task(deleted)
+    models.mark_task_completed(done)
+    
+    scheduler.clock.advance(minutes=10)
+    assert [t['id'] for t in scheduler.run_pending()] == [kept]
+    scheduler.clock.advance(minutes=60)
+    assert [t['id'] for t in scheduler.run_pending()] == [moved]
+
+def test_pages_in_reminders_beyond_the_loaded_batch(scheduler):
+    ids = [models.add_task(f'task {i}', task_datetime=at(i)) for i in range(10)]
+    scheduler.load()
+    assert len(scheduler) == 3
+    
+    # Added beyond the loaded batch: picked up when that part of the queue is paged in
+    late = models.add_task('late', task_datetime=at(100))
+    scheduler.clock.advance(minutes=200)
+    assert [t['id'] for t in scheduler.run_pending()] == ids + [late]
+
+def test_failed_delivery_is_retried(scheduler):
+    attempts = []
+    def flaky(task):
+        attempts.append(task['id'])
+        if len(attempts) == 1:
+            raise RuntimeError('push service down')
+    scheduler.deliver = flaky
+    task_id = models.add_task('retry me', task_datetime=at(1))
+    scheduler.load()
+    
+    scheduler.clock.advance(minutes=2)
+    assert scheduler.run_pending() == []
+    scheduler.clock.advance(minutes=5)
+    assert [t['id'] for t in scheduler.run_pending()] == [task_id]
+    assert attempts == [task_id, task_id]
+
+def test_offset_aware_rows_are_scheduled_with_naive_ones(scheduler):
+    # As stored by imports before offsets were converted to local time
+    aware = datetime.fromtimestamp(START.timestamp() + 600).astimezone().isoformat()
+    aware_id = models.add_task('aware', task_datetime=aware)
+    naive_id = models.add_task('naive', task_datetime=at(5))
+    scheduler.load()
+    
+    scheduler.clock.advance(minutes=15)
+    assert [t['id'] for t in scheduler.run_pending()] == [naive_id, aware_id]
+
+def test_past_due_imports_are_not_fired(scheduler):
+    scheduler.load()
+    rows = [('long gone', 'reminder', '2020-01-01T09:00:00', False), ('upcoming', 'reminder', at(10), False)]
+    assert models.add_tasks_bulk(rows) == 2
+    
+    scheduler.clock.advance(minutes=15)
+    assert [t['content'] for t in scheduler.run_pending()] == ['upcoming']
+
+def test_scheduler_thread_survives_errors(scheduler, monkeypatch):
+    monkeypatch.setattr(reminders, 'REMINDER_RETRY_S', 0)
+    calls = []
+    fired = threading.Event()
+    def run_pending(now=None):
+        calls.append(now)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError('database is locked')
+        fired.set()
+        return []
+    scheduler.run_pending = run_pending
+    models.add_task('due now', task_datetime=at(0))
+    
+    scheduler.start()
+    try:
+        assert fired.wait(5)
+        assert scheduler._thread.is_alive()
+    finally:
+        scheduler.stop()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Tests for the AI response caches in response_cache.py and their use in nlp.py
+"""
+
+import pytest
+
+import nlp
+import response_cache
+from conftest import FakeClock
+from response_cache import ResponseCache, SemanticCache
+
+needs_numpy = pytest.mark.skipif(not response_cache.NUMPY_AVAILABLE, reason='NumPy not installed')
+
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+def test_ttl_expiry():
+    clock = FakeClock()
+    cache = ResponseCache(max_entries=10, ttl=60, clock=clock)
+    cache.put('a', 1)
+    cache.put('b', 2, ttl=600)
+    clock.now += 61
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['expirations'], stats['size']) == (1, 1, 1, 1)
+
+def test_disabled_cache():
+    cache = ResponseCache(max_entries=0)
+    cache.put('a', 1)
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+def test_get_first_counts_one_lookup():
+    cache = ResponseCache(max_entries=10, ttl=60)
+    cache.put('b', 2)
+    assert cache.get_first(['a', None, 'b']) == 2
+    assert cache.get_first(['x', 'y', 'z']) is None
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 1)
+
+@pytest.fixture
+def openai(openai, monkeypatch):
+    """The OpenAI-only fake, with the response cache on"""
+    monkeypatch.setattr(nlp, 'response_cache', ResponseCache(max_entries=10, ttl=60))
+    return openai
+
+def test_repeated_questions_are_served_from_cache(openai):
+    assert nlp.ask_ai_question('What is AI?') == 'answer 1'
+    assert nlp.ask_ai_question('  "what is   ai?" ') == 'answer 1'
+    assert nlp.process_query('WHAT IS AI?') == '🤖 answer 1'
+    assert openai.questions == ['What is AI?']
+    assert nlp.response_cache.stats()['hits'] == 2
+
+def test_a_missed_question_is_one_miss(openai):
+    nlp.ask_ai_question('What is a cache miss?')
+    stats = nlp.response_cache.stats()
+    assert (stats['hits'], stats['misses']) == (0, 1)
+
+def test_time_sensitive_questions_are_not_cached(openai):
+    nlp.ask_ai_question('What is the date today?')
+    nlp.ask_ai_question('What is the date today?')
+    assert openai.calls == 2
+    assert len(nlp.response_cache) == 0
+
+def test_model_settings_are_part_of_the_key(openai, monkeypatch):
+    nlp.ask_ai_question('Explain recursion')
+    monkeypatch.setattr(nlp, 'AI_TEMPERATURE', 0.1)
+    nlp.ask_ai_question('Explain recursion')
+    assert openai.calls == 2
+
+@needs_numpy
+def test_semantic_cache_matches_paraphrases():
+    cache = SemanticCache(capacity=10, threshold=0.9, ttl=60)
+    cache.put('Explain machine learning', 'ML answer')
+    cache.put('How do I sleep better?', 'Sleep answer')
+    assert cache.get('can you tell me about machine learning?') == 'ML answer'
+    assert cache.get('how can i sleep better') == 'Sleep answer'
+    assert cache.get('how do I cook rice') is None
+    answer, similarity = cache.lookup('what is machine learning used for')
+    assert answer is None and 0 < similarity < 0.9
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (2, 2)
+
+@needs_numpy
+def test_semantic_cache_keeps_order_negation_and_comparisons_apart():
+    cache = SemanticCache(capacity=10, threshold=0.9, ttl=60)
+    cache.put('is python faster than java', 'python')
+    cache.put('should I buy a house', 'buy')
+    cache.put('python or java for beginners', 'either')
+    assert cache.get('is java faster than python') is None
+    assert cache.get('is python slower than java') is None
+    assert cache.get('should I not buy a house') is None
+    assert cache.get("shouldn't I buy a house") is None
+    # Paraphrases with the same meaning still hit
+    assert cache.get('Is Python faster than Java?') == 'python'
+    assert cache.get('should i buy a house?') == 'buy'
+    assert cache.get('java or python for beginners') is None
+
+@needs_numpy
+def test_semantic_cache_ignores_filler_only_questions():
+    cache = SemanticCache(capacity=10)
+    cache.put('what is it?', 'anything')
+    assert len(cache) == 0
+    assert cache.get('what is it?') is None
+
+@needs_numpy
+def test_semantic_cache_eviction_and_expiry():
+    clock = FakeClock()
+    cache = SemanticCache(capacity=2, ttl=60, clock=clock)
+    cache.put('python decorators', 'decorators')
+    cache.put('rust lifetimes', 'lifetimes')
+    clock.now += 1
+    assert cache.get('python decorators') == 'decorators'
+    cache.put('haskell monads', 'monads')
+    assert cache.get('rust lifetimes') is None
+    assert cache.get('python decorators') == 'decorators'
+    assert cache.stats()['evictions'] == 1
+    clock.now += 61
+    assert cache.get('haskell monads') is None
+
+@needs_numpy
+def test_paraphrases_skip_the_providers(openai, monkeypatch):
+    monkeypatch.setattr(nlp, 'semantic_cache', SemanticCache(capacity=10, ttl=60))
+    assert nlp.ask_ai_question('Explain machine learning') == 'answer 1'
+    assert nlp.process_query('Can you explain machine learning?') == '🤖 answer 1'
+    assert nlp.ask_ai_question('What time is it in Tokyo?') == 'answer 2'
+    assert nlp.ask_ai_question('What time is it in Tokyo?') == 'answer 3'
+    assert openai.calls == 3
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for chat history retention and archiving in retention.py
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+import models
+import retention
+
+@pytest.fixture
+def db(db, tmp_path, monkeypatch):
+    """The fresh database, with its own archive directory and no global retention limits"""
+    monkeypatch.setattr(retention, 'CHAT_ARCHIVE_DIR', str(tmp_path / 'archive'))
+    monkeypatch.setattr(retention, 'CHAT_RETENTION_DAYS', 0)
+    monkeypatch.setattr(retention, 'CHAT_RETENTION_MAX_ROWS', 0)
+    return db
+
+def add_messages(conn, session_id, count, days_ago=0):
+    created = datetime.now() - timedelta(days=days_ago)
+    with conn:
+        conn.executemany(models.INSERT_CHAT_MESSAGE_SQL, [
+            (f'{session_id}-q{i}', 'a', 'text', (created + timedelta(seconds=i)).isoformat(), session_id)
+            for i in range(count)
+        ])
+
+def test_age_limit_archives_and_rehydrates(db, monkeypatch):
+    monkeypatch.setattr(retention, 'CHAT_RETENTION_DAYS', 30)
+    add_messages(db, 's1', 3, days_ago=60)
+    add_messages(db, 's1', 2)
+    add_messages(db, 's2', 4, days_ago=60)
+    retention.set_retention_policy('s2', max_age_days=0)
+    
+    result = retention.run_retention()
+    assert result['archived'] == 3
+    assert len(models.get_chat_history(session_id='s1')) == 2
+    assert len(models.get_chat_history(session_id='s2')) == 4
+    assert models.get_chat_stats()['total_messages'] == 6
+    assert len(os.listdir(retention.CHAT_ARCHIVE_DIR)) == 1
+    
+    assert retention.rehydrate_session('s1') == 3
+    history = models.get_chat_history(session_id='s1')
+    assert [m['user_message'] for m in history] == ['s1-q0', 's1-q1', 's1-q2', 's1-q0', 's1-q1']
+    # The segment held only s1's rows, so it is removed once restored
+    assert os.listdir(retention.CHAT_ARCHIVE_DIR) == []
+
+def test_row_limits_keep_newest(db, monkeypatch):
+    monkeypatch.setattr(retention, 'CHAT_RETENTION_MAX_ROWS', 5)
+    add_messages(db, 's1', 8)
+    add_messages(db, 's2', 8)
+    retention.set_retention_policy('s2', max_rows=2)
+    
+    assert retention.archive_expired_messages()['archived'] == 3 + 6
+    assert [m['user_message'] for m in models.get_chat_history(session_id='s2')] == ['s2-q6', 's2-q7']
+    assert len(models.get_chat_history(session_id='s1')) == 5
+    assert models.search_chat_history('s2') != []
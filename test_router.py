@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Tests for adaptive provider routing (router.py)
+"""
+
+import pytest
+
+import nlp
+from circuit_breaker import CircuitBreaker
+from conftest import FakeClock
+from response_cache import ResponseCache
+from router import ProviderRouter, parse_route
+
+class AlwaysExplore:
+    """Stands in for random.Random so every decision explores"""
+    
+    def random(self):
+        return 0.0
+
+def test_providers_are_ordered_by_expected_time_to_a_good_answer():
+    router = ProviderRouter(explore_rate=0, half_life=0)
+    names = ['deepseek', 'openai', 'gemini']
+    # Unmeasured providers tie, so the fallback order stands
+    assert router.order(names) == names
+    router.record('deepseek', True, 2.0)
+    router.record('openai', True, 0.5)
+    router.record('gemini', True, 0.3)
+    assert router.order(names) == ['gemini', 'openai', 'deepseek']
+    # Gemini is fast but fails most of the time
+    for _ in range(10):
+        router.record('gemini', False, 0.3)
+    assert router.order(names) == ['openai', 'deepseek', 'gemini']
+
+def test_exploration_tries_the_stalest_provider_first():
+    clock = FakeClock()
+    router = ProviderRouter(explore_rate=0.05, half_life=0, rng=AlwaysExplore(), clock=clock)
+    for name, latency in (('deepseek', 3.0), ('gemini', 1.0), ('openai', 0.1)):
+        router.record(name, True, latency)
+        clock.now += 1
+    assert router.order(['deepseek', 'openai', 'gemini']) == ['deepseek', 'openai', 'gemini']
+    assert router.snapshot()['recent'][0]['explored'] is True
+
+def test_a_provider_back_after_a_long_gap_is_mostly_rescored():
+    clock = FakeClock()
+    router = ProviderRouter(alpha=0.2, half_life=30, clock=clock)
+    for _ in range(10):
+        router.record('deepseek', False, 5.0)
+    clock.now += 300
+    router.record('deepseek', True, 0.2)
+    provider = router.snapshot()['providers']['deepseek']
+    assert provider['latency_ms'] < 210
+    assert provider['success_rate'] > 0.99
+
+def test_pinned_routes_skip_scoring():
+    router = ProviderRouter(explore_rate=1, rng=AlwaysExplore())
+    router.record('openai', True, 0.1)
+    assert router.order(['deepseek', 'openai'], pinned=['deepseek', 'gemini']) == ['deepseek']
+    decision = router.snapshot()['recent'][0]
+    assert decision['pinned'] and not decision['explored']
+    assert parse_route('OpenAI, deepseek') == ['openai', 'deepseek']
+    assert parse_route(None) is None and parse_route([]) is None
+
+@pytest.fixture
+def providers(providers, monkeypatch):
+    """The shared fake providers, with DeepSeek failing every call"""
+    providers['deepseek'].error = 'upstream error'
+    # A high threshold keeps the breaker out of it: the router alone moves DeepSeek back
+    monkeypatch.setattr(nlp, 'provider_breakers',
+                        {name: CircuitBreaker(name, failure_threshold=100) for name in nlp.PROVIDER_NAMES})
+    return providers
+
+def test_failing_provider_moves_behind_a_working_one(providers):
+    for i in range(3):
+        assert nlp.ask_ai_question(f'what is routing {i}?') == 'openai answer'
+    # DeepSeek failed the first question and hasn't been asked first since
+    assert providers['deepseek'].calls == 1
+    assert nlp.provider_router.recent[-1]['order'] == ['openai', 'deepseek']
+
+def test_cache_hits_are_not_routing_measurements(providers, monkeypatch):
+    monkeypatch.setattr(nlp, 'response_cache', ResponseCache(max_entries=10, ttl=60))
+    providers['openai'].delay = 0.05
+    for _ in range(3):
+        assert nlp.ask_ai_question('what is routing?', route=['openai']) == 'openai answer'
+    
+    score = nlp.provider_router.snapshot()['providers']['openai']
+    assert score['attempts'] == 1
+    assert score['latency_ms'] >= 50
+
+def test_unknown_route_names_are_ignored(providers, monkeypatch):
+    monkeypatch.setattr(nlp, 'response_cache', ResponseCache(max_entries=10, ttl=60))
+    assert nlp.process_query('what is python?', route=parse_route('bogus,openai')) == '🤖 openai answer'
+    assert nlp.ask_ai_question('what is python?', route=['bogus']) == nlp.get_predefined_answer('what is python?')
+    assert providers['openai'].calls == 1
+
+def test_routing_endpoint_shows_scores_and_pinned_decisions(client, providers):
+    providers['deepseek'].error = None
+    response = client.post('/ask', json={'question': 'what is routing?', 'route': ['openai']})
+    assert response.get_json()['response'] == 'openai answer'
+    assert providers['deepseek'].calls == 0
+    
+    routing = client.get('/providers/routing').get_json()
+    assert routing['recent'][0]['order'] == ['openai'] and routing['recent'][0]['pinned']
+    assert routing['providers']['openai']['attempts'] == 1
+    assert routing['providers']['openai']['success_rate'] == 1.0
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Tests for coalescing identical in-flight questions (singleflight.py)
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+import async_providers
+import nlp
+from deadline import Deadline
+from singleflight import SingleFlight
+
+@pytest.fixture
+def openai(openai):
+    """The OpenAI-only fake, slow enough for identical questions to overlap"""
+    openai.delay = 0.2
+    return openai
+
+def test_parallel_identical_questions_make_one_provider_call(openai):
+    questions = ['What is AI?', '  "what is   ai?" '] * 10
+    with ThreadPoolExecutor(max_workers=len(questions)) as pool:
+        answers = list(pool.map(nlp.ask_ai_question, questions))
+    assert openai.calls == 1
+    assert answers == ['answer 1'] * len(questions)
+    assert nlp.provider_flights.stats() == {'in_flight': 0, 'calls': 1, 'shared': len(questions) - 1}
+
+def test_finished_calls_are_not_reused(openai):
+    openai.delay = 0
+    assert nlp.ask_ai_question('What is AI?') == 'answer 1'
+    assert nlp.ask_ai_question('What is AI?') == 'answer 2'
+
+def test_different_questions_are_not_coalesced(openai):
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        answers = set(pool.map(nlp.ask_ai_question, ['What is AI?', 'What is ML?']))
+    assert openai.calls == 2 and answers == {'answer 1', 'answer 2'}
+
+def test_a_leader_out_of_time_does_not_answer_for_the_others(openai):
+    short, generous = Deadline(50), Deadline(2000)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(nlp.answer_with_ai, 'What is AI?', None, short)
+        time.sleep(0.01)
+        follower = pool.submit(nlp.answer_with_ai, 'What is AI?', None, generous)
+        assert leader.result() is None and short.exceeded
+        # The follower had time left, so it asked again instead of taking the leader's None
+        assert follower.result() == 'answer 2' and not generous.exceeded
+
+def test_failures_reach_every_waiter():
+    flights = SingleFlight()
+    started = threading.Event()
+    
+    def fail():
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError('provider down')
+    
+    def call():
+        try:
+            flights.do('key', fail)
+        except RuntimeError as e:
+            return str(e)
+    
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        leader = pool.submit(call)
+        started.wait()
+        followers = [pool.submit(call) for _ in range(4)]
+        results = [leader.result()] + [f.result() for f in followers]
+    assert results == ['provider down'] * 5
+    assert flights.stats() == {'in_flight': 0, 'calls': 1, 'shared': 4}
+
+def test_async_identical_questions_make_one_provider_call(providers, monkeypatch):
+    calls = []
+    
+    async def create(model, messages, **kwargs):
+        calls.append(model)
+        await asyncio.sleep(0.1)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content='shared answer'))])
+    
+    clients = SimpleNamespace(deepseek=None, gemini=None,
+                              openai=SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+    monkeypatch.setattr(nlp, 'USE_DEEPSEEK', False)
+    monkeypatch.setattr(async_providers, 'get_async_clients', lambda: clients)
+    
+    async def burst():
+        return await asyncio.gather(*(async_providers.ask_ai_question_async('What is AI?') for _ in range(50)))
+    
+    assert asyncio.run(burst()) == ['shared answer'] * 50
+    assert len(calls) == 1
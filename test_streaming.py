@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests for streamed answers: nlp.stream_ai_answer, sse.stream_answer and /ask/stream
+"""
+
+import json
+
+import pytest
+
+import models
+import nlp
+from circuit_breaker import CircuitBreaker, OPEN
+from conftest import timed
+from deadline import Deadline
+from response_cache import ResponseCache
+from sse import stream_answer
+
+@pytest.fixture
+def providers(providers):
+    """The shared fake providers, streaming their answers in two chunks"""
+    providers['deepseek'].chunks = ['Deep', 'Seek']
+    providers['openai'].chunks = ['Open', 'AI']
+    return providers
+
+def parse_events(body):
+    """(event name, payload) pairs from an SSE body"""
+    events = []
+    for block in body.strip().split('\n\n'):
+        name = 'message'
+        for line in block.split('\n'):
+            if line.startswith('event: '):
+                name = line[len('event: '):]
+            elif line.startswith('data: '):
+                events.append((name, json.loads(line[len('data: '):])))
+    return events
+
+def test_tokens_stream_from_the_primary(providers):
+    assert list(nlp.stream_ai_answer('what is streaming?')) == [('token', 'Deep'), ('token', 'Seek')]
+    assert providers['openai'].calls == 0
+
+def test_failure_before_the_first_token_falls_through(providers):
+    providers['deepseek'].error = '402 Insufficient Balance'
+    assert list(nlp.stream_ai_answer('what is streaming?')) == [('token', 'Open'), ('token', 'AI')]
+    assert nlp.provider_breakers['deepseek'].state == OPEN
+
+def test_mid_stream_failure_resets_to_the_built_in_answer(providers):
+    providers['deepseek'].error = 'connection reset'
+    providers['deepseek'].fail_after = 1
+    question = 'what is streaming?'
+    events = list(nlp.stream_ai_answer(question))
+    assert events == [('token', 'Deep'), ('reset', None), ('token', nlp.get_predefined_answer(question))]
+    assert providers['openai'].calls == 0
+
+def test_abandoned_stream_hands_back_its_probe(providers, monkeypatch):
+    breaker = CircuitBreaker('deepseek', clock=lambda: 1000.0)
+    breaker.record_failure('quota_exceeded')
+    breaker.clock = lambda: 1000.0 + breaker.cooldown
+    monkeypatch.setitem(nlp.provider_breakers, 'deepseek', breaker)
+    stream = nlp.stream_ai_answer('what is streaming?')
+    assert next(stream) == ('token', 'Deep')
+    stream.close()
+    assert breaker.allow()
+
+def test_slow_first_token_gives_up_at_the_deadline(providers):
+    providers['deepseek'].delay = 1.0
+    providers['deepseek'].ignores_timeout = True
+    question = 'what is streaming?'
+    deadline = Deadline(100)
+    events, seconds = timed(list, nlp.stream_ai_answer(question, deadline))
+    assert events == [('token', nlp.get_predefined_answer(question))]
+    assert seconds < 0.5
+    assert deadline.exceeded
+    assert providers['openai'].calls == 0
+
+def test_slow_stream_is_cut_off_at_the_deadline(providers):
+    providers['deepseek'].chunks = ['Deep', 'Seek', '!']
+    providers['deepseek'].delay = 0.1
+    question = 'what is streaming?'
+    deadline = Deadline(150)
+    events, seconds = timed(list, nlp.stream_ai_answer(question, deadline))
+    assert events == [('token', 'Deep'), ('reset', None), ('token', nlp.get_predefined_answer(question))]
+    assert seconds < 0.25
+    assert deadline.exceeded
+
+def test_streamed_answer_is_cached_for_ask(providers, monkeypatch):
+    monkeypatch.setattr(nlp, 'response_cache', ResponseCache())
+    assert list(nlp.stream_ai_answer('what is streaming?')) == [('token', 'Deep'), ('token', 'Seek')]
+    assert nlp.answer_with_ai('What is streaming?') == 'DeepSeek'
+    assert providers['deepseek'].calls == 1
+
+def test_sse_stream_reports_the_final_answer():
+    saved = []
+    events = [('token', 'Half'), ('reset', None), ('token', 'Whole'), ('token', ' answer')]
+    body = ''.join(stream_answer(iter(events), saved.append))
+    assert parse_events(body) == [
+        ('message', {'text': 'Half'}),
+        ('reset', {}),
+        ('message', {'text': 'Whole'}),
+        ('message', {'text': ' answer'}),
+        ('done', {'response': 'Whole answer'}),
+    ]
+    assert saved == ['Whole answer']
+
+def test_ask_stream_endpoint_saves_the_answer(client):
+    response = client.get('/ask/stream?question=what+is+streaming%3F')
+    assert response.mimetype == 'text/event-stream'
+    events = parse_events(response.get_data(as_text=True))
+    assert events[-1] == ('done', {'response': 'DeepSeek'})
+    
+    history = models.get_chat_history()
+    assert [(m['user_message'], m['ai_response'], m['message_type']) for m in history] == [
+        ('what is streaming?', 'DeepSeek', 'ai_question')]
+
+def test_ask_stream_marks_a_late_answer_degraded(client, providers):
+    providers['deepseek'].delay = 1.0
+    providers['deepseek'].ignores_timeout = True
+    response = client.get('/ask/stream?question=what+is+streaming%3F&deadline_ms=100')
+    events = parse_events(response.get_data(as_text=True))
+    assert events[-1] == ('done', {'response': nlp.get_predefined_answer('what is streaming?'), 'degraded': True})
+
+def test_ask_stream_requires_a_question(client):
+    assert client.post('/ask/stream', json={}).status_code == 400